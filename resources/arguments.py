@@ -8,7 +8,7 @@ import subprocess
 from pathlib import Path
 
 from data import model_array, os_data
-from resources.build import build
+from resources.build import build, batch
 from resources.sys_patch import sys_patch, sys_patch_auto
 from resources import defaults, utilities, constants
 from resources.wx_gui import gui_entry
@@ -34,6 +34,10 @@ class arguments:
             self._build_handler()
             return
 
+        if self.args.build_all:
+            self._build_all_handler()
+            return
+
         if self.args.patch_sys_vol:
             self._sys_patch_handler()
             return
@@ -237,3 +241,46 @@ If you plan to create the USB for another machine, please select the "Change Mod
             self.constants.serial_settings = "None"
 
         build.BuildOpenCore(self.constants.custom_model or self.constants.computer.real_model, self.constants)
+
+
+    def _build_all_handler(self) -> None:
+        """
+        Start config building process for every supported model
+        Settings are applied on top of each model's defaults, as with --build --model
+        """
+        logging.info("Set OpenCore Build for all supported models")
+
+        settings = {
+            "verbose_debug": self.args.verbose,
+            "sip_status":    not self.args.disable_sip,
+            "secure_status": not self.args.disable_smb,
+        }
+
+        for arg, key, value in [
+            ("debug_oc",        "opencore_debug",      True),
+            ("debug_kext",      "kext_debug",          True),
+            ("hide_picker",     "showpicker",          False),
+            ("firewire",        "firewire_boot",       True),
+            ("nvme",            "nvme_boot",           True),
+            ("wlan",            "enable_wake_on_wlan", True),
+            ("disable_tb",      "disable_tb",          True),
+            ("force_surplus",   "force_surplus",       True),
+            ("moderate_smbios", "serial_settings",     "Moderate"),
+        ]:
+            if getattr(self.args, arg):
+                settings[key] = value
+
+        if self.args.smbios_spoof:
+            if self.args.smbios_spoof in ["Minimal", "Moderate", "Advanced"]:
+                settings["serial_settings"] = self.args.smbios_spoof
+            else:
+                logging.info(f"- Unknown SMBIOS arg passed: {self.args.smbios_spoof}")
+
+        if self.args.support_all:
+            logging.info("- Building for natively supported models")
+            settings["allow_oc_everywhere"] = True
+            settings["serial_settings"] = "None"
+
+        results = batch.BatchBuildOpenCore(self.constants).build_all_models(settings=settings)
+        if any(result.error for result in results):
+            sys.exit(1)
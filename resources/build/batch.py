@@ -0,0 +1,191 @@
+# Batch building of OpenCore configurations for many models
+# Copyright (C) 2020-2023, Dhinak G, Mykola Grymalyuk
+
+import os
+import copy
+import time
+import logging
+import multiprocessing
+import concurrent.futures
+
+from pathlib import Path
+from dataclasses import dataclass, field
+
+from data import model_array
+from resources import constants, defaults, utilities
+from resources.build import build
+
+
+BATCH_BUILD_FOLDER: str = "Batch-Build"  # Created inside the host's build folder by default
+
+
+@dataclass
+class BatchBuildJob:
+    """
+    Model to build, along with Constants attributes to override after defaults are generated
+    """
+
+    model:    str
+    settings: dict = field(default_factory=dict)  # ie. {"verbose_debug": True, "serial_settings": "Minimal"}
+
+
+@dataclass
+class BatchBuildResult:
+    """
+    Outcome of a single job in a batch build
+    """
+
+    model:      str
+    settings:   dict
+    build_path: Path   # Isolated build folder of this job
+    artifact:   Path   # Built OpenCore folder (EFI and System), None on failure
+    config:     Path   # Generated config.plist, None on failure
+    duration:   float  # Seconds spent building
+    error:      str    # None on success
+
+
+class BatchBuildOpenCore:
+    """
+    Builds OpenCore for many (model, settings) combinations in a process pool
+
+    BuildOpenCore works inside the build folder of the Constants it's given, so each job
+    gets its own copy of the host's Constants with the build folder moved to a directory
+    of its own. Jobs are independent of each other, and produce the same output as a
+    serial BuildOpenCore run with the same settings.
+
+    Workers are spawned rather than forked, as the host may have GUI or IOKit state that
+    can't be forked. Frozen builds must call multiprocessing.freeze_support() on launch,
+    otherwise workers start the patcher again. With a single CPU or worker, jobs are built
+    in-process one after another, avoiding the pool's overhead.
+
+    Note Advanced SMBIOS spoofing generates new serials and a SystemUUID on every build,
+    so such configurations will differ between any two builds.
+
+    Usage:
+        >>> results = BatchBuildOpenCore(self.constants).build_all_models(settings={"verbose_debug": True})
+        >>> for result in results:
+        >>>     logging.info(f"{result.model}: {result.artifact} ({result.duration:.2f}s)")
+    """
+
+    def __init__(self, global_constants: constants.Constants, output_path: Path = None, max_workers: int = None) -> None:
+        self.constants: constants.Constants = global_constants
+
+        self.output_path: Path = Path(output_path) if output_path else self.constants.build_path / Path(BATCH_BUILD_FOLDER)
+        self.max_workers: int  = max_workers or os.cpu_count() or 1
+
+        self.duration: float = 0.0  # Wall-clock seconds of the last batch
+
+
+    def build(self, jobs: list) -> list:
+        """
+        Build every job, in parallel
+
+        Parameters:
+            jobs (list): BatchBuildJob entries
+
+        Returns:
+            list: BatchBuildResult entries, in the same order as jobs
+        """
+
+        if not jobs:
+            return []
+
+        base_constants = self._worker_constants()
+        job_paths = [self.output_path / Path(f"{index:03d}-{job.model}") for index, job in enumerate(jobs)]
+        workers = min(self.max_workers, len(jobs), os.cpu_count() or 1)
+
+        logging.info(f"Building {len(jobs)} configurations with {workers} workers")
+        logging.info(f"- Output: {self.output_path}")
+
+        self.output_path.mkdir(parents=True, exist_ok=True)
+
+        start_time = time.perf_counter()
+        if workers <= 1:
+            # Each job still gets its own copy, as a worker process would
+            results = [_build_job(copy.deepcopy(base_constants), job, job_path) for job, job_path in zip(jobs, job_paths)]
+        else:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+                results = list(executor.map(_build_job, [base_constants] * len(jobs), jobs, job_paths))
+        self.duration = time.perf_counter() - start_time
+
+        failed = [result for result in results if result.error]
+        logging.info(f"Built {len(results) - len(failed)} of {len(results)} configurations in {self.duration:.2f} seconds")
+        for result in failed:
+            logging.info(f"- Failed to build {result.model}: {result.error}")
+
+        return results
+
+
+    def build_all_models(self, settings: dict = None) -> list:
+        """
+        Build every supported model with the same settings
+
+        Parameters:
+            settings (dict): Constants attributes to override for every model
+
+        Returns:
+            list: BatchBuildResult entries, in model_array.SupportedSMBIOS order
+        """
+
+        return self.build([BatchBuildJob(model, dict(settings or {})) for model in model_array.SupportedSMBIOS])
+
+
+    def _worker_constants(self) -> constants.Constants:
+        """
+        Copy the host's Constants into a form that can be sent to worker processes
+
+        Returns:
+            constants.Constants: Shallow copy without process-local state
+        """
+
+        worker_constants = copy.copy(self.constants)
+        worker_constants.unpack_thread = None
+
+        if worker_constants.computer is not None:
+            worker_constants.computer = copy.copy(worker_constants.computer)
+            worker_constants.computer.ioregistry = None
+
+        return worker_constants
+
+
+def _build_job(global_constants: constants.Constants, job: BatchBuildJob, job_path: Path) -> BatchBuildResult:
+    """
+    Build a single job, run inside a worker process
+
+    Parameters:
+        global_constants (constants.Constants): Worker's private copy of the host's Constants
+        job (BatchBuildJob):                    Model and settings to build
+        job_path (Path):                        Directory holding this job's build folder
+
+    Returns:
+        BatchBuildResult: Outcome of the build
+    """
+
+    utilities.disable_cls()
+
+    # Build folder is derived from current_path, payloads are resolved through payload_path instead
+    global_constants.current_path = job_path
+    global_constants.custom_model = job.model
+
+    start_time = time.perf_counter()
+    try:
+        defaults.GenerateDefaults(job.model, False, global_constants)
+        for key, value in job.settings.items():
+            if not hasattr(global_constants, key):
+                raise ValueError(f"Unknown setting: {key}")
+            setattr(global_constants, key, value)
+
+        job_path.mkdir(parents=True, exist_ok=True)
+        build.BuildOpenCore(job.model, global_constants)
+    except Exception as e:
+        return BatchBuildResult(job.model, job.settings, global_constants.build_path, None, None, time.perf_counter() - start_time, f"{type(e).__name__}: {e}")
+
+    return BatchBuildResult(
+        job.model,
+        job.settings,
+        global_constants.build_path,
+        global_constants.opencore_release_folder,
+        global_constants.plist_path,
+        time.perf_counter() - start_time,
+        None,
+    )
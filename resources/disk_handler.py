@@ -0,0 +1,229 @@
+# Library for enumerating local disks through diskutil
+# Parsing is kept to pure functions over diskutil's plist output, with queries batched and run concurrently
+
+import plistlib
+import subprocess
+import threading
+import concurrent.futures
+
+
+DISKUTIL_PATH:         str = "/usr/sbin/diskutil"
+DISKUTIL_INFO_THREADS: int = 8  # Concurrent 'diskutil info' processes
+
+# Partition types that can never hold a FAT filesystem, no need to query them individually
+NON_FAT_PARTITION_CONTENT: list = [
+    "Apple_APFS",
+    "Apple_APFS_ISC",
+    "Apple_APFS_Recovery",
+    "Apple_Boot",
+    "Apple_CoreStorage",
+    "Apple_HFS",
+    "Apple_HFSX",
+    "Apple_KernelCoreDump",
+    "Apple_partition_map",
+    "Microsoft Reserved",
+]
+
+
+class DiskutilQuery:
+    """
+    Runs diskutil, parsing its plist output
+
+    Usage:
+        >>> query = DiskutilQuery()
+        >>> disks = parse_whole_disks(query.list_physical())
+        >>> info = query.info(["disk2", "disk2s1"])
+        >>> logging.info(f"Spawned {query.subprocess_count} diskutil processes")
+
+        >>> # Replay recorded output (ie. for testing)
+        >>> query = DiskutilQuery(runner=lambda arguments: recorded_output[tuple(arguments)])
+    """
+
+    def __init__(self, runner = None) -> None:
+        # Callable taking diskutil's arguments, returning its stdout as bytes
+        self.runner = runner
+        if self.runner is None:
+            self.runner = self._run_diskutil
+
+        self.subprocess_count: int = 0
+        self._count_lock = threading.Lock()
+
+
+    def list_physical(self) -> dict:
+        """
+        Lists physical disks and their partitions
+
+        Returns:
+            dict: Output of 'diskutil list -plist physical', empty if unavailable
+        """
+
+        try:
+            # High Sierra and newer
+            return self._query(["list", "-plist", "physical"], strict=True)
+        except ValueError:
+            # Sierra and older
+            return self._query(["list", "-plist"])
+
+
+    def info(self, identifiers: list) -> dict:
+        """
+        Fetches information on multiple disks or partitions concurrently
+
+        Parameters:
+            identifiers (list): Device identifiers (ie. disk2, disk2s1)
+
+        Returns:
+            dict: Device identifiers mapped to their 'diskutil info -plist' output, empty if unavailable
+        """
+
+        if not identifiers:
+            return {}
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(identifiers), DISKUTIL_INFO_THREADS)) as executor:
+            results = executor.map(lambda identifier: self._query(["info", "-plist", identifier]), identifiers)
+            return dict(zip(identifiers, results))
+
+
+    def _query(self, arguments: list, strict: bool = False) -> dict:
+        """
+        Runs diskutil and parses its plist output
+
+        Parameters:
+            arguments (list): Arguments to pass to diskutil
+            strict (bool):    Raise ValueError on unparsable output instead of returning an empty dict
+
+        Returns:
+            dict: Parsed output
+        """
+
+        with self._count_lock:
+            self.subprocess_count += 1
+
+        output = self.runner(arguments)
+        try:
+            return plistlib.loads(output.strip())
+        except ValueError:
+            if strict:
+                raise
+            return {}
+
+
+    def _run_diskutil(self, arguments: list) -> bytes:
+        """
+        Default runner, invokes diskutil
+
+        Parameters:
+            arguments (list): Arguments to pass to diskutil
+
+        Returns:
+            bytes: diskutil's stdout
+        """
+
+        return subprocess.run([DISKUTIL_PATH] + arguments, stdout=subprocess.PIPE).stdout
+
+
+def parse_whole_disks(disk_list: dict) -> list:
+    """
+    Parses whole disks and their partitions from 'diskutil list -plist'
+
+    Parameters:
+        disk_list (dict): Output of 'diskutil list -plist'
+
+    Returns:
+        list: Whole disks, each with 'identifier', 'size' and a 'partitions' list of 'identifier', 'content', 'name' and 'size'
+              'partitions' is None if diskutil didn't report any
+    """
+
+    disks: list = []
+
+    for disk in disk_list.get("AllDisksAndPartitions", []):
+        if "DeviceIdentifier" not in disk:
+            continue
+
+        partitions = None
+        if "Partitions" in disk:
+            partitions = [
+                {
+                    "identifier": partition["DeviceIdentifier"],
+                    "content":    partition.get("Content", ""),
+                    "name":       partition.get("VolumeName", ""),
+                    "size":       partition.get("Size", 0),
+                }
+                for partition in disk["Partitions"]
+                if "DeviceIdentifier" in partition
+            ]
+
+        disks.append({
+            "identifier": disk["DeviceIdentifier"],
+            "size":       disk.get("Size", None),
+            "partitions": partitions,
+        })
+
+    return disks
+
+
+def partition_needs_info(partition: dict) -> bool:
+    """
+    Determines whether a partition's filesystem must be queried with 'diskutil info'
+
+    Parameters:
+        partition (dict): Partition from parse_whole_disks()
+
+    Returns:
+        bool: False if the partition type can't hold a FAT filesystem
+    """
+
+    return partition["content"] not in NON_FAT_PARTITION_CONTENT
+
+
+def parse_disk_info(disk_info: dict) -> dict:
+    """
+    Parses a whole disk from 'diskutil info -plist'
+
+    Parameters:
+        disk_info (dict): Output of 'diskutil info -plist <disk>'
+
+    Returns:
+        dict: 'identifier' (device node), 'name', 'size' and 'internal' (None if unknown), None if incomplete (ie. CDs)
+    """
+
+    try:
+        return {
+            "identifier": disk_info["DeviceNode"],
+            "name":       disk_info["MediaName"],
+            "size":       disk_info["TotalSize"],
+            "internal":   disk_info.get("Internal", None),
+        }
+    except KeyError:
+        return None
+
+
+def parse_partition_info(partition: dict, partition_info: dict = None) -> dict:
+    """
+    Parses a partition, from 'diskutil info -plist' if queried, otherwise from 'diskutil list -plist'
+
+    Parameters:
+        partition (dict):      Partition from parse_whole_disks()
+        partition_info (dict): Output of 'diskutil info -plist <partition>', None if not queried
+
+    Returns:
+        dict: 'fs', 'type', 'name' and 'size' of the partition, None if incomplete
+    """
+
+    if partition_info is None:
+        return {
+            "fs":   partition["content"],
+            "type": partition["content"],
+            "name": partition["name"],
+            "size": partition["size"],
+        }
+
+    try:
+        return {
+            "fs":   partition_info.get("FilesystemType", partition_info["Content"]),
+            "type": partition_info["Content"],
+            "name": partition_info.get("VolumeName", ""),
+            "size": partition_info["TotalSize"],
+        }
+    except KeyError:
+        return None
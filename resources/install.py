@@ -9,7 +9,7 @@ import applescript
 
 from pathlib import Path
 
-from resources import utilities, constants
+from resources import utilities, constants, disk_handler
 from data import os_data
 
 
@@ -20,27 +20,29 @@ class tui_disk_installation:
     def list_disks(self):
         all_disks = {}
         # TODO: AllDisksAndPartitions isn't supported in Snow Leopard and older
-        try:
-            # High Sierra and newer
-            disks = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "list", "-plist", "physical"], stdout=subprocess.PIPE).stdout.decode().strip().encode())
-        except ValueError:
-            # Sierra and older
-            disks = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "list", "-plist"], stdout=subprocess.PIPE).stdout.decode().strip().encode())
-        for disk in disks["AllDisksAndPartitions"]:
-            disk_info = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "info", "-plist", disk["DeviceIdentifier"]], stdout=subprocess.PIPE).stdout.decode().strip().encode())
-            try:
-                all_disks[disk["DeviceIdentifier"]] = {"identifier": disk_info["DeviceNode"], "name": disk_info["MediaName"], "size": disk_info["TotalSize"], "partitions": {}}
-                for partition in disk["Partitions"]:
-                    partition_info = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "info", "-plist", partition["DeviceIdentifier"]], stdout=subprocess.PIPE).stdout.decode().strip().encode())
-                    all_disks[disk["DeviceIdentifier"]]["partitions"][partition["DeviceIdentifier"]] = {
-                        "fs": partition_info.get("FilesystemType", partition_info["Content"]),
-                        "type": partition_info["Content"],
-                        "name": partition_info.get("VolumeName", ""),
-                        "size": partition_info["TotalSize"],
-                    }
-            except KeyError:
+        query = disk_handler.DiskutilQuery()
+        disks = disk_handler.parse_whole_disks(query.list_physical())
+
+        # Query all disks, and any partitions that could be FAT formatted, in a single batch
+        identifiers = []
+        for disk in disks:
+            identifiers.append(disk["identifier"])
+            identifiers += [partition["identifier"] for partition in disk["partitions"] or [] if disk_handler.partition_needs_info(partition)]
+        info = query.info(identifiers)
+
+        for disk in disks:
+            disk_info = disk_handler.parse_disk_info(info[disk["identifier"]])
+            if disk_info is None:
                 # Avoid crashing with CDs installed
                 continue
+            all_disks[disk["identifier"]] = {"identifier": disk_info["identifier"], "name": disk_info["name"], "size": disk_info["size"], "partitions": {}}
+            for partition in disk["partitions"] or []:
+                partition_info = disk_handler.parse_partition_info(partition, info.get(partition["identifier"]))
+                if partition_info is None:
+                    break
+                all_disks[disk["identifier"]]["partitions"][partition["identifier"]] = partition_info
+
+        logging.info(f"Enumerated disks with {query.subprocess_count} diskutil calls")
 
         supported_disks = {}
         for disk in all_disks:
@@ -3,17 +3,29 @@
 # - https://gist.github.com/dhinakg/cbe30edf31ddc153fd0b0c0570c9b041
 # Copyright (C) 2021-2023, Dhinak G, Mykola Grymalyuk
 
+import os
 import enum
+import array
+import bisect
+import struct
+import itertools
 import hashlib
 import logging
 import binascii
 import threading
+import collections
+import concurrent.futures
 
 from typing import Union
 from pathlib import Path
 
 CHUNK_LENGTH = 4 + 32
 
+# Ref: https://github.com/apple-oss-distributions/xnu/blob/xnu-8020.101.4/bsd/kern/chunklist.h#L59-L69
+CHUNKLIST_HEADER = struct.Struct("<4sIBBBxQQQ")
+
+VALIDATION_THREADS: int = min(os.cpu_count() or 1, 8)  # Threads used for parallel validation, hashlib releases the GIL while hashing
+
 
 class ChunklistStatus(enum.Enum):
     """
@@ -24,6 +36,76 @@ class ChunklistStatus(enum.Enum):
     FAILURE     = 2
 
 
+class Chunklist:
+    """
+    Compact parsed form of a chunklist
+
+    Chunk lengths and offsets are stored in arrays, and checksums in a single
+    contiguous block, so any chunk can be located in O(1) without allocating
+    per-chunk objects
+
+    Parameters:
+        chunklist (bytes): The chunklist file itself
+
+    Raises:
+        ValueError:   Invalid chunklist magic, or chunk table shorter than chunkCount
+        struct.error: Truncated chunklist header
+    """
+
+    def __init__(self, chunklist: bytes) -> None:
+        magic, length, file_version, chunk_method, sig_method, chunk_count, chunk_offset, sig_offset = CHUNKLIST_HEADER.unpack_from(chunklist)
+
+        self.header: dict = {
+            "magic":       magic,
+            "length":      length,
+            "fileVersion": file_version,
+            "chunkMethod": chunk_method,
+            "sigMethod":   sig_method,
+            "chunkCount":  chunk_count,
+            "chunkOffset": chunk_offset,
+            "sigOffset":   sig_offset
+        }
+
+        if magic != b"CNKL":
+            raise ValueError(f"Invalid chunklist magic: {magic}")
+
+        # Each entry is a 4 byte length followed by a 32 byte SHA-256 checksum
+        table = memoryview(chunklist)[chunk_offset:chunk_offset + chunk_count * CHUNK_LENGTH]
+        if len(table) != chunk_count * CHUNK_LENGTH:
+            raise ValueError(f"Truncated chunklist: expected {chunk_count} chunks, found {len(table) // CHUNK_LENGTH}")
+
+        self.lengths:   array.array = array.array("I", (entry[0] for entry in struct.iter_unpack("<I32x", table)))
+        self.checksums: bytes       = b"".join(table[i + 4:i + CHUNK_LENGTH] for i in range(0, len(table), CHUNK_LENGTH))
+
+        # Start offset of each chunk, followed by the total size covered by the chunklist
+        self.offsets: array.array = array.array("Q", itertools.accumulate(self.lengths, initial=0))
+
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+
+    def length(self, index: int) -> int:
+        """
+        Length of the provided chunk
+        """
+        return self.lengths[index]
+
+
+    def offset(self, index: int) -> int:
+        """
+        Byte offset of the provided chunk within the file
+        """
+        return self.offsets[index]
+
+
+    def checksum(self, index: int) -> bytes:
+        """
+        SHA-256 checksum of the provided chunk
+        """
+        return self.checksums[index * 32:(index + 1) * 32]
+
+
 class ChunklistVerification:
     """
     Library to validate Apple's files against their chunklist format
@@ -33,6 +115,7 @@ class ChunklistVerification:
     Parameters:
         file_path      (Path): Path to the file to validate
         chunklist_path (Path): Path to the chunklist file
+        threads        (int):  Number of threads to hash chunks with during validate()
 
     Usage:
         >>> chunk_obj = ChunklistVerification("InstallAssistant.pkg", "InstallAssistant.pkg.integrityDataV1")
@@ -42,53 +125,226 @@ class ChunklistVerification:
 
         >>> if chunk_obj.status == ChunklistStatus.FAILURE:
         …     print(chunk_obj.error_msg)
+
+    Parallel usage (chunks hashed across multiple threads, reported in order):
+        >>> chunk_obj = ChunklistVerification("InstallAssistant.pkg", chunklist_stream, threads=VALIDATION_THREADS)
+        >>> chunk_obj.validate()
+
+    Streaming usage (verify while downloading, see network_handler.DownloadObject):
+        >>> chunk_obj = ChunklistVerification("InstallAssistant.pkg", chunklist_stream)
+        >>> download_obj = DownloadObject(url, "InstallAssistant.pkg", chunklist_verifier=chunk_obj)
+        >>> download_obj.download()
+
+        >>> if chunk_obj.status == ChunklistStatus.SUCCESS:
+        …     print("Already verified, no need to call validate()")
     """
 
-    def __init__(self, file_path: Path, chunklist_path: Union[Path, bytes]) -> None:
+    def __init__(self, file_path: Path, chunklist_path: Union[Path, bytes], threads: int = 1) -> None:
         if isinstance(chunklist_path, bytes):
             self.chunklist_path: bytes = chunklist_path
         else:
             self.chunklist_path: Path = Path(chunklist_path)
         self.file_path:          Path = Path(file_path)
+        self.threads:            int  = threads
 
-        self.chunks: dict = self._generate_chunks(self.chunklist_path)
+        self.chunks: Chunklist = self._generate_chunks(self.chunklist_path)
 
         self.error_msg:     str = ""
         self.current_chunk: int = 0
-        self.total_chunks:  int = len(self.chunks)
+        self.total_chunks:  int = len(self.chunks) if self.chunks else 0
+
+        # Start offset of each chunk, followed by the total size covered by the chunklist
+        self.chunk_offsets: array.array = self.chunks.offsets if self.chunks else array.array("Q", [0])
 
         self.status: ChunklistStatus = ChunklistStatus.IN_PROGRESS
 
+        # Chunks known to match their checksum, set as they're streamed or validated
+        # Allows find_failed_chunks() to skip chunks already verified
+        self._verified_chunks: bytearray = bytearray(self.total_chunks)
+
+        self._stream_lock:   threading.Lock = threading.Lock()
+        self._stream_states: dict = {}  # Chunk index -> [hash object, next expected offset]
 
-    def _generate_chunks(self, chunklist: Union[Path, bytes]) -> dict:
+
+    def _generate_chunks(self, chunklist: Union[Path, bytes]) -> Chunklist:
         """
-        Generate a dictionary of the chunklist header and chunks
+        Parse the chunklist header and chunks
 
         Parameters:
             chunklist (Path | bytes): Path to the chunklist file or the chunklist file itself
+
+        Returns:
+            Chunklist: Parsed chunklist, None if invalid
         """
 
         chunklist: bytes = chunklist if isinstance(chunklist, bytes) else chunklist.read_bytes()
 
-        # Ref: https://github.com/apple-oss-distributions/xnu/blob/xnu-8020.101.4/bsd/kern/chunklist.h#L59-L69
-        header: dict = {
-            "magic":       chunklist[:4],
-            "length":      int.from_bytes(chunklist[4:8], "little"),
-            "fileVersion": chunklist[8],
-            "chunkMethod": chunklist[9],
-            "sigMethod":   chunklist[10],
-            "chunkCount":  int.from_bytes(chunklist[12:20], "little"),
-            "chunkOffset": int.from_bytes(chunklist[20:28], "little"),
-            "sigOffset":   int.from_bytes(chunklist[28:36], "little")
-        }
-
-        if header["magic"] != b"CNKL":
+        try:
+            return Chunklist(chunklist)
+        except (ValueError, struct.error):
             return None
 
-        all_chunks = chunklist[header["chunkOffset"]:header["chunkOffset"]+header["chunkCount"]*CHUNK_LENGTH]
-        chunks = [{"length": int.from_bytes(all_chunks[i:i+4], "little"), "checksum": all_chunks[i+4:i+CHUNK_LENGTH]} for i in range(0, len(all_chunks), CHUNK_LENGTH)]
 
-        return chunks
+    def chunk_floor(self, offset: int) -> int:
+        """
+        Round offset down to the nearest chunk boundary
+
+        Parameters:
+            offset (int): Byte offset within the file
+
+        Returns:
+            int: Nearest chunk boundary at or before offset
+        """
+
+        if offset >= self.chunk_offsets[-1]:
+            return self.chunk_offsets[-1]
+        return self.chunk_offsets[bisect.bisect_right(self.chunk_offsets, offset) - 1]
+
+
+    def chunk_ceiling(self, offset: int) -> int:
+        """
+        Round offset up to the nearest chunk boundary
+
+        Parameters:
+            offset (int): Byte offset within the file
+
+        Returns:
+            int: Nearest chunk boundary at or after offset, or offset if beyond the chunklist
+        """
+
+        if offset >= self.chunk_offsets[-1]:
+            return offset
+        return self.chunk_offsets[bisect.bisect_left(self.chunk_offsets, offset)]
+
+
+    def aligned_ranges(self, ranges: list) -> list:
+        """
+        Shrink byte ranges to only contain whole chunks
+
+        Parameters:
+            ranges (list): List of [start, end] byte ranges, end inclusive
+
+        Returns:
+            list: List of [start, end] byte ranges covering whole chunks only
+        """
+
+        aligned = []
+        for start, end in ranges:
+            start = self.chunk_ceiling(start)
+            end   = self.chunk_floor(end + 1) - 1
+            if end >= start:
+                aligned.append([start, end])
+
+        return aligned
+
+
+    def stream_update(self, offset: int, data: bytes) -> bool:
+        """
+        Hash data as it's downloaded, verifying each chunk once complete
+
+        Data may arrive out of order, however each chunk must be fed sequentially
+        (ie. byte ranges aligned to chunk boundaries)
+        Thread safe as long as no two threads feed the same chunk
+
+        Parameters:
+            offset (int): Byte offset of data within the file
+            data (bytes): Data received
+
+        Returns:
+            bool: False if a chunk failed verification, True otherwise
+        """
+
+        if self.status == ChunklistStatus.FAILURE:
+            return False
+
+        if self.chunks is None:
+            self.error_msg = "Invalid chunklist"
+            self.status = ChunklistStatus.FAILURE
+            return False
+
+        view = memoryview(data)
+        while view:
+            if offset >= self.chunk_offsets[-1]:
+                return self._stream_failure(f"Received data beyond end of chunklist (offset {offset})")
+
+            index     = bisect.bisect_right(self.chunk_offsets, offset) - 1
+            chunk_end = self.chunk_offsets[index + 1]
+
+            with self._stream_lock:
+                if index not in self._stream_states:
+                    self._stream_states[index] = [hashlib.sha256(), self.chunk_offsets[index]]
+                state = self._stream_states[index]
+
+            if state[1] != offset:
+                return self._stream_failure(f"Chunk {index + 1} received out of order (expected offset {state[1]}, received {offset})")
+
+            length = min(len(view), chunk_end - offset)
+            state[0].update(view[:length])
+            state[1] += length
+            offset   += length
+            view      = view[length:]
+
+            if offset != chunk_end:
+                continue
+
+            with self._stream_lock:
+                del self._stream_states[index]
+
+            digest = state[0].digest()
+            if digest != self.chunks.checksum(index):
+                return self._stream_failure(f"Chunk {index + 1} checksum status FAIL: chunk sum {binascii.hexlify(self.chunks.checksum(index)).decode()}, calculated sum {binascii.hexlify(digest).decode()}")
+
+            self._verified_chunks[index] = 1
+            with self._stream_lock:
+                self.current_chunk += 1
+
+        return True
+
+
+    def stream_reset(self) -> None:
+        """
+        Discard all streaming progress, ie. when a download restarts from scratch
+        """
+
+        with self._stream_lock:
+            self._stream_states = {}
+            self._verified_chunks = bytearray(self.total_chunks)
+            self.current_chunk = 0
+            self.error_msg = ""
+            self.status = ChunklistStatus.IN_PROGRESS
+
+
+    def stream_finalize(self) -> None:
+        """
+        Mark streaming verification as finished
+        Succeeds only if every chunk was received and verified
+        """
+
+        if self.status == ChunklistStatus.FAILURE:
+            return
+
+        if self.chunks is None or self.current_chunk != self.total_chunks:
+            self._stream_failure(f"Only {self.current_chunk} of {self.total_chunks} chunks were verified")
+            return
+
+        self.status = ChunklistStatus.SUCCESS
+
+
+    def _stream_failure(self, msg: str) -> bool:
+        """
+        Mark streaming verification as failed
+
+        Parameters:
+            msg (str): Error message
+
+        Returns:
+            bool: Always False
+        """
+
+        self.error_msg = msg
+        self.status = ChunklistStatus.FAILURE
+        logging.info(self.error_msg)
+        return False
 
 
     def _validate(self) -> None:
@@ -112,12 +368,19 @@ class ChunklistVerification:
             logging.info(self.error_msg)
             return
 
+        self.current_chunk = 0
+
+        if self.threads > 1:
+            self._validate_parallel()
+            return
+
         with self.file_path.open("rb") as f:
-            for chunk in self.chunks:
+            for index in range(self.total_chunks):
                 self.current_chunk += 1
-                status = hashlib.sha256(f.read(chunk["length"])).digest()
-                if status != chunk["checksum"]:
-                    self.error_msg = f"Chunk {self.current_chunk} checksum status FAIL: chunk sum {binascii.hexlify(chunk['checksum']).decode()}, calculated sum {binascii.hexlify(status).decode()}"
+                status = hashlib.sha256(f.read(self.chunks.length(index))).digest()
+                self._verified_chunks[index] = status == self.chunks.checksum(index)
+                if status != self.chunks.checksum(index):
+                    self.error_msg = f"Chunk {self.current_chunk} checksum status FAIL: chunk sum {binascii.hexlify(self.chunks.checksum(index)).decode()}, calculated sum {binascii.hexlify(status).decode()}"
                     self.status = ChunklistStatus.FAILURE
                     logging.info(self.error_msg)
                     return
@@ -125,6 +388,95 @@ class ChunklistVerification:
         self.status = ChunklistStatus.SUCCESS
 
 
+    def _validate_parallel(self) -> None:
+        """
+        Validates provided file against chunklist using multiple threads
+
+        Results are checked in order, thus current_chunk only advances over
+        contiguously verified chunks, and the first failing chunk is always
+        the one reported
+        """
+
+        for index, status in self._hash_chunks(range(self.total_chunks)):
+            self.current_chunk = index + 1
+            self._verified_chunks[index] = status == self.chunks.checksum(index)
+            if status != self.chunks.checksum(index):
+                self.error_msg = f"Chunk {self.current_chunk} checksum status FAIL: chunk sum {binascii.hexlify(self.chunks.checksum(index)).decode()}, calculated sum {binascii.hexlify(status).decode()}"
+                self.status = ChunklistStatus.FAILURE
+                logging.info(self.error_msg)
+                return
+
+        self.status = ChunklistStatus.SUCCESS
+
+
+    def _hash_chunks(self, indices: list):
+        """
+        Hash the provided chunks of the file
+
+        Chunks are read with os.pread() and hashed in a bounded thread pool,
+        while results are yielded in the order requested
+
+        Parameters:
+            indices (list): Indices of chunks to hash
+
+        Yields:
+            tuple: Chunk index and its SHA-256 digest
+        """
+
+        def _hash_chunk(file_descriptor: int, index: int) -> bytes:
+            return hashlib.sha256(os.pread(file_descriptor, self.chunks.length(index), self.chunks.offset(index))).digest()
+
+        indices = list(indices)
+        file_descriptor = os.open(self.file_path, os.O_RDONLY)
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(self.threads, 1))
+        try:
+            # Limit chunks in flight, as each is held in memory until hashed
+            pending   = collections.deque()
+            submitted = 0
+            for index in indices:
+                while submitted < len(indices) and len(pending) < max(self.threads, 1) * 2:
+                    pending.append(executor.submit(_hash_chunk, file_descriptor, indices[submitted]))
+                    submitted += 1
+
+                yield index, pending.popleft().result()
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            os.close(file_descriptor)
+
+
+    def find_failed_chunks(self, indices: list = None) -> list:
+        """
+        Hash chunks of the file, collecting every chunk that fails verification
+        Unlike validate(), doesn't stop at the first failure
+
+        Chunks already verified while streaming or validating are skipped,
+        so after validate() stops at a failure only the chunks from that point on are hashed
+
+        Parameters:
+            indices (list): Indices of chunks to check, defaults to all chunks not yet verified
+
+        Returns:
+            list: Indices of failing chunks
+        """
+
+        if self.chunks is None:
+            return []
+
+        if indices is None:
+            indices = [index for index in range(self.total_chunks) if not self._verified_chunks[index]]
+
+        failed_chunks = []
+        self.current_chunk = self.total_chunks - len(indices)
+        for index, status in self._hash_chunks(indices):
+            self.current_chunk += 1
+            self._verified_chunks[index] = status == self.chunks.checksum(index)
+            if status != self.chunks.checksum(index):
+                logging.info(f"Chunk {index + 1} checksum status FAIL")
+                failed_chunks.append(index)
+
+        return failed_chunks
+
+
     def validate(self) -> None:
         """
         Spawns _validate() thread
@@ -2,18 +2,24 @@
 # Copyright (C) 2022-2023, Dhinak G, Mykola Grymalyuk
 
 import datetime
+import hashlib
+import bisect
+import json
 from pathlib import Path
 from typing import cast
+from xml.parsers.expat import ExpatError
 import tempfile
 import plistlib
 
 import packaging.version
-import requests
 
 import subprocess
 import os
+import shutil
 
 import logging
+import threading
+import concurrent.futures
 
 from resources import utilities, network_handler, constants
 from data import os_data
@@ -23,6 +29,372 @@ KDK_INFO_PLIST:   str  = "KDKInfo.plist"
 KDK_API_LINK:     str  = "https://dortania.github.io/KdkSupportPkg/manifest.json"
 
 KDK_ASSET_LIST:   list = None
+KDK_CATALOG:      "KernelDebugKitCatalog" = None  # Index of KDK_ASSET_LIST, built once per session
+
+KDK_ASSET_LIST_SNAPSHOT: bool = False  # KDK_ASSET_LIST was loaded from disk without contacting the API, and may be outdated
+KDK_ASSET_LIST_REFRESH:  threading.Thread = None  # Background refresh of the saved KDK list
+
+KDK_RECEIPTS_PATH:         str  = "/var/db/receipts"  # Installer pkg receipts, changed whenever a KDK is (re)installed
+KDK_VALIDATION_CACHE_PATH: Path = network_handler.METADATA_CACHE_PATH / Path("KDKValidation.plist")  # Validated KDKs, keyed by path, inode, modification times and pkg receipt
+KDK_VALIDATION_THREADS:    int  = 16  # Concurrent stats when checking a KDK against its pkg receipt
+
+KDK_BACKUP_STORE_PATH: str = f"{KDK_INSTALL_PATH}/.Backups"  # Content-addressed backups of installed KDKs, see KernelDebugKitBackupStore
+
+KDK_MANIFEST_CHECKSUMS: list = [  # Checksum fields provided by the KdkSupportPkg API, strongest first
+    ("sha256sum", "sha256"),
+    ("sha1sum",   "sha1"),
+    ("md5sum",    "md5"),
+]
+
+
+class KernelDebugKitCatalog:
+    """
+    Index of the KdkSupportPkg API's KDK list
+
+    Versions are parsed once, with entries grouped by build and by major macOS version,
+    so lookups don't need to walk and re-parse the whole list
+
+    Usage:
+        >>> catalog = KernelDebugKitCatalog(kdk_list)
+        >>> kdk = catalog.exact_build("22E261")
+        >>> kdk = catalog.closest_older(packaging.version.parse("13.3.1"))
+        >>> kdk = catalog.latest_for_major(13)
+    """
+
+    def __init__(self, kdk_list: list) -> None:
+        self.kdk_list: list = kdk_list
+
+        self._by_build:          dict = {}  # Build -> first entry listed with that build
+        self._by_major:          dict = {}  # Major version -> entries, sorted by ascending version
+        self._versions_by_major: dict = {}  # Major version -> parsed versions, parallel to _by_major for bisecting
+
+        self._build_index()
+
+
+    def _build_index(self) -> None:
+        """
+        Parse versions and group entries
+        The API lists newest first, so among equal versions the earliest listed is preferred
+        """
+
+        grouped = {}
+        for index, kdk in enumerate(self.kdk_list):
+            self._by_build.setdefault(kdk["build"], kdk)
+            try:
+                version = cast(packaging.version.Version, packaging.version.parse(kdk["version"]))
+            except packaging.version.InvalidVersion:
+                logging.info(f"Skipping KDK with unparsable version: {kdk['build']} ({kdk['version']})")
+                continue
+            grouped.setdefault(version.major, []).append((version, -index, kdk))
+
+        for major, entries in grouped.items():
+            entries.sort(key=lambda entry: entry[:2])
+            self._by_major[major]          = [entry[2] for entry in entries]
+            self._versions_by_major[major] = [entry[0] for entry in entries]
+
+
+    def exact_build(self, build: str) -> dict or None:
+        """
+        Find the KDK for a build
+
+        Parameters:
+            build (str): macOS build (ie. 22E261)
+
+        Returns:
+            dict: KDK entry, None if not listed
+        """
+
+        return self._by_build.get(build)
+
+
+    def closest_older(self, version: packaging.version.Version) -> dict or None:
+        """
+        Find the newest KDK not newer than a macOS version, from the same or previous minor release
+
+        Parameters:
+            version (packaging.version.Version): macOS version (ie. 13.3.1)
+
+        Returns:
+            dict: KDK entry, None if no suitable KDK is listed
+        """
+
+        versions = self._versions_by_major.get(version.major)
+        if not versions:
+            return None
+
+        index = bisect.bisect_right(versions, version) - 1
+        if index < 0 or versions[index].minor < version.minor - 1:
+            return None
+
+        return self._by_major[version.major][index]
+
+
+    def latest_for_major(self, major: int) -> dict or None:
+        """
+        Find the newest KDK for a major macOS version
+
+        Parameters:
+            major (int): Major macOS version (ie. 13)
+
+        Returns:
+            dict: KDK entry, None if none listed
+        """
+
+        entries = self._by_major.get(major)
+        if not entries:
+            return None
+
+        return entries[-1]
+
+
+class LocalKernelDebugKitValidator:
+    """
+    Validates installed KDKs against their pkg receipts
+
+    macOS deletes files from KDKs during OS updates, similar to how Install macOS.app is
+    deleted during OS updates. A full check stats every file listed in the KDK's receipt,
+    so successful results are cached. A KDK is trusted without re-scanning while its path,
+    inode, modification times, receipt and the running kernel are unchanged. An OS update
+    changes the kernel, so every KDK is checked again afterwards.
+
+    Usage:
+        >>> validator = LocalKernelDebugKitValidator()
+        >>> if not validator.validate(Path("/Library/Developer/KDKs/KDK_13.3_22E252.kdk")):
+        >>>     print("KDK is corrupted")
+
+        >>> # List receipt contents without pkgutil (ie. for testing)
+        >>> validator = LocalKernelDebugKitValidator(receipt_runner=lambda kdk_build: recorded_files[kdk_build], receipts_path="/tmp/receipts", cache_path="/tmp/KDKValidation.plist")
+    """
+
+    def __init__(self, receipt_runner = None, receipts_path: str = KDK_RECEIPTS_PATH, cache_path: Path = KDK_VALIDATION_CACHE_PATH) -> None:
+        self.receipts_path: Path = Path(receipts_path)
+        self.cache_path:    Path = Path(cache_path)
+
+        # Callable taking a KDK build, returning the paths listed in its pkg receipt, or None without a receipt
+        self.receipt_runner = receipt_runner
+        if self.receipt_runner is None:
+            self.receipt_runner = self._pkgutil_receipt_files
+
+        self._cache: dict = self._load_cache()
+
+
+    def validate(self, kdk_path: Path) -> bool:
+        """
+        Validates provided KDK, ensure no corruption
+
+        Parameters:
+            kdk_path (Path): Path to KDK
+
+        Returns:
+            bool: True if valid, False if invalid
+        """
+
+        kdk_path = Path(kdk_path)
+        system_version = kdk_path / Path("System/Library/CoreServices/SystemVersion.plist")
+
+        if not system_version.exists():
+            logging.info(f"Corrupted KDK found ({kdk_path.name}), missing SystemVersion.plist")
+            self._forget(kdk_path)
+            return False
+
+        # Get build from KDK
+        kdk_plist_data = plistlib.load(system_version.open("rb"))
+        if "ProductBuildVersion" not in kdk_plist_data:
+            logging.info(f"Corrupted KDK found ({kdk_path.name}), missing ProductBuildVersion")
+            self._forget(kdk_path)
+            return False
+
+        kdk_build = kdk_plist_data["ProductBuildVersion"]
+
+        key = self._cache_key(kdk_path, kdk_build)
+        if key is not None and self._cache.get(str(kdk_path)) == key:
+            logging.info(f"KDK unchanged since last validation ({kdk_path.name}), skipping file check")
+            return True
+
+        # Check pkg receipts for this build, will give a canonical list if all files that should be present
+        files = self.receipt_runner(kdk_build)
+        if files is None:
+            # If pkg receipt is missing, we'll fallback to legacy validation
+            logging.info(f"pkg receipt missing for {kdk_path.name}, falling back to legacy validation")
+            return self._validate_legacy(kdk_path)
+
+        missing = self._first_missing_file(kdk_path, [file for file in files if file.startswith("System/Library/Extensions")])
+        if missing:
+            logging.info(f"Corrupted KDK found ({kdk_path.name}), missing file: {missing}")
+            self._forget(kdk_path)
+            return False
+
+        if key is not None:
+            self._cache[str(kdk_path)] = key
+            self._save_cache()
+
+        return True
+
+
+    def _validate_legacy(self, kdk_path: Path) -> bool:
+        """
+        Legacy variant of validating provided KDK
+        Uses best guess of files that should be present
+        This should ideally never be invoked, but used as a fallback
+
+        Parameters:
+            kdk_path (Path): Path to KDK
+
+        Returns:
+            bool: True if valid, False if invalid
+        """
+
+        KEXT_CATALOG = [
+            "System.kext/PlugIns/Libkern.kext/Libkern",
+            "apfs.kext/Contents/MacOS/apfs",
+            "IOUSBHostFamily.kext/Contents/MacOS/IOUSBHostFamily",
+            "AMDRadeonX6000.kext/Contents/MacOS/AMDRadeonX6000",
+        ]
+
+        for kext in KEXT_CATALOG:
+            if not Path(f"{kdk_path}/System/Library/Extensions/{kext}").exists():
+                logging.info(f"Corrupted KDK found, missing: {kdk_path}/System/Library/Extensions/{kext}")
+                return False
+
+        return True
+
+
+    def _first_missing_file(self, kdk_path: Path, files: list) -> str or None:
+        """
+        Checks files exist, splitting the stats across threads
+
+        Parameters:
+            kdk_path (Path): Path to KDK
+            files (list):    Paths relative to the KDK
+
+        Returns:
+            str: First missing file in listed order, None if all present
+        """
+
+        if not files:
+            return None
+
+        def _first_missing(batch: list) -> str or None:
+            for file in batch:
+                if not os.path.exists(f"{kdk_path}/{file}"):
+                    return file
+            return None
+
+        batch_size = -(-len(files) // KDK_VALIDATION_THREADS)
+        batches = [files[i:i + batch_size] for i in range(0, len(files), batch_size)]
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(batches)) as executor:
+            for missing in executor.map(_first_missing, batches):
+                if missing:
+                    return missing
+
+        return None
+
+
+    def _cache_key(self, kdk_path: Path, kdk_build: str) -> dict or None:
+        """
+        Generates the state a cached validation result is tied to
+
+        Parameters:
+            kdk_path (Path): Path to KDK
+            kdk_build (str): Build of the KDK
+
+        Returns:
+            dict: KDK and receipt state, None if unavailable
+        """
+
+        try:
+            kdk_stat        = kdk_path.stat()
+            extensions_stat = (kdk_path / Path("System/Library/Extensions")).stat()
+        except OSError:
+            return None
+
+        receipt_hash = hashlib.sha256()
+        for extension in ["bom", "plist"]:
+            receipt = self.receipts_path / Path(f"com.apple.pkg.KDK.{kdk_build}.{extension}")
+            try:
+                with receipt.open("rb") as file:
+                    receipt_hash.update(hashlib.file_digest(file, "sha256").digest())
+            except OSError:
+                receipt_hash.update(b"\0")
+
+        return {
+            "Build":              kdk_build,
+            "Inode":              kdk_stat.st_ino,
+            "Modified":           kdk_stat.st_mtime_ns,
+            "ExtensionsModified": extensions_stat.st_mtime_ns,
+            "Receipt":            receipt_hash.hexdigest(),
+            "Kernel":             os.uname().version,
+        }
+
+
+    def _forget(self, kdk_path: Path) -> None:
+        """
+        Drops the cached validation result of a KDK
+
+        Parameters:
+            kdk_path (Path): Path to KDK
+        """
+
+        if self._cache.pop(str(kdk_path), None) is not None:
+            self._save_cache()
+
+
+    def _pkgutil_receipt_files(self, kdk_build: str) -> list or None:
+        """
+        Default receipt runner, lists the KDK's pkg receipt with pkgutil
+
+        Parameters:
+            kdk_build (str): Build of the KDK
+
+        Returns:
+            list: Paths relative to the KDK, None if no receipt is installed
+        """
+
+        result = subprocess.run(["/usr/sbin/pkgutil", "--files", f"com.apple.pkg.KDK.{kdk_build}"], capture_output=True)
+        if result.returncode != 0:
+            return None
+
+        return result.stdout.decode("utf-8").splitlines()
+
+
+    def _load_cache(self) -> dict:
+        """
+        Loads previously validated KDKs
+
+        Returns:
+            dict: KDK paths mapped to the state they were validated in
+        """
+
+        if not self.cache_path.exists():
+            return {}
+
+        try:
+            cache = plistlib.load(self.cache_path.open("rb"))
+        except Exception as e:
+            logging.info(f"Unable to read KDK validation cache: {e}")
+            return {}
+
+        if not isinstance(cache, dict):
+            return {}
+
+        return cache
+
+
+    def _save_cache(self) -> None:
+        """
+        Saves validated KDKs, dropping KDKs no longer present
+        """
+
+        self._cache = {path: key for path, key in self._cache.items() if Path(path).exists()}
+
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = Path(f"{self.cache_path}.tmp")
+            with temp_path.open("wb") as file:
+                plistlib.dump(self._cache, file)
+            temp_path.replace(self.cache_path)
+        except Exception as e:
+            logging.info(f"Unable to save KDK validation cache: {e}")
 
 
 class KernelDebugKitObject:
@@ -45,17 +417,21 @@ class KernelDebugKitObject:
         >>>         kdk_download_object = kdk_object.retrieve_download()
 
         >>>         # Once downloaded, recommend verifying KDK's checksum
+        >>>         # Uses the checksum calculated during download when available
         >>>         valid = kdk_object.validate_kdk_checksum()
     """
 
     def __init__(self, global_constants: constants.Constants,
                  host_build: str, host_version: str,
                  ignore_installed: bool = False, passive: bool = False,
-                 check_backups_only: bool = False
+                 check_backups_only: bool = False,
+                 validator: LocalKernelDebugKitValidator = None
         ) -> None:
 
         self.constants: constants.Constants = global_constants
 
+        self.validator: LocalKernelDebugKitValidator = validator or LocalKernelDebugKitValidator()  # Checks installed KDKs for corruption
+
         self.host_build:   str = host_build    # ex. 20A5384c
         self.host_version: str = host_version  # ex. 11.0.1
 
@@ -73,6 +449,9 @@ class KernelDebugKitObject:
 
         self.kdk_url_expected_size: int = 0
 
+        self.kdk_url_checksum_algorithm: str = ""  # hashlib algorithm of the checksum in the KdkSupportPkg API, if any
+        self.kdk_url_expected_checksum:  str = ""
+
         self.kdk_url_is_exactly_match: bool = False
 
         self.kdk_closest_match_url:         str = ""
@@ -81,6 +460,11 @@ class KernelDebugKitObject:
 
         self.kdk_closest_match_url_expected_size: int = 0
 
+        self.kdk_closest_match_url_checksum_algorithm: str = ""
+        self.kdk_closest_match_url_expected_checksum:  str = ""
+
+        self.kdk_download_obj: network_handler.DownloadObject = None
+
         self.success: bool = False
 
         self.error_msg: str = ""
@@ -88,42 +472,154 @@ class KernelDebugKitObject:
         self._get_latest_kdk()
 
 
-    def _get_remote_kdks(self) -> list or None:
+    def _get_remote_kdks(self, allow_snapshot: bool = True) -> list or None:
         """
         Fetches a list of available KDKs from the KdkSupportPkg API
         Additionally caches the list for future use, avoiding extra API calls
 
+        The API response is saved on disk. If a saved copy exists, it's used without
+        contacting the API and refreshed in the background, so resolving a KDK never
+        waits on the network. Otherwise the API is queried directly.
+
+        Parameters:
+            allow_snapshot (bool): Use the saved copy without contacting the API
+
         Returns:
             list: A list of KDKs, sorted by version and date if available. Returns None if the API is unreachable
         """
 
         global KDK_ASSET_LIST
+        global KDK_ASSET_LIST_SNAPSHOT
 
-        logging.info("Pulling KDK list from KdkSupportPkg API")
-        if KDK_ASSET_LIST:
+        if KDK_ASSET_LIST and (allow_snapshot or KDK_ASSET_LIST_SNAPSHOT is False):
             return KDK_ASSET_LIST
 
-        try:
-            results = network_handler.NetworkUtilities().get(
-                KDK_API_LINK,
-                headers={
-                    "User-Agent": "OpenCore-Legacy-Patcher"
-                },
-                timeout=5
-            )
-        except (requests.exceptions.Timeout, requests.exceptions.TooManyRedirects, requests.exceptions.ConnectionError):
-            logging.info("Couldn't contact KDK API")
-            return None
+        cache = network_handler.MetadataCache(KDK_API_LINK)
 
-        if results.status_code != 200:
+        if allow_snapshot:
+            kdk_list = self._parse_kdk_list(cache.get_cached())
+            if kdk_list is not None:
+                logging.info("Using saved KDK list, refreshing in the background")
+                KDK_ASSET_LIST = kdk_list
+                KDK_ASSET_LIST_SNAPSHOT = True
+                self._refresh_remote_kdks_async()
+                return KDK_ASSET_LIST
+
+        logging.info("Pulling KDK list from KdkSupportPkg API")
+        results = cache.get(
+            headers={
+                "User-Agent": "OpenCore-Legacy-Patcher"
+            },
+            timeout=5,
+            revalidate=not allow_snapshot
+        )
+        if results is None:
             logging.info("Couldn't fetch KDK list")
             return None
 
-        KDK_ASSET_LIST = results.json()
+        kdk_list = self._parse_kdk_list(results)
+        if kdk_list is None:
+            cache.invalidate()
+            return None
+
+        KDK_ASSET_LIST = kdk_list
+        # Copies served within the cache's TTL, or while the API is unreachable, weren't checked against the API either
+        KDK_ASSET_LIST_SNAPSHOT = not cache.revalidated
 
         return KDK_ASSET_LIST
 
 
+    def _refresh_remote_kdks_async(self) -> None:
+        """
+        Refreshes the saved KDK list in the background, if stale
+        Later KernelDebugKitObject instances pick up the refreshed list
+        """
+
+        global KDK_ASSET_LIST_REFRESH
+
+        if KDK_ASSET_LIST_REFRESH is not None:
+            return
+
+        KDK_ASSET_LIST_REFRESH = network_handler.MetadataCache(KDK_API_LINK).refresh_async(
+            headers={
+                "User-Agent": "OpenCore-Legacy-Patcher"
+            },
+            timeout=5,
+            callback=self._update_remote_kdks
+        )
+
+
+    def _update_remote_kdks(self, content: bytes) -> None:
+        """
+        Replaces the KDK list with a copy refreshed in the background
+
+        Parameters:
+            content (bytes): KdkSupportPkg API response
+        """
+
+        global KDK_ASSET_LIST
+        global KDK_ASSET_LIST_SNAPSHOT
+
+        kdk_list = self._parse_kdk_list(content)
+        if kdk_list is None:
+            return
+
+        logging.info("Refreshed saved KDK list")
+        KDK_ASSET_LIST = kdk_list
+        KDK_ASSET_LIST_SNAPSHOT = False
+
+
+    def _parse_kdk_list(self, content: bytes) -> list or None:
+        """
+        Parses a KdkSupportPkg API response
+
+        Parameters:
+            content (bytes): API response
+
+        Returns:
+            list: A list of KDKs, None if missing or unparsable
+        """
+
+        if content is None:
+            return None
+
+        try:
+            kdk_list = json.loads(content)
+        except json.JSONDecodeError:
+            logging.info("Couldn't parse KDK list")
+            return None
+
+        if not isinstance(kdk_list, list):
+            logging.info("Couldn't parse KDK list")
+            return None
+
+        return kdk_list
+
+
+    def _get_remote_kdk_catalog(self, allow_snapshot: bool = True) -> KernelDebugKitCatalog or None:
+        """
+        Fetches the KDK list, indexed for lookups
+        The index is built once and shared between KernelDebugKitObject instances
+
+        Parameters:
+            allow_snapshot (bool): Use the saved KDK list without contacting the API
+
+        Returns:
+            KernelDebugKitCatalog: Indexed KDK list. Returns None if the API is unreachable
+        """
+
+        global KDK_CATALOG
+
+        kdk_list = self._get_remote_kdks(allow_snapshot=allow_snapshot)
+        if kdk_list is None:
+            return None
+
+        if KDK_CATALOG is None or KDK_CATALOG.kdk_list is not kdk_list:
+            KDK_CATALOG = KernelDebugKitCatalog(kdk_list)
+
+        return KDK_CATALOG
+
+
     def _get_latest_kdk(self, host_build: str = None, host_version: str = None) -> None:
         """
         Fetches the latest KDK for the current macOS version
@@ -153,9 +649,9 @@ class KernelDebugKitObject:
             self.success = True
             return
 
-        remote_kdk_version = self._get_remote_kdks()
+        remote_kdk_catalog = self._get_remote_kdk_catalog()
 
-        if remote_kdk_version is None:
+        if remote_kdk_catalog is None:
             logging.warning("Failed to fetch KDK list, falling back to local KDK matching")
 
             # First check if a KDK matching the current macOS version is installed
@@ -184,41 +680,84 @@ class KernelDebugKitObject:
 
             return
 
+        matched = self._match_remote_kdk(remote_kdk_catalog, host_build, host_version, parsed_version)
+        installed_path = self._local_kdk_installed(match=self.kdk_url_build) if matched else None
+
+        # The saved KDK list may predate this build, check the API before settling on a download
+        # Not needed if a suitable KDK is already installed
+        outdated = KDK_ASSET_LIST_SNAPSHOT or remote_kdk_catalog.kdk_list is not KDK_ASSET_LIST
+        if outdated and self.kdk_url_is_exactly_match is False and not installed_path:
+            logging.info("Saved KDK list has no direct match, checking KdkSupportPkg API")
+            refreshed_catalog = self._get_remote_kdk_catalog(allow_snapshot=False)
+            if refreshed_catalog is not None and refreshed_catalog is not remote_kdk_catalog:
+                matched_build = self.kdk_url_build if matched else None
+                matched = self._match_remote_kdk(refreshed_catalog, host_build, host_version, parsed_version)
+                if matched and self.kdk_url_build != matched_build:
+                    installed_path = self._local_kdk_installed(match=self.kdk_url_build)
+
+        if matched is False:
+            return
+
+        # Check if this KDK is already installed
+        self.kdk_installed_path = installed_path
+        if self.kdk_installed_path:
+            logging.info(f"KDK already installed ({Path(self.kdk_installed_path).name}), skipping")
+            self.kdk_already_installed = True
+            self.success = True
+            return
+
+        logging.info("Following KDK is recommended:")
+        logging.info(f"- KDK Build: {self.kdk_url_build}")
+        logging.info(f"- KDK Version: {self.kdk_url_version}")
+        logging.info(f"- KDK URL: {self.kdk_url}")
+
+        self.success = True
+
+
+    def _match_remote_kdk(self, catalog: KernelDebugKitCatalog, host_build: str, host_version: str, parsed_version: packaging.version.Version) -> bool:
+        """
+        Selects the KDK matching the host, falling back to the closest older KDK
+
+        Parameters:
+            catalog (KernelDebugKitCatalog):            Indexed KDK list
+            host_build (str):                           Build of the macOS version
+            host_version (str):                         Version of the macOS version
+            parsed_version (packaging.version.Version): Parsed host_version
+
+        Returns:
+            bool: True if a KDK was selected, False if none are suitable
+        """
+
+        self.kdk_url = ""
+        self.kdk_closest_match_url = ""
+        self.kdk_url_is_exactly_match = False
+
         # First check exact match
-        for kdk in remote_kdk_version:
-            if (kdk["build"] != host_build):
-                continue
+        kdk = catalog.exact_build(host_build)
+        if kdk:
             self.kdk_url = kdk["url"]
             self.kdk_url_build = kdk["build"]
             self.kdk_url_version = kdk["version"]
             self.kdk_url_expected_size = kdk["fileSize"]
+            self.kdk_url_checksum_algorithm, self.kdk_url_expected_checksum = self._get_manifest_checksum(kdk)
             self.kdk_url_is_exactly_match = True
-            break
 
         # If no exact match, check for closest match
         if self.kdk_url == "":
-            for kdk in remote_kdk_version:
-                kdk_version = cast(packaging.version.Version, packaging.version.parse(kdk["version"]))
-                if kdk_version > parsed_version:
-                    continue
-                if kdk_version.major != parsed_version.major:
-                    continue
-                if kdk_version.minor not in range(parsed_version.minor - 1, parsed_version.minor + 1):
-                    continue
-
-                # The KDK list is already sorted by version then date, so the first match is the closest
+            kdk = catalog.closest_older(parsed_version)
+            if kdk:
                 self.kdk_closest_match_url = kdk["url"]
                 self.kdk_closest_match_url_build = kdk["build"]
                 self.kdk_closest_match_url_version = kdk["version"]
                 self.kdk_closest_match_url_expected_size = kdk["fileSize"]
+                self.kdk_closest_match_url_checksum_algorithm, self.kdk_closest_match_url_expected_checksum = self._get_manifest_checksum(kdk)
                 self.kdk_url_is_exactly_match = False
-                break
 
         if self.kdk_url == "":
             if self.kdk_closest_match_url == "":
                 logging.warning(f"No KDKs found for {host_build} ({host_version})")
                 self.error_msg = f"No KDKs found for {host_build} ({host_version})"
-                return
+                return False
             logging.info(f"No direct match found for {host_build}, falling back to closest match")
             logging.info(f"Closest Match: {self.kdk_closest_match_url_build} ({self.kdk_closest_match_url_version})")
 
@@ -226,32 +765,21 @@ class KernelDebugKitObject:
             self.kdk_url_build = self.kdk_closest_match_url_build
             self.kdk_url_version = self.kdk_closest_match_url_version
             self.kdk_url_expected_size = self.kdk_closest_match_url_expected_size
+            self.kdk_url_checksum_algorithm = self.kdk_closest_match_url_checksum_algorithm
+            self.kdk_url_expected_checksum = self.kdk_closest_match_url_expected_checksum
         else:
             logging.info(f"Direct match found for {host_build} ({host_version})")
 
-
-        # Check if this KDK is already installed
-        self.kdk_installed_path = self._local_kdk_installed(match=self.kdk_url_build)
-        if self.kdk_installed_path:
-            logging.info(f"KDK already installed ({Path(self.kdk_installed_path).name}), skipping")
-            self.kdk_already_installed = True
-            self.success = True
-            return
-
-        logging.info("Following KDK is recommended:")
-        logging.info(f"- KDK Build: {self.kdk_url_build}")
-        logging.info(f"- KDK Version: {self.kdk_url_version}")
-        logging.info(f"- KDK URL: {self.kdk_url}")
-
-        self.success = True
+        return True
 
 
-    def retrieve_download(self, override_path: str = "") -> network_handler.DownloadObject or None:
+    def retrieve_download(self, override_path: str = "", priority: network_handler.DownloadPriority = network_handler.DownloadPriority.INTERACTIVE) -> network_handler.DownloadObject or None:
         """
         Returns a DownloadObject for the KDK
 
         Parameters:
             override_path (str): Override the default download path
+            priority (DownloadPriority): Scheduling priority, BACKGROUND for unattended caching
 
         Returns:
             DownloadObject: DownloadObject for the KDK, None if no download required
@@ -277,84 +805,64 @@ class KernelDebugKitObject:
         kdk_plist_path = Path(f"{kdk_download_path.parent}/{KDK_INFO_PLIST}") if override_path == "" else Path(f"{Path(override_path).parent}/{KDK_INFO_PLIST}")
 
         self._generate_kdk_info_plist(kdk_plist_path)
-        return network_handler.DownloadObject(self.kdk_url, kdk_download_path)
 
+        # Hash while downloading if the API provides a checksum, avoids re-reading the disk image afterwards
+        self.kdk_download_obj = network_handler.DownloadObject(
+            self.kdk_url,
+            kdk_download_path,
+            connections=network_handler.SEGMENTED_DOWNLOAD_CONNECTIONS,
+            checksum_algorithm=self.kdk_url_checksum_algorithm or None,
+            priority=priority,
+            cache=network_handler.DOWNLOAD_CACHE
+        )
+        return self.kdk_download_obj
 
-    def _generate_kdk_info_plist(self, plist_path: str) -> None:
-        """
-        Generates a KDK Info.plist
-        """
-
-        plist_path = Path(plist_path)
-        if plist_path.exists():
-            plist_path.unlink()
-
-        kdk_dict = {
-            "build": self.kdk_url_build,
-            "version": self.kdk_url_version,
-        }
 
-        try:
-            plist_path.touch()
-            plistlib.dump(kdk_dict, plist_path.open("wb"), sort_keys=False)
-        except Exception as e:
-            logging.error(f"Failed to generate KDK Info.plist: {e}")
-
-
-    def _local_kdk_valid(self, kdk_path: Path) -> bool:
+    def _get_manifest_checksum(self, kdk: dict) -> tuple:
         """
-        Validates provided KDK, ensure no corruption
-
-        The reason for this is due to macOS deleting files from the KDK during OS updates,
-        similar to how Install macOS.app is deleted during OS updates
-
-        Uses Apple's pkg receipt system to verify the original contents of the KDK
+        Fetches the strongest checksum provided for a KDK by the KdkSupportPkg API
 
         Parameters:
-            kdk_path (Path): Path to KDK
+            kdk (dict): KDK entry from the KdkSupportPkg API
 
         Returns:
-            bool: True if valid, False if invalid
+            tuple: hashlib algorithm and expected checksum, empty strings if none provided
         """
 
-        if not Path(f"{kdk_path}/System/Library/CoreServices/SystemVersion.plist").exists():
-            logging.info(f"Corrupted KDK found ({kdk_path.name}), removing due to missing SystemVersion.plist")
-            self._remove_kdk(kdk_path)
-            return False
+        for key, algorithm in KDK_MANIFEST_CHECKSUMS:
+            if kdk.get(key):
+                return (algorithm, kdk[key].lower())
 
-        # Get build from KDK
-        kdk_plist_data = plistlib.load(Path(f"{kdk_path}/System/Library/CoreServices/SystemVersion.plist").open("rb"))
-        if "ProductBuildVersion" not in kdk_plist_data:
-            logging.info(f"Corrupted KDK found ({kdk_path.name}), removing due to missing ProductBuildVersion")
-            self._remove_kdk(kdk_path)
-            return False
+        return ("", "")
 
-        kdk_build = kdk_plist_data["ProductBuildVersion"]
 
-        # Check pkg receipts for this build, will give a canonical list if all files that should be present
-        result = subprocess.run(["/usr/sbin/pkgutil", "--files", f"com.apple.pkg.KDK.{kdk_build}"], capture_output=True)
-        if result.returncode != 0:
-            # If pkg receipt is missing, we'll fallback to legacy validation
-            logging.info(f"pkg receipt missing for {kdk_path.name}, falling back to legacy validation")
-            return self._local_kdk_valid_legacy(kdk_path)
+    def _generate_kdk_info_plist(self, plist_path: str) -> None:
+        """
+        Generates a KDK Info.plist
+        """
+
+        plist_path = Path(plist_path)
+        if plist_path.exists():
+            plist_path.unlink()
 
-        # Go through each line of the pkg receipt and ensure it exists
-        for line in result.stdout.decode("utf-8").splitlines():
-            if not line.startswith("System/Library/Extensions"):
-                continue
-            if not Path(f"{kdk_path}/{line}").exists():
-                logging.info(f"Corrupted KDK found ({kdk_path.name}), removing due to missing file: {line}")
-                self._remove_kdk(kdk_path)
-                return False
+        kdk_dict = {
+            "build": self.kdk_url_build,
+            "version": self.kdk_url_version,
+        }
 
-        return True
+        try:
+            plist_path.touch()
+            plistlib.dump(kdk_dict, plist_path.open("wb"), sort_keys=False)
+        except Exception as e:
+            logging.error(f"Failed to generate KDK Info.plist: {e}")
 
 
-    def _local_kdk_valid_legacy(self, kdk_path: Path) -> bool:
+    def _local_kdk_valid(self, kdk_path: Path) -> bool:
         """
-        Legacy variant of validating provided KDK
-        Uses best guess of files that should be present
-        This should ideally never be invoked, but used as a fallback
+        Validates provided KDK, ensure no corruption
+        Corrupted KDKs are removed
+
+        See LocalKernelDebugKitValidator for details
 
         Parameters:
             kdk_path (Path): Path to KDK
@@ -363,20 +871,12 @@ class KernelDebugKitObject:
             bool: True if valid, False if invalid
         """
 
-        KEXT_CATALOG = [
-            "System.kext/PlugIns/Libkern.kext/Libkern",
-            "apfs.kext/Contents/MacOS/apfs",
-            "IOUSBHostFamily.kext/Contents/MacOS/IOUSBHostFamily",
-            "AMDRadeonX6000.kext/Contents/MacOS/AMDRadeonX6000",
-        ]
-
-        for kext in KEXT_CATALOG:
-            if not Path(f"{kdk_path}/System/Library/Extensions/{kext}").exists():
-                logging.info(f"Corrupted KDK found, removing due to missing: {kdk_path}/System/Library/Extensions/{kext}")
-                self._remove_kdk(kdk_path)
-                return False
+        if self.validator.validate(kdk_path):
+            return True
 
-        return True
+        logging.info(f"Removing corrupted KDK: {Path(kdk_path).name}")
+        self._remove_kdk(kdk_path)
+        return False
 
 
     def _local_kdk_installed(self, match: str = None, check_version: bool = False) -> str or None:
@@ -444,6 +944,30 @@ class KernelDebugKitObject:
                 logging.info("KDK restoration skipped, running in passive mode")
                 return kdk_pkg
 
+        # Finally check the backup store, holding installed KDKs
+        for backup_name in KernelDebugKitBackupStore().list_backups():
+            if check_version:
+                if match not in backup_name:
+                    continue
+            else:
+                if not backup_name.endswith(f"{match}.kdk"):
+                    continue
+
+            logging.info(f"Found KDK backup: {backup_name}")
+            if self.passive is True:
+                # Unlike packages, stored KDKs can't be handed out without restoring them
+                logging.info("KDK restoration skipped, running in passive mode")
+                continue
+
+            logging.info("Attempting KDK restoration")
+            if KernelDebugKitUtilities().install_kdk_backup(backup_name) is False:
+                continue
+
+            kdk_folder = Path(KDK_INSTALL_PATH) / Path(backup_name)
+            if self._local_kdk_valid(kdk_folder):
+                logging.info("Successfully restored KDK")
+                return kdk_folder
+
         return None
 
 
@@ -513,11 +1037,25 @@ class KernelDebugKitObject:
                     continue
                 self._remove_kdk(kdk_folder)
 
+        if os.getuid() != 0:
+            return
+
+        backup_store = KernelDebugKitBackupStore()
+        for backup_name in backup_store.list_backups():
+            if any(backup_name.endswith(f"_{build}.kdk") for build in exclude_builds):
+                continue
+            logging.info(f"Removing KDK backup: {backup_name}")
+            backup_store.remove(backup_name)
+
 
     def validate_kdk_checksum(self, kdk_dmg_path: str = None) -> bool:
         """
         Validates KDK DMG checksum
 
+        Uses the size and checksum provided by the KdkSupportPkg API, preferring the
+        checksum calculated while downloading. Falls back to 'hdiutil verify' if
+        the API didn't provide a checksum
+
         Parameters:
             kdk_dmg_path (str, optional): Path to KDK DMG. Defaults to None.
 
@@ -535,11 +1073,16 @@ class KernelDebugKitObject:
             logging.error(f"KDK DMG doesn't exist: {kdk_dmg_path}")
             return False
 
-        # TODO: should we use the checksum from the API?
-        result = subprocess.run(["/usr/bin/hdiutil", "verify", self.constants.kdk_download_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        if result.returncode != 0:
-            logging.info("Error: Kernel Debug Kit checksum verification failed!")
-            logging.info(f"Output: {result.stderr.decode('utf-8')}")
+        if self.kdk_url_expected_checksum:
+            valid = self._validate_kdk_checksum_manifest(Path(kdk_dmg_path))
+        else:
+            logging.info("KdkSupportPkg API didn't provide a checksum, falling back to hdiutil verify")
+            valid = self._validate_kdk_checksum_hdiutil(Path(kdk_dmg_path))
+
+        if valid is False:
+            if self.kdk_download_obj:
+                self.kdk_download_obj.remove_from_cache()
+
             msg = "Kernel Debug Kit checksum verification failed, please try again.\n\nIf this continues to fail, ensure you're downloading on a stable network connection (ie. Ethernet)"
             logging.info(msg)
 
@@ -552,6 +1095,79 @@ class KernelDebugKitObject:
         return True
 
 
+    def _validate_kdk_checksum_manifest(self, kdk_dmg_path: Path) -> bool:
+        """
+        Validates KDK DMG against the size and checksum provided by the KdkSupportPkg API
+
+        Parameters:
+            kdk_dmg_path (Path): Path to KDK DMG
+
+        Returns:
+            bool: True if valid, False if invalid
+        """
+
+        if self.kdk_url_expected_size and kdk_dmg_path.stat().st_size != self.kdk_url_expected_size:
+            logging.info(f"Error: Kernel Debug Kit size mismatch, expected {self.kdk_url_expected_size} bytes, found {kdk_dmg_path.stat().st_size} bytes")
+            return False
+
+        if (
+            self.kdk_download_obj
+            and self.kdk_download_obj.download_complete
+            and self.kdk_download_obj.checksum
+            and self.kdk_download_obj.checksum.name == self.kdk_url_checksum_algorithm
+            and Path(self.kdk_download_obj.filepath) == kdk_dmg_path
+        ):
+            logging.info("Using checksum calculated during download")
+            checksum = self.kdk_download_obj.checksum.hexdigest()
+        else:
+            logging.info(f"Calculating {self.kdk_url_checksum_algorithm} checksum of {kdk_dmg_path.name}")
+            checksum = self._calculate_checksum(kdk_dmg_path, self.kdk_url_checksum_algorithm)
+
+        if checksum != self.kdk_url_expected_checksum:
+            logging.info("Error: Kernel Debug Kit checksum verification failed!")
+            logging.info(f"Expected {self.kdk_url_checksum_algorithm}: {self.kdk_url_expected_checksum}")
+            logging.info(f"Calculated {self.kdk_url_checksum_algorithm}: {checksum}")
+            return False
+
+        return True
+
+
+    def _validate_kdk_checksum_hdiutil(self, kdk_dmg_path: Path) -> bool:
+        """
+        Validates KDK DMG using the disk image's internal checksum
+
+        Parameters:
+            kdk_dmg_path (Path): Path to KDK DMG
+
+        Returns:
+            bool: True if valid, False if invalid
+        """
+
+        result = subprocess.run(["/usr/bin/hdiutil", "verify", kdk_dmg_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        if result.returncode != 0:
+            logging.info("Error: Kernel Debug Kit checksum verification failed!")
+            logging.info(f"Output: {result.stderr.decode('utf-8')}")
+            return False
+
+        return True
+
+
+    def _calculate_checksum(self, file_path: Path, algorithm: str) -> str:
+        """
+        Calculates checksum of provided file
+
+        Parameters:
+            file_path (Path): Path to file
+            algorithm (str):  hashlib algorithm
+
+        Returns:
+            str: Hex digest of the file
+        """
+
+        with file_path.open("rb") as file:
+            return hashlib.file_digest(file, algorithm).hexdigest()
+
+
 class KernelDebugKitUtilities:
     """
     Utilities for KDK handling
@@ -628,12 +1244,31 @@ class KernelDebugKitUtilities:
                     self._unmount_disk_image(mount_point)
                     return False
 
-            self._create_backup(kdk_pkg_path, Path(f"{kdk_path.parent}/{KDK_INFO_PLIST}"))
+            self._create_backup(kdk_pkg_path, Path(f"{kdk_path.parent}/{KDK_INFO_PLIST}"), installed=only_install_backup is False)
             self._unmount_disk_image(mount_point)
 
         logging.info("Successfully installed KDK")
         return True
 
+    def install_kdk_backup(self, backup_name: str) -> bool:
+        """
+        Restores a KDK from the backup store into the KDK folder
+
+        Parameters:
+            backup_name (str): Name of the backup (ie. KDK_13.3_22E252.kdk)
+
+        Returns:
+            bool: True if successful, False if not
+        """
+
+        if os.getuid() != 0:
+            logging.warning("Can't install KDK, not running as root")
+            return False
+
+        logging.info(f"Restoring KDK backup: {backup_name}")
+        return KernelDebugKitBackupStore().restore(backup_name, Path(KDK_INSTALL_PATH) / Path(backup_name))
+
+
     def _unmount_disk_image(self, mount_point) -> None:
         """
         Unmounts provided disk image silently
@@ -644,13 +1279,17 @@ class KernelDebugKitUtilities:
         subprocess.run(["/usr/bin/hdiutil", "detach", mount_point], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
 
 
-    def _create_backup(self, kdk_path: Path, kdk_info_plist: Path) -> None:
+    def _create_backup(self, kdk_path: Path, kdk_info_plist: Path, installed: bool = True) -> None:
         """
         Creates a backup of the KDK
 
+        Installed KDKs are added to the backup store, deduplicating files shared with
+        other backed up KDKs. Otherwise the package itself is copied next to the KDKs.
+
         Parameters:
-            kdk_path (Path): Path to KDK
+            kdk_path (Path): Path to KDK package
             kdk_info_plist (Path): Path to KDK Info.plist
+            installed (bool): Whether the package was installed
         """
 
         if not kdk_path.exists():
@@ -673,6 +1312,23 @@ class KernelDebugKitUtilities:
         if not Path(KDK_INSTALL_PATH).exists():
             subprocess.run(["/bin/mkdir", "-p", KDK_INSTALL_PATH], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
 
+        if installed is True:
+            kdk_folder = next((kdk_folder for kdk_folder in Path(KDK_INSTALL_PATH).glob(f"*_{kdk_info_dict['build']}.kdk") if kdk_folder.is_dir()), None)
+            if kdk_folder is None:
+                logging.warning("Installed KDK not found, can't create backup")
+                return
+
+            logging.info(f"Creating backup: {kdk_folder.name}")
+            backup_store = KernelDebugKitBackupStore()
+            if kdk_folder.name in backup_store.list_backups():
+                logging.info("Backup already exists, skipping")
+                return
+
+            # Files already stored by other KDK backups aren't stored again
+            if backup_store.backup(kdk_folder, kdk_folder.name) is False:
+                logging.info("Failed to create KDK backup")
+            return
+
         kdk_dst_name = f"KDK_{kdk_info_dict['version']}_{kdk_info_dict['build']}.pkg"
         kdk_dst_path = Path(f"{KDK_INSTALL_PATH}/{kdk_dst_name}")
 
@@ -684,4 +1340,296 @@ class KernelDebugKitUtilities:
         result = utilities.elevated(["/bin/cp", "-R", kdk_path, kdk_dst_path], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
         if result.returncode != 0:
             logging.info("Failed to create KDK backup:")
-            logging.info(result.stdout.decode('utf-8'))
\ No newline at end of file
+            logging.info(result.stdout.decode('utf-8'))
+
+
+class KernelDebugKitBackupStore:
+    """
+    Content-addressed store for backups of installed KDKs
+
+    Each backup is a manifest describing a KDK bundle's files, with their contents stored
+    once per SHA-256 under Objects. Files shared between KDKs (ie. identical kexts and
+    symbols across versions) only take space once.
+
+    Files are cloned into and out of the store where the filesystem supports it (APFS, or
+    reflinks on Linux), otherwise copied. Restored files are never linked to the store,
+    and are verified against their SHA-256 before the restore is put in place.
+
+    Usage:
+        >>> store = KernelDebugKitBackupStore()
+        >>> store.backup(Path("/Library/Developer/KDKs/KDK_13.3_22E252.kdk"), "KDK_13.3_22E252.kdk")
+        >>> store.restore("KDK_13.3_22E252.kdk", Path("/Library/Developer/KDKs/KDK_13.3_22E252.kdk"))
+        >>> store.remove("KDK_13.3_22E252.kdk")
+    """
+
+    def __init__(self, store_path: str = None) -> None:
+        self.store_path:   Path = Path(store_path or KDK_BACKUP_STORE_PATH)
+        self.objects_path: Path = self.store_path / Path("Objects")
+        self.backups_path: Path = self.store_path / Path("Backups")
+
+
+    def backup(self, source: Path, name: str) -> bool:
+        """
+        Add a file or directory tree to the store
+
+        Parameters:
+            source (Path): File or directory to back up
+            name (str):    Name of the backup (ie. KDK_13.3_22E252.kdk)
+
+        Returns:
+            bool: True if successful, False if not
+        """
+
+        source = Path(source)
+        entries: list = []
+
+        try:
+            self.objects_path.mkdir(parents=True, exist_ok=True)
+            self.backups_path.mkdir(parents=True, exist_ok=True)
+
+            if source.is_file() and not source.is_symlink():
+                entries.append(self._backup_file(source, "."))
+            else:
+                for root, directories, files in os.walk(source):
+                    directories.sort()
+                    root = Path(root)
+                    relative_root = root.relative_to(source)
+                    entries.append({"Path": str(relative_root), "Type": "directory", "Mode": root.stat().st_mode & 0o7777})
+                    for item in sorted(files) + [directory for directory in directories if (root / directory).is_symlink()]:
+                        item_path = root / item
+                        if item_path.is_symlink():
+                            entries.append({"Path": str(relative_root / item), "Type": "symlink", "Target": os.readlink(item_path)})
+                        elif item_path.is_file():
+                            entries.append(self._backup_file(item_path, str(relative_root / item)))
+        except OSError as e:
+            logging.info(f"Failed to back up {source}: {e}")
+            return False
+
+        manifest = {
+            "Name":    name,
+            "Created": datetime.datetime.now(),
+            "Entries": entries,
+        }
+        try:
+            temp_path = self.manifest_path(name).with_suffix(".tmp")
+            temp_path.write_bytes(plistlib.dumps(manifest))
+            temp_path.replace(self.manifest_path(name))
+        except OSError as e:
+            logging.info(f"Failed to save backup manifest for {name}: {e}")
+            return False
+
+        return True
+
+
+    def restore(self, name: str, destination: Path) -> bool:
+        """
+        Rebuild a backup from the store
+        Every file is verified against its SHA-256, a corrupted object fails the restore
+
+        Parameters:
+            name (str):          Name of the backup
+            destination (Path):  Path to restore to, must not exist
+
+        Returns:
+            bool: True if successful, False if not
+        """
+
+        destination = Path(destination)
+        manifest = self._load_manifest(name)
+        if manifest is None:
+            logging.info(f"Backup not found: {name}")
+            return False
+
+        if destination.exists():
+            logging.info(f"Can't restore {name}, destination already exists: {destination}")
+            return False
+
+        temp_destination = destination.with_name(f".{destination.name}.restoring")
+        try:
+            self._remove_path(temp_destination)
+            directories = []
+            for entry in manifest["Entries"]:
+                path = temp_destination / Path(entry["Path"])
+                if entry["Type"] == "directory":
+                    path.mkdir(parents=True, exist_ok=True)
+                    directories.append((path, entry["Mode"]))
+                elif entry["Type"] == "symlink":
+                    os.symlink(entry["Target"], path)
+                else:
+                    checksum = self._clone_or_copy(self.objects_path / Path(entry["SHA256"]), path)
+                    if checksum.hexdigest() != entry["SHA256"]:
+                        raise OSError(f"Object for {entry['Path']} is corrupted")
+                    os.chmod(path, entry["Mode"])
+
+            # Apply directory permissions last, in case they're read-only
+            for path, mode in reversed(directories):
+                os.chmod(path, mode)
+
+            temp_destination.rename(destination)
+        except (OSError, KeyError) as e:
+            logging.info(f"Failed to restore {name}: {e}")
+            self._remove_path(temp_destination)
+            return False
+
+        return True
+
+
+    def remove(self, name: str) -> None:
+        """
+        Remove a backup, deleting objects no other backup references
+
+        Parameters:
+            name (str): Name of the backup
+        """
+
+        self.manifest_path(name).unlink(missing_ok=True)
+        self.prune()
+
+
+    def prune(self) -> None:
+        """
+        Delete objects no backup references
+        """
+
+        if not self.objects_path.exists():
+            return
+
+        referenced = set()
+        for name in self.list_backups():
+            manifest = self._load_manifest(name)
+            if manifest is None:
+                # Can't tell what an unreadable manifest references, keep everything
+                return
+            referenced.update(entry["SHA256"] for entry in manifest["Entries"] if entry["Type"] == "file")
+
+        for object_path in self.objects_path.iterdir():
+            if object_path.name not in referenced:
+                object_path.unlink(missing_ok=True)
+
+
+    def list_backups(self) -> list:
+        """
+        List backups in the store
+
+        Returns:
+            list: Backup names
+        """
+
+        if not self.backups_path.exists():
+            return []
+
+        return sorted(manifest.stem for manifest in self.backups_path.glob("*.plist"))
+
+
+    def disk_usage(self) -> int:
+        """
+        Query space used by the store's objects
+
+        Returns:
+            int: Bytes allocated on disk
+        """
+
+        if not self.objects_path.exists():
+            return 0
+
+        return sum(object_path.stat().st_blocks * 512 for object_path in self.objects_path.iterdir())
+
+
+    def _backup_file(self, source: Path, relative_path: str) -> dict:
+        """
+        Add a file's contents to the object store
+
+        Parameters:
+            source (Path):       File to add
+            relative_path (str): Path of the file within the backup
+
+        Returns:
+            dict: Manifest entry for the file
+        """
+
+        with source.open("rb") as file:
+            sha256 = hashlib.file_digest(file, "sha256").hexdigest()
+
+        object_path = self.objects_path / Path(sha256)
+        if not object_path.exists():
+            temp_path = self.objects_path / Path(f".{sha256}.tmp")
+            temp_path.unlink(missing_ok=True)
+            if self._clone_or_copy(source, temp_path).hexdigest() != sha256:
+                temp_path.unlink()
+                raise OSError(f"{source} changed while backing up")
+            os.chmod(temp_path, 0o444)
+            temp_path.replace(object_path)
+
+        return {
+            "Path":   relative_path,
+            "Type":   "file",
+            "Mode":   source.stat().st_mode & 0o7777,
+            "SHA256": sha256,
+            "Size":   object_path.stat().st_size,
+        }
+
+
+    def _clone_or_copy(self, source: Path, destination: Path) -> "hashlib._Hash":
+        """
+        Duplicate a file, cloning where supported
+
+        Parameters:
+            source (Path):      File to duplicate
+            destination (Path): Path of the duplicate, must not exist
+
+        Returns:
+            hashlib._Hash: SHA-256 hash object of the duplicate
+        """
+
+        if utilities.clone_file(source, destination):
+            with destination.open("rb") as file:
+                return hashlib.file_digest(file, "sha256")
+
+        checksum = hashlib.sha256()
+        with source.open("rb") as source_file, destination.open("xb") as destination_file:
+            while chunk := source_file.read(1024 * 1024 * 4):
+                destination_file.write(chunk)
+                checksum.update(chunk)
+
+        return checksum
+
+
+    def manifest_path(self, name: str) -> Path:
+        """
+        Path of a backup's manifest
+        """
+
+        return self.backups_path / Path(f"{name}.plist")
+
+
+    def _load_manifest(self, name: str) -> dict:
+        """
+        Load a backup's manifest
+
+        Parameters:
+            name (str): Name of the backup
+
+        Returns:
+            dict: Manifest, None if missing or unreadable
+        """
+
+        try:
+            manifest = plistlib.loads(self.manifest_path(name).read_bytes())
+        except (plistlib.InvalidFileException, ExpatError, OSError, ValueError):
+            return None
+
+        if not isinstance(manifest, dict) or "Entries" not in manifest:
+            return None
+
+        return manifest
+
+
+    def _remove_path(self, path: Path) -> None:
+        """
+        Remove a file or directory tree if present
+        """
+
+        if path.is_dir() and not path.is_symlink():
+            shutil.rmtree(path, ignore_errors=True)
+        elif path.exists() or path.is_symlink():
+            path.unlink()
@@ -2,20 +2,34 @@
 
 from pathlib import Path
 import plistlib
+import io
+import base64
+import datetime
+from xml.etree import ElementTree
+from xml.parsers.expat import ExpatError
 import subprocess
 import tempfile
 import enum
 import logging
+import requests
 import applescript
+import threading
+import concurrent.futures
 
 from data import os_data
-from resources import network_handler, utilities
+from resources import network_handler, utilities, disk_handler
 
 
 APPLICATION_SEARCH_PATH:  str = "/Applications"
 SFR_SOFTWARE_UPDATE_PATH: str = "SFR/com_apple_MobileAsset_SFRSoftwareUpdate/com_apple_MobileAsset_SFRSoftwareUpdate.xml"
 CATALOG_URL_BASE:         str = "https://swscan.apple.com/content/catalogs/others/index"
 CATALOG_URL_EXTENSION:    str = ".merged-1.sucatalog"
+CATALOG_FETCH_THREADS:    int = 8   # Concurrent BuildManifest (Info.plist) requests when parsing the catalog
+CATALOG_FETCH_TIMEOUT:    int = 10  # Seconds before an individual BuildManifest request is abandoned
+CATALOG_PRODUCT_STORE_PATH:    Path = network_handler.METADATA_CACHE_PATH / Path("InstallerCatalog.plist")  # Parsed BuildManifests, keyed by product ID and PostDate
+CATALOG_PRODUCT_STORE_VERSION: int  = 1  # Bump when the stored BuildManifest fields change
+CATALOG_PRODUCT_STORE_LOCK = threading.Lock()  # Serialises store updates between concurrently parsed catalogs
+SHAREDSUPPORT_CACHE_PATH: Path = network_handler.METADATA_CACHE_PATH / Path("SharedSupport.plist")  # Parsed SharedSupport.dmg versions, keyed by path, size and mtime
 CATALOG_URL_VARIANTS:     list = [
     "14",
     "13",
@@ -177,29 +191,29 @@ fi
         list_disks: dict = {}
 
         # TODO: AllDisksAndPartitions isn't supported in Snow Leopard and older
-        try:
-            # High Sierra and newer
-            disks = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "list", "-plist", "physical"], stdout=subprocess.PIPE).stdout.decode().strip().encode())
-        except ValueError:
-            # Sierra and older
-            disks = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "list", "-plist"], stdout=subprocess.PIPE).stdout.decode().strip().encode())
-
-        for disk in disks["AllDisksAndPartitions"]:
-            disk_info = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "info", "-plist", disk["DeviceIdentifier"]], stdout=subprocess.PIPE).stdout.decode().strip().encode())
-            try:
-                all_disks[disk["DeviceIdentifier"]] = {"identifier": disk_info["DeviceNode"], "name": disk_info["MediaName"], "size": disk_info["TotalSize"], "removable": disk_info["Internal"], "partitions": {}}
-            except KeyError:
+        query = disk_handler.DiskutilQuery()
+        disks = disk_handler.parse_whole_disks(query.list_physical())
+
+        # Strip disks that are under 14GB (15,032,385,536 bytes)
+        # createinstallmedia isn't great at detecting if a disk has enough space
+        # Size is already reported by 'diskutil list', only query disks large enough
+        disks = [disk["identifier"] for disk in disks if disk["size"] is None or disk["size"] > 15032385536]
+
+        for disk, disk_info in query.info(disks).items():
+            disk_info = disk_handler.parse_disk_info(disk_info)
+            if disk_info is None:
                 # Avoid crashing with CDs installed
                 continue
+            all_disks[disk] = {"identifier": disk_info["identifier"], "name": disk_info["name"], "size": disk_info["size"], "removable": disk_info["internal"], "partitions": {}}
+
+        logging.info(f"Enumerated disks with {query.subprocess_count} diskutil calls")
 
         for disk in all_disks:
-            # Strip disks that are under 14GB (15,032,385,536 bytes)
-            # createinstallmedia isn't great at detecting if a disk has enough space
-            if not any(all_disks[disk]['size'] > 15032385536 for partition in all_disks[disk]):
+            if not all_disks[disk]['size'] > 15032385536:
                 continue
             # Strip internal disks as well (avoid user formatting their SSD/HDD)
             # Ensure user doesn't format their boot drive
-            if not any(all_disks[disk]['removable'] is False for partition in all_disks[disk]):
+            if not all_disks[disk]['removable'] is False:
                 continue
 
             list_disks.update({
@@ -284,28 +298,303 @@ class RemoteInstallerCatalog:
 
     def _fetch_catalog(self) -> dict:
         """
-        Fetches the catalog from Apple's servers
+        Fetches the catalog from Apple's servers, or the on-disk cache if unchanged or offline
 
         Returns:
-            dict: The catalog as a dictionary
+            dict: The catalog as a dictionary, only containing InstallAssistant products
         """
 
         catalog: dict = {}
 
-        if network_handler.NetworkUtilities(self.catalog_url).verify_network_connection() is False:
+        # Cached on disk, avoids re-downloading unchanged catalogs and allows offline use
+        cache = network_handler.MetadataCache(self.catalog_url)
+        content = cache.get()
+        if content is None:
             return catalog
 
         try:
-            catalog = plistlib.loads(network_handler.NetworkUtilities().get(self.catalog_url).content)
-        except plistlib.InvalidFileException:
+            catalog = {"Products": self._parse_catalog_products(content)}
+        except (plistlib.InvalidFileException, ElementTree.ParseError, ValueError):
+            cache.invalidate()
             return {}
 
         return catalog
 
+
+    def _parse_catalog_products(self, content: bytes) -> dict:
+        """
+        Incrementally parses the catalog's Products, only materialising InstallAssistant products
+
+        The catalog lists thousands of products, of which only a few dozen are macOS installers.
+        Each product is visited and discarded in turn, rather than building the entire catalog.
+
+        Parameters:
+            content (bytes): The catalog as an XML property list
+
+        Returns:
+            dict: InstallAssistant products, keyed by product ID
+        """
+
+        if content.startswith(b"bplist00"):
+            # Binary property lists can't be streamed, not currently served by Apple
+            products = plistlib.loads(content).get("Products", {})
+            return {product: products[product] for product in products if self._is_install_assistant_product(products[product])}
+
+        products:        dict = {}
+        depth:           int  = 0
+        root_element:    ElementTree.Element = None
+        root_key:        str  = None
+        product_element: ElementTree.Element = None
+        product_id:      str  = None
+
+        # Depth 2: Root dictionary, depth 3: Root keys (ie. Products), depth 4: Product IDs and entries
+        for event, element in ElementTree.iterparse(io.BytesIO(content), events=("start", "end")):
+            if event == "start":
+                depth += 1
+                if depth == 2:
+                    root_element = element
+                elif depth == 3 and root_key == "Products" and element.tag == "dict":
+                    product_element = element
+                continue
+
+            if depth == 4 and product_element is not None:
+                if element.tag == "key":
+                    product_id = element.text
+                elif element.tag == "dict":
+                    if self._is_install_assistant_product(element):
+                        products[product_id] = self._plist_element_to_python(element)
+                    product_element.clear()
+            elif depth == 3:
+                if element.tag == "key":
+                    root_key = element.text
+                elif element is product_element:
+                    product_element = None
+                root_element.clear()
+
+            depth -= 1
+
+        return products
+
+
+    def _is_install_assistant_product(self, product) -> bool:
+        """
+        Determines whether a catalog product is a macOS installer (InstallAssistant payload)
+
+        Parameters:
+            product (dict or ElementTree.Element): Product entry, either parsed or as a plist dict element
+
+        Returns:
+            bool: True if ExtendedMetaInfo lists InstallAssistantPackageIdentifiers
+        """
+
+        if isinstance(product, dict):
+            return "InstallAssistantPackageIdentifiers" in product.get("ExtendedMetaInfo", {})
+
+        extended_meta_info = self._plist_dict_element_value(product, "ExtendedMetaInfo")
+        if extended_meta_info is None or extended_meta_info.tag != "dict":
+            return False
+
+        return self._plist_dict_element_value(extended_meta_info, "InstallAssistantPackageIdentifiers") is not None
+
+
+    def _plist_dict_element_value(self, element: ElementTree.Element, key: str) -> ElementTree.Element:
+        """
+        Finds the value element for a key in a plist dict element
+
+        Parameters:
+            element (ElementTree.Element): Plist dict element
+            key (str):                     Key to find
+
+        Returns:
+            ElementTree.Element: Value element, None if not found
+        """
+
+        children = list(element)
+        for index in range(0, len(children) - 1, 2):
+            if children[index].tag == "key" and children[index].text == key:
+                return children[index + 1]
+
+        return None
+
+
+    def _plist_element_to_python(self, element: ElementTree.Element):
+        """
+        Converts a plist XML element to its Python equivalent, matching plistlib
+
+        Parameters:
+            element (ElementTree.Element): Plist value element
+
+        Returns:
+            Python object represented by the element
+        """
+
+        if element.tag == "dict":
+            children = list(element)
+            return {
+                children[index].text or "": self._plist_element_to_python(children[index + 1])
+                for index in range(0, len(children) - 1, 2)
+            }
+        if element.tag == "array":
+            return [self._plist_element_to_python(child) for child in element]
+        if element.tag == "string":
+            return element.text or ""
+        if element.tag == "integer":
+            return int(element.text)
+        if element.tag == "real":
+            return float(element.text)
+        if element.tag == "true":
+            return True
+        if element.tag == "false":
+            return False
+        if element.tag == "date":
+            return datetime.datetime.strptime(element.text, "%Y-%m-%dT%H:%M:%SZ")
+        if element.tag == "data":
+            return base64.b64decode(element.text or "")
+
+        raise ValueError(f"Unsupported plist element: {element.tag}")
+
+
+    def _fetch_build_manifest(self, url: str) -> dict:
+        """
+        Fetches a product's BuildManifest (Info.plist)
+
+        Parameters:
+            url (str): URL of the BuildManifest
+
+        Returns:
+            dict: The BuildManifest as a dictionary, None if unavailable
+        """
+
+        try:
+            content = network_handler.NetworkUtilities().get(url, timeout=CATALOG_FETCH_TIMEOUT).content
+        except requests.exceptions.RequestException as error:
+            logging.info(f"Unable to fetch BuildManifest {url}: {error}")
+            return None
+        if not content:
+            return None
+
+        # Malformed manifests only skip their own product, rather than the entire catalog
+        try:
+            build_plist = plistlib.loads(content)
+        except (plistlib.InvalidFileException, ExpatError, ValueError) as error:
+            logging.info(f"Unable to parse BuildManifest {url}: {error}")
+            return None
+
+        if not isinstance(build_plist, dict):
+            logging.info(f"Unexpected BuildManifest format: {url}")
+            return None
+
+        return build_plist
+
+
+    def _parse_build_manifest(self, build_plist: dict) -> dict:
+        """
+        Extracts installer information from a product's BuildManifest
+
+        Parameters:
+            build_plist (dict): The BuildManifest as a dictionary
+
+        Returns:
+            dict: Version, Build, Variant and Models of the installer, empty if not a usable installer
+        """
+
+        if "MobileAssetProperties" not in build_plist:
+            return {}
+        if "SupportedDeviceModels" not in build_plist["MobileAssetProperties"]:
+            return {}
+        if "OSVersion" not in build_plist["MobileAssetProperties"]:
+            return {}
+        if "Build" not in build_plist["MobileAssetProperties"]:
+            return {}
+
+        # Ensure Apple Silicon specific Installers aren't listed
+        if "VMM-x86_64" not in build_plist["MobileAssetProperties"]["SupportedDeviceModels"]:
+            return {}
+
+        try:
+            catalog_url = build_plist["MobileAssetProperties"]["BridgeVersionInfo"]["CatalogURL"]
+            if "beta" in catalog_url:
+                catalog_url = "PublicSeed"
+            elif "customerseed" in catalog_url:
+                catalog_url = "CustomerSeed"
+            elif "seed" in catalog_url:
+                catalog_url = "DeveloperSeed"
+            else:
+                catalog_url = "Public"
+        except KeyError:
+            # Assume Public if no catalog URL is found
+            catalog_url = "Public"
+
+        return {
+            "Version": build_plist["MobileAssetProperties"]["OSVersion"],
+            "Build":   build_plist["MobileAssetProperties"]["Build"],
+            "Variant": catalog_url,
+            "Models":  build_plist["MobileAssetProperties"]["SupportedDeviceModels"],
+        }
+
+
+    def _load_product_store(self) -> dict:
+        """
+        Loads the store of previously parsed BuildManifests
+
+        Returns:
+            dict: Store, with product IDs mapped to their PostDate and parsed BuildManifests under "Products",
+                  and each catalog URL mapped to the product IDs it listed under "Catalogs"
+        """
+
+        if not CATALOG_PRODUCT_STORE_PATH.exists():
+            return {}
+
+        try:
+            store = plistlib.loads(CATALOG_PRODUCT_STORE_PATH.read_bytes())
+        except (plistlib.InvalidFileException, ExpatError, OSError, ValueError):
+            return {}
+
+        if not isinstance(store, dict) or store.get("Version") != CATALOG_PRODUCT_STORE_VERSION:
+            return {}
+
+        return store
+
+
+    def _save_product_store(self, products: dict, catalog_products: list) -> None:
+        """
+        Saves parsed BuildManifests for future catalog refreshes
+        Merged into the current store, as other catalogs may have been saved since it was loaded
+
+        Products no longer listed by any catalog saved to the store are pruned,
+        otherwise every installer Apple has ever published would accumulate
+
+        Parameters:
+            products (dict):         Updated product IDs mapped to their PostDate and parsed BuildManifests
+            catalog_products (list): Product IDs currently listed by this catalog
+        """
+
+        temp_path = CATALOG_PRODUCT_STORE_PATH.with_suffix(".tmp")
+        with CATALOG_PRODUCT_STORE_LOCK:
+            store = self._load_product_store()
+
+            catalogs = store.get("Catalogs", {})
+            catalogs[self.catalog_url] = sorted(set(catalog_products))
+            listed_products = set().union(*catalogs.values())
+
+            stored_products = {product: entry for product, entry in store.get("Products", {}).items() if product in listed_products}
+            stored_products.update(products)
+
+            try:
+                CATALOG_PRODUCT_STORE_PATH.parent.mkdir(parents=True, exist_ok=True)
+                temp_path.write_bytes(plistlib.dumps({"Version": CATALOG_PRODUCT_STORE_VERSION, "Catalogs": catalogs, "Products": stored_products}))
+                temp_path.replace(CATALOG_PRODUCT_STORE_PATH)
+            except OSError as error:
+                logging.info(f"Unable to save installer catalog store: {error}")
+
+
     def _parse_catalog(self) -> dict:
         """
         Parses the catalog and returns a dictionary of available installers
 
+        BuildManifests are persisted per product ID and PostDate, so only
+        new or changed products are fetched on later runs
+
         Returns:
             dict: Dictionary of available installers
         """
@@ -318,6 +607,8 @@ class RemoteInstallerCatalog:
         if "Products" not in catalog:
             return available_apps
 
+        # Determine which BuildManifests are needed, in catalog order
+        build_manifests: list = []
         for product in catalog["Products"]:
             if "ExtendedMetaInfo" not in catalog["Products"][product]:
                 continue
@@ -336,76 +627,88 @@ class RemoteInstallerCatalog:
                 if "InstallInfo.plist" in bm_package["URL"]:
                     continue
 
-                try:
-                    build_plist = plistlib.loads(network_handler.NetworkUtilities().get(bm_package["URL"]).content)
-                except plistlib.InvalidFileException:
+                build_manifests.append((product, bm_package["URL"]))
+
+        # Reuse BuildManifests of products unchanged since the last refresh
+        product_store:    dict = self._load_product_store()
+        store:            dict = product_store.get("Products", {})
+        stored_products:  list = product_store.get("Catalogs", {}).get(self.catalog_url, [])
+        catalog_products: set  = {product for product, _ in build_manifests}
+        updated_products: dict = {}
+        parsed_manifests: dict = {}
+        for product, url in build_manifests:
+            entry = store.get(product)
+            if entry and entry["PostDate"] == catalog["Products"][product]["PostDate"] and url in entry["BuildManifests"]:
+                parsed_manifests[(product, url)] = entry["BuildManifests"][url]
+
+        pending = [(product, url) for product, url in build_manifests if (product, url) not in parsed_manifests]
+        if pending:
+            logging.info(f"Fetching {len(pending)} of {len(build_manifests)} installer BuildManifests")
+
+        # Fetch concurrently, results are still processed in catalog order
+        with concurrent.futures.ThreadPoolExecutor(max_workers=CATALOG_FETCH_THREADS) as executor:
+            for (product, url), build_plist in zip(pending, executor.map(self._fetch_build_manifest, [url for _, url in pending])):
+                if build_plist is None:
+                    # Not stored, retried on the next refresh
                     continue
 
-                if "MobileAssetProperties" not in build_plist:
-                    continue
-                if "SupportedDeviceModels" not in build_plist["MobileAssetProperties"]:
-                    continue
-                if "OSVersion" not in build_plist["MobileAssetProperties"]:
-                    continue
-                if "Build" not in build_plist["MobileAssetProperties"]:
-                    continue
+                parsed_manifests[(product, url)] = self._parse_build_manifest(build_plist)
 
-                # Ensure Apple Silicon specific Installers aren't listed
-                if "VMM-x86_64" not in build_plist["MobileAssetProperties"]["SupportedDeviceModels"]:
-                    continue
+                if product not in store or store[product]["PostDate"] != catalog["Products"][product]["PostDate"]:
+                    store[product] = {
+                        "PostDate":       catalog["Products"][product]["PostDate"],
+                        "BuildManifests": {},
+                    }
+                store[product]["BuildManifests"][url] = parsed_manifests[(product, url)]
+                updated_products[product] = store[product]
 
-                version = build_plist["MobileAssetProperties"]["OSVersion"]
-                build   = build_plist["MobileAssetProperties"]["Build"]
-
-                try:
-                    catalog_url = build_plist["MobileAssetProperties"]["BridgeVersionInfo"]["CatalogURL"]
-                    if "beta" in catalog_url:
-                        catalog_url = "PublicSeed"
-                    elif "customerseed" in catalog_url:
-                        catalog_url = "CustomerSeed"
-                    elif "seed" in catalog_url:
-                        catalog_url = "DeveloperSeed"
-                    else:
-                        catalog_url = "Public"
-                except KeyError:
-                    # Assume Public if no catalog URL is found
-                    catalog_url = "Public"
-
-                download_link = None
-                integrity     = None
-                size          = None
-                date = catalog["Products"][product]["PostDate"]
-
-                for ia_package in catalog["Products"][product]["Packages"]:
-                    if "InstallAssistant.pkg" not in ia_package["URL"]:
-                        continue
-                    if "URL" not in ia_package:
-                        continue
-                    if "IntegrityDataURL" not in ia_package:
-                        continue
+        # Also saved when products were dropped from the catalog, so they're pruned from the store
+        if updated_products or set(stored_products) != catalog_products:
+            self._save_product_store(updated_products, list(catalog_products))
+
+        for product, url in build_manifests:
+            build_info = parsed_manifests.get((product, url))
+            if not build_info:
+                continue
 
-                    download_link = ia_package["URL"]
-                    integrity     = ia_package["IntegrityDataURL"]
-                    size          = ia_package["Size"] if ia_package["Size"] else 0
+            version = build_info["Version"]
+            build   = build_info["Build"]
 
+            download_link = None
+            integrity     = None
+            size          = None
+            date = catalog["Products"][product]["PostDate"]
 
-                if any([version, build, download_link, size, integrity]) is None:
+            for ia_package in catalog["Products"][product]["Packages"]:
+                if "InstallAssistant.pkg" not in ia_package["URL"]:
+                    continue
+                if "URL" not in ia_package:
+                    continue
+                if "IntegrityDataURL" not in ia_package:
                     continue
 
-                available_apps.update({
-                    product: {
-                        "Version":   version,
-                        "Build":     build,
-                        "Link":      download_link,
-                        "Size":      size,
-                        "integrity": integrity,
-                        "Source":   "Apple Inc.",
-                        "Variant":   catalog_url,
-                        "OS":        os_data.os_conversion.os_to_kernel(version),
-                        "Models":    build_plist["MobileAssetProperties"]["SupportedDeviceModels"],
-                        "Date":      date
-                    }
-                })
+                download_link = ia_package["URL"]
+                integrity     = ia_package["IntegrityDataURL"]
+                size          = ia_package["Size"] if ia_package["Size"] else 0
+
+
+            if any([version, build, download_link, size, integrity]) is None:
+                continue
+
+            available_apps.update({
+                product: {
+                    "Version":   version,
+                    "Build":     build,
+                    "Link":      download_link,
+                    "Size":      size,
+                    "integrity": integrity,
+                    "Source":   "Apple Inc.",
+                    "Variant":   build_info["Variant"],
+                    "OS":        os_data.os_conversion.os_to_kernel(version),
+                    "Models":    build_info["Models"],
+                    "Date":      date
+                }
+            })
 
         available_apps = {k: v for k, v in sorted(available_apps.items(), key=lambda x: x[1]['Version'])}
 
@@ -418,6 +721,8 @@ class RemoteInstallerCatalog:
         Primarily used to avoid overwhelming the user with a list of
         installers that aren't the newest version.
 
+        Single pass over the installers, each version is parsed once.
+
         Returns:
             dict: A dictionary of the newest macOS installers only.
         """
@@ -425,83 +730,175 @@ class RemoteInstallerCatalog:
         if self.available_apps is None:
             return {}
 
-        newest_apps: dict = self.available_apps.copy()
         supported_versions = ["10.13", "10.14", "10.15", "11", "12", "13", "14"]
+        beta_variants      = ["CustomerSeed", "DeveloperSeed", "PublicSeed"]
+
+        # Parse versions of public installers, and determine the largest per supported version
+        #   ex. 10.15.7 -> (10.15, 7, None), 12.6.1 -> (12, 6, 1)
+        parsed_versions: dict = {}
+        newest_versions: dict = {}
+        for ia, installer in self.available_apps.items():
+            # Don't use Beta builds to determine latest version
+            if installer["Variant"] in beta_variants:
+                continue
 
-        for version in supported_versions:
-            remote_version_minor = 0
-            remote_version_security = 0
-            os_builds = []
-
-            # First determine the largest version
-            for ia in newest_apps:
-                if newest_apps[ia]["Version"].startswith(version):
-                    if newest_apps[ia]["Variant"] not in ["CustomerSeed", "DeveloperSeed", "PublicSeed"]:
-                        remote_version = newest_apps[ia]["Version"].split(".")
-                        if remote_version[0] == "10":
-                            remote_version.pop(0)
-                            remote_version.pop(0)
-                        else:
-                            remote_version.pop(0)
-                        if int(remote_version[0]) > remote_version_minor:
-                            remote_version_minor = int(remote_version[0])
-                            remote_version_security = 0 # Reset as new minor version found
-                        if len(remote_version) > 1:
-                            if int(remote_version[1]) > remote_version_security:
-                                remote_version_security = int(remote_version[1])
-
-            # Now remove all versions that aren't the largest
-            for ia in list(newest_apps):
-                # Don't use Beta builds to determine latest version
-                if newest_apps[ia]["Variant"] in ["CustomerSeed", "DeveloperSeed", "PublicSeed"]:
-                    continue
+            version = next((version for version in supported_versions if installer["Version"].startswith(version)), None)
+            if version is None:
+                continue
 
-                if newest_apps[ia]["Version"].startswith(version):
-                    remote_version = newest_apps[ia]["Version"].split(".")
-                    if remote_version[0] == "10":
-                        remote_version.pop(0)
-                        remote_version.pop(0)
-                    else:
-                        remote_version.pop(0)
-                    if int(remote_version[0]) < remote_version_minor:
-                        newest_apps.pop(ia)
-                        continue
-                    if int(remote_version[0]) == remote_version_minor:
-                        if len(remote_version) > 1:
-                            if int(remote_version[1]) < remote_version_security:
-                                newest_apps.pop(ia)
-                                continue
-                        else:
-                            if remote_version_security > 0:
-                                newest_apps.pop(ia)
-                                continue
-
-                    # Remove duplicate builds
-                    #   ex.  macOS 12.5.1 has 2 builds in the Software Update Catalog
-                    #   ref: https://twitter.com/classicii_mrmac/status/1560357471654379522
-                    if newest_apps[ia]["Build"] in os_builds:
-                        newest_apps.pop(ia)
+            remote_version = installer["Version"].split(".")
+            remote_version = remote_version[2:] if remote_version[0] == "10" else remote_version[1:]
+            remote_version_minor    = int(remote_version[0])
+            remote_version_security = int(remote_version[1]) if len(remote_version) > 1 else None
+
+            parsed_versions[ia] = (version, remote_version_minor, remote_version_security)
+
+            newest_version = newest_versions.setdefault(version, [0, 0])
+            if remote_version_minor > newest_version[0]:
+                newest_version[0] = remote_version_minor
+                newest_version[1] = 0 # Reset as new minor version found
+            if remote_version_security is not None and remote_version_security > newest_version[1]:
+                newest_version[1] = remote_version_security
+
+        # Now remove all versions that aren't the largest
+        removed_apps: set = set()
+        os_builds:    dict = {version: set() for version in newest_versions}
+        for ia, (version, remote_version_minor, remote_version_security) in parsed_versions.items():
+            newest_version_minor, newest_version_security = newest_versions[version]
+
+            if remote_version_minor < newest_version_minor:
+                removed_apps.add(ia)
+                continue
+            if remote_version_minor == newest_version_minor:
+                if remote_version_security is not None:
+                    if remote_version_security < newest_version_security:
+                        removed_apps.add(ia)
                         continue
+                elif newest_version_security > 0:
+                    removed_apps.add(ia)
+                    continue
 
-                    os_builds.append(newest_apps[ia]["Build"])
+            # Remove duplicate builds
+            #   ex.  macOS 12.5.1 has 2 builds in the Software Update Catalog
+            #   ref: https://twitter.com/classicii_mrmac/status/1560357471654379522
+            if self.available_apps[ia]["Build"] in os_builds[version]:
+                removed_apps.add(ia)
+                continue
+
+            os_builds[version].add(self.available_apps[ia]["Build"])
 
         # Remove Betas if there's a non-beta version available
-        for ia in list(newest_apps):
-            if newest_apps[ia]["Variant"] in ["CustomerSeed", "DeveloperSeed", "PublicSeed"]:
-                for ia2 in newest_apps:
-                    if newest_apps[ia2]["Version"].split(".")[0] == newest_apps[ia]["Version"].split(".")[0] and newest_apps[ia2]["Variant"] not in ["CustomerSeed", "DeveloperSeed", "PublicSeed"]:
-                        newest_apps.pop(ia)
-                        break
+        public_major_versions: set = {
+            installer["Version"].split(".")[0]
+            for ia, installer in self.available_apps.items()
+            if ia not in removed_apps and installer["Variant"] not in beta_variants
+        }
+
+        return {
+            ia: installer
+            for ia, installer in self.available_apps.items()
+            if ia not in removed_apps and not (installer["Variant"] in beta_variants and installer["Version"].split(".")[0] in public_major_versions)
+        }
+
+
+class MultiSeedInstallerCatalog:
+    """
+    Fetches several seed catalogs concurrently and merges their installers
+
+    Products shared between seeds are listed once, tagged with every seed they appeared in.
+
+    Usage:
+        >>> catalog = MultiSeedInstallerCatalog([SeedType.PublicRelease, SeedType.PublicSeed, SeedType.DeveloperSeed])
+        >>> for product in catalog.available_apps:
+        >>>     print(catalog.available_apps[product]["Version"], catalog.available_apps[product]["Seeds"])
+    """
+
+    def __init__(self, seeds: list = None, os_override: int = os_data.os_data.sonoma) -> None:
+        self.seeds:       list = seeds
+        self.os_override: int  = os_override
+
+        if self.seeds is None:
+            self.seeds = [SeedType.PublicRelease, SeedType.PublicSeed, SeedType.DeveloperSeed]
+
+        self.catalogs:       dict = self._fetch_catalogs()
+        self.available_apps: dict = self._merge_catalogs()
+
+
+    def _fetch_catalogs(self) -> dict:
+        """
+        Fetches and parses each seed's catalog concurrently
+
+        Returns:
+            dict: SeedType mapped to its RemoteInstallerCatalog, seeds that failed are omitted
+        """
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(self.seeds), 1)) as executor:
+            futures = {
+                seed: executor.submit(RemoteInstallerCatalog, seed_override=seed, os_override=self.os_override)
+                for seed in self.seeds
+            }
+
+        # A seed that fails to parse shouldn't hide the others
+        catalogs: dict = {}
+        for seed in futures:
+            try:
+                catalogs[seed] = futures[seed].result()
+            except Exception as error:
+                logging.error(f"Failed to fetch {seed.name} catalog: {error}")
+
+        return catalogs
+
+
+    def _merge_catalogs(self) -> dict:
+        """
+        Merges installers from all seeds, deduplicated by product ID
+
+        Returns:
+            dict: Installers sorted by version, each with a 'Seeds' list of SeedType names
+        """
+
+        available_apps: dict = {}
+
+        for seed in self.seeds:
+            if seed not in self.catalogs:
+                continue
+            for product, installer in self.catalogs[seed].available_apps.items():
+                if product not in available_apps:
+                    available_apps[product] = {**installer, "Seeds": []}
+                available_apps[product]["Seeds"].append(seed.name)
 
-        return newest_apps
+        available_apps = {k: v for k, v in sorted(available_apps.items(), key=lambda x: x[1]['Version'])}
+
+        return available_apps
 
 
 class LocalInstallerCatalog:
     """
     Finds all macOS installers on the local machine.
+
+    SharedSupport.dmg versions are cached by path, size and modification time,
+    so only new or changed installers need to be mounted.
+
+    Usage:
+        >>> catalog = LocalInstallerCatalog()
+        >>> catalog.available_apps
+
+        >>> # Read SharedSupport.dmg versions without hdiutil (ie. for testing)
+        >>> catalog = LocalInstallerCatalog(search_path="/tmp/Applications", sharedsupport_runner=lambda dmg_path: ("23A344", "14.0"))
     """
 
-    def __init__(self) -> None:
+    def __init__(self, search_path: str = APPLICATION_SEARCH_PATH, sharedsupport_runner = None, cache_path: Path = SHAREDSUPPORT_CACHE_PATH) -> None:
+        self.search_path: Path = Path(search_path)
+        self.cache_path:  Path = Path(cache_path)
+
+        # Callable taking a SharedSupport.dmg path, returning its build and OS version
+        self.sharedsupport_runner = sharedsupport_runner
+        if self.sharedsupport_runner is None:
+            self.sharedsupport_runner = self._mount_sharedsupport_version
+
+        self._sharedsupport_cache:         dict = self._load_sharedsupport_cache()
+        self._sharedsupport_cache_changed: bool = False
+
         self.available_apps: dict = self._list_local_macOS_installers()
 
 
@@ -524,19 +921,21 @@ class LocalInstallerCatalog:
 
         application_list: dict = {}
 
-        for application in Path(APPLICATION_SEARCH_PATH).iterdir():
+        seen_sharedsupport: set = set()
+
+        for application in self.search_path.iterdir():
             # Certain Microsoft Applications have strange permissions disabling us from reading them
             try:
-                if not (Path(APPLICATION_SEARCH_PATH) / Path(application) / Path("Contents/Resources/createinstallmedia")).exists():
+                if not (self.search_path / Path(application) / Path("Contents/Resources/createinstallmedia")).exists():
                     continue
 
-                if not (Path(APPLICATION_SEARCH_PATH) / Path(application) / Path("Contents/Info.plist")).exists():
+                if not (self.search_path / Path(application) / Path("Contents/Info.plist")).exists():
                     continue
             except PermissionError:
                 continue
 
             try:
-                application_info_plist = plistlib.load((Path(APPLICATION_SEARCH_PATH) / Path(application) / Path("Contents/Info.plist")).open("rb"))
+                application_info_plist = plistlib.load((self.search_path / Path(application) / Path("Contents/Info.plist")).open("rb"))
             except (PermissionError, TypeError, plistlib.InvalidFileException):
                 continue
 
@@ -575,7 +974,10 @@ class LocalInstallerCatalog:
             if kernel < os_data.os_data.high_sierra:
                 continue
 
-            results = self._parse_sharedsupport_version(Path(APPLICATION_SEARCH_PATH) / Path(application)/ Path("Contents/SharedSupport/SharedSupport.dmg"))
+            sharedsupport_path = self.search_path / Path(application)/ Path("Contents/SharedSupport/SharedSupport.dmg")
+            seen_sharedsupport.add(str(sharedsupport_path))
+
+            results = self._parse_sharedsupport_version(sharedsupport_path)
             if results[0] is not None:
                 app_sdk = results[0]
             if results[1] is not None:
@@ -592,6 +994,15 @@ class LocalInstallerCatalog:
                 }
             })
 
+        # Drop installers that are no longer present
+        for cached_path in list(self._sharedsupport_cache):
+            if cached_path not in seen_sharedsupport:
+                self._sharedsupport_cache.pop(cached_path)
+                self._sharedsupport_cache_changed = True
+
+        if self._sharedsupport_cache_changed:
+            self._save_sharedsupport_cache()
+
         # Sort Applications by version
         application_list = {k: v for k, v in sorted(application_list.items(), key=lambda item: item[1]["Version"])}
         return application_list
@@ -602,6 +1013,8 @@ class LocalInstallerCatalog:
         Determine true version of macOS installer by parsing SharedSupport.dmg
         This is required due to Info.plist reporting the application version, not the OS version
 
+        Results are cached, only new or modified disk images are mounted
+
         Parameters:
             sharedsupport_path (Path): Path to SharedSupport.dmg
 
@@ -618,6 +1031,49 @@ class LocalInstallerCatalog:
         if not sharedsupport_path.name.endswith(".dmg"):
             return (detected_build, detected_os)
 
+        try:
+            stat = sharedsupport_path.stat()
+        except OSError:
+            return (detected_build, detected_os)
+
+        entry = self._sharedsupport_cache.get(str(sharedsupport_path))
+        if entry and entry["Size"] == stat.st_size and entry["Modified"] == stat.st_mtime_ns:
+            return (entry.get("Build"), entry.get("OSVersion"))
+
+        detected_build, detected_os = self.sharedsupport_runner(sharedsupport_path)
+
+        # Don't cache failed mounts, retry on next scan
+        if detected_build is None and detected_os is None:
+            return (detected_build, detected_os)
+
+        entry = {
+            "Size":     stat.st_size,
+            "Modified": stat.st_mtime_ns,
+        }
+        if detected_build is not None:
+            entry["Build"] = detected_build
+        if detected_os is not None:
+            entry["OSVersion"] = detected_os
+
+        self._sharedsupport_cache[str(sharedsupport_path)] = entry
+        self._sharedsupport_cache_changed = True
+
+        return (detected_build, detected_os)
+
+
+    def _mount_sharedsupport_version(self, sharedsupport_path: Path) -> tuple:
+        """
+        Mounts SharedSupport.dmg and reads the build and OS version from its SFR software update plist
+
+        Parameters:
+            sharedsupport_path (Path): Path to SharedSupport.dmg
+
+        Returns:
+            tuple: Tuple containing the build and OS version
+        """
+
+        detected_build: str = None
+        detected_os:    str = None
 
         # Create temporary directory to extract SharedSupport.dmg to
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -647,4 +1103,40 @@ class LocalInstallerCatalog:
             # Unmount SharedSupport.dmg
             subprocess.run(["/usr/bin/hdiutil", "detach", tmpdir], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
 
-        return (detected_build, detected_os)
\ No newline at end of file
+        return (detected_build, detected_os)
+
+
+    def _load_sharedsupport_cache(self) -> dict:
+        """
+        Loads previously parsed SharedSupport.dmg versions
+
+        Returns:
+            dict: SharedSupport.dmg paths mapped to their size, modification time and versions
+        """
+
+        if not self.cache_path.exists():
+            return {}
+
+        try:
+            cache = plistlib.loads(self.cache_path.read_bytes())
+        except (plistlib.InvalidFileException, ExpatError, OSError, ValueError):
+            return {}
+
+        if not isinstance(cache, dict):
+            return {}
+
+        return cache
+
+
+    def _save_sharedsupport_cache(self) -> None:
+        """
+        Saves parsed SharedSupport.dmg versions for future scans
+        """
+
+        temp_path = self.cache_path.with_suffix(".tmp")
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path.write_bytes(plistlib.dumps(self._sharedsupport_cache))
+            temp_path.replace(self.cache_path)
+        except OSError as error:
+            logging.info(f"Unable to save SharedSupport cache: {error}")
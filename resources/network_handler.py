@@ -3,19 +3,58 @@
 # object for libraries to query download progress and status
 # Copyright (C) 2023, Mykola Grymalyuk
 
+import os
 import time
+import fcntl
+import struct
 import requests
 import threading
 import logging
 import enum
+import queue
 import hashlib
 import atexit
+import plistlib
+import heapq
+import itertools
+import concurrent.futures
 from pathlib import Path
+from dataclasses import dataclass
+from urllib.parse import urlparse
+from xml.parsers.expat import ExpatError
 
-from resources import utilities
+from resources import utilities, integrity_verification
 
 SESSION = requests.Session()
 
+SEGMENTED_DOWNLOAD_CONNECTIONS:  int = 4                   # Connections used for large downloads (ie. InstallAssistant.pkg, KDKs)
+SEGMENTED_DOWNLOAD_MINIMUM_SIZE: int = 1024 * 1024 * 64   # Files smaller than this are always downloaded over a single stream
+SEGMENTED_DOWNLOAD_PIECE_SIZE:   int = 1024 * 1024 * 64   # Maximum size of each byte range, keeps ranges completing roughly in order
+CHUNKLIST_REPAIR_RETRIES:        int = 3                   # Attempts at re-fetching corrupted chunks before giving up
+
+WRITE_BEHIND_MAX_PENDING: int = 8   # Received chunks allowed to wait for disk before the network thread blocks
+F_PREALLOCATE:            int = 42  # fcntl command for reserving disk space on macOS, not exposed by Python's fcntl module
+
+METADATA_CACHE_PATH: Path = Path.home() / Path("Library/Caches/com.dortania.opencore-legacy-patcher")  # Persisted catalogs and manifests
+METADATA_CACHE_TTL:  int  = 60 * 60  # Seconds a cached catalog is served without revalidating against the server
+
+NETWORK_CHECK_TTL:   int  = 30  # Seconds a successful connectivity check is reused for the same host
+NETWORK_CHECK_CACHE: dict = {}  # Host -> time of the last successful check
+NETWORK_CHECK_LOCK = threading.Lock()
+
+DOWNLOAD_SCHEDULER_CONCURRENCY:      int = 3                  # Downloads allowed to transfer at once, others are queued by priority
+DOWNLOAD_BANDWIDTH_LIMIT:            int = 0                  # Bytes per second shared by all downloads, 0 for unlimited
+DOWNLOAD_BACKGROUND_BANDWIDTH_LIMIT: int = 1024 * 1024 * 2    # Bytes per second for background downloads while interactive downloads are active
+
+DOWNLOAD_CACHE_PATH:   Path = METADATA_CACHE_PATH / Path("Downloads")  # Content-addressed copies of large downloads (ie. installers, KDKs)
+DOWNLOAD_CACHE_BUDGET: int  = 1024 * 1024 * 1024 * 16                  # Bytes the download cache may use before evicting least recently used entries
+
+PARTIAL_DOWNLOAD_PATH:    Path = METADATA_CACHE_PATH / Path("Partial")  # Interrupted downloads, used when on the destination's volume (payloads.dmg is mounted fresh every launch)
+PARTIAL_DOWNLOAD_MAX_AGE: int  = 60 * 60 * 24 * 7                       # Seconds an abandoned partial download is kept before being removed
+
+PROGRESS_EVENT_INTERVAL: float = 0.25  # Minimum seconds between progress events published to callbacks
+PROGRESS_RATE_HALF_LIFE: float = 3.0   # Seconds after which a throughput sample carries half its original weight
+
 
 class DownloadStatus(enum.Enum):
     """
@@ -28,6 +67,428 @@ class DownloadStatus(enum.Enum):
     COMPLETE:    str = "Complete"
 
 
+class DownloadPriority(enum.IntEnum):
+    """
+    Enum for download priority, lower values are scheduled first
+    """
+
+    INTERACTIVE: int = 0  # User initiated, ex. macOS installers
+    BACKGROUND:  int = 1  # Unattended, ex. caching KDKs ahead of an OS update
+
+
+@dataclass
+class DownloadProgress:
+    """
+    Snapshot of a download's progress, published to progress callbacks
+    """
+
+    downloaded:   float  # Bytes present in the file, including resumed data
+    total:        float  # Bytes in the file, 0.0 if unknown
+    percent:      float  # -1 if unknown
+    instant_rate: float  # Bytes per second since the previous event
+    rate:         float  # Smoothed bytes per second
+    eta:          float  # Seconds remaining at the smoothed rate, -1 if unknown
+    active:       bool
+    complete:     bool
+    error:        bool
+
+
+class ThroughputEstimator:
+    """
+    Exponentially weighted moving average of transfer rate
+
+    Samples are weighted by the time they cover rather than by count, so the estimate
+    behaves the same however often it's updated. Recent throughput dominates after a
+    few half-lives, letting the estimate follow a link that speeds up or degrades.
+
+    Usage:
+        >>> estimator = ThroughputEstimator()
+        >>> estimator.update(bytes_transferred)
+        >>> print(estimator.rate)
+    """
+
+    def __init__(self, half_life: float = PROGRESS_RATE_HALF_LIFE, clock = time.monotonic) -> None:
+        self.half_life: float = half_life
+        self.clock = clock  # Time source, replaceable for deterministic tests
+
+        self.instant_rate: float = 0.0  # Bytes per second over the last update
+        self.rate:         float = 0.0  # Smoothed bytes per second
+
+        self._samples:    int   = 0
+        self._last_time:  float = self.clock()
+        self._last_bytes: float = 0.0
+
+
+    def reset(self, transferred: float = 0.0) -> None:
+        """
+        Discard the estimate, ie. when a transfer (re)starts
+
+        Parameters:
+            transferred (float): Bytes transferred so far, the baseline for the next sample
+        """
+
+        self.instant_rate = 0.0
+        self.rate         = 0.0
+        self._samples     = 0
+        self._last_time   = self.clock()
+        self._last_bytes  = transferred
+
+
+    def update(self, transferred: float) -> None:
+        """
+        Add a sample
+
+        Parameters:
+            transferred (float): Total bytes transferred so far
+        """
+
+        now = self.clock()
+        elapsed = now - self._last_time
+        if elapsed <= 0:
+            return
+
+        if transferred < self._last_bytes:
+            # Transfer restarted, ie. the server refused to resume
+            self.reset(transferred)
+            return
+
+        self.instant_rate = (transferred - self._last_bytes) / elapsed
+        if self._samples == 0:
+            self.rate = self.instant_rate
+        else:
+            weight = 1 - 2 ** (-elapsed / self.half_life)
+            self.rate += weight * (self.instant_rate - self.rate)
+
+        self._samples   += 1
+        self._last_time  = now
+        self._last_bytes = transferred
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket for limiting bandwidth
+
+    Transfers reserve tokens (bytes) after receiving data, and are told how long to wait
+    to stay within the rate. Reservations larger than the bucket are allowed, with the
+    debt paid off by later waits.
+
+    Usage:
+        >>> bucket = TokenBucket(1024 * 1024)  # 1MB/s
+        >>> time.sleep(bucket.reserve(len(chunk)))
+    """
+
+    def __init__(self, rate: float = 0, capacity: float = None, clock = time.monotonic) -> None:
+        self.rate:     float = rate      # Bytes per second, 0 for unlimited
+        self.capacity: float = capacity  # Maximum burst in bytes, defaults to one second's worth
+        self.clock = clock               # Time source, replaceable for deterministic tests
+
+        self._tokens: float = self._capacity()
+        self._last:   float = self.clock()
+        self._lock:   threading.Lock = threading.Lock()
+
+
+    def set_rate(self, rate: float) -> None:
+        """
+        Change the rate, applies to subsequent reservations
+
+        Parameters:
+            rate (float): Bytes per second, 0 for unlimited
+        """
+
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self._tokens = min(self._tokens, self._capacity())
+
+
+    def reserve(self, amount: int) -> float:
+        """
+        Take tokens from the bucket
+
+        Parameters:
+            amount (int): Number of bytes transferred
+
+        Returns:
+            float: Seconds to wait before transferring more data
+        """
+
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+
+            self._refill()
+            self._tokens -= amount
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+
+    def _capacity(self) -> float:
+        """
+        Maximum number of tokens the bucket can hold
+        """
+
+        return self.capacity if self.capacity is not None else self.rate
+
+
+    def _refill(self) -> None:
+        """
+        Add tokens accumulated since the last reservation
+        """
+
+        now = self.clock()
+        if self.rate > 0:
+            self._tokens = min(self._capacity(), self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+
+class WriteBehindWriter:
+    """
+    Writes received data to a file on a background thread
+
+    The network thread queues data and returns to reading the socket, while the writer
+    verifies, writes and hashes it. The queue is bounded, so a slow disk eventually
+    throttles the network rather than buffering the whole file in memory.
+
+    Items are processed in the order queued. Once any item fails, remaining items are
+    discarded and the error is raised to the next caller of write() or check().
+
+    Usage:
+        >>> writer = WriteBehindWriter(file_descriptor)
+        >>> writer.write(chunk, offset, callback=on_written)
+        >>> writer.close()
+        >>> writer.check()
+    """
+
+    def __init__(self, file_descriptor: int, max_pending: int = WRITE_BEHIND_MAX_PENDING) -> None:
+        self.file_descriptor: int = file_descriptor
+        self.error: Exception = None
+
+        self._queue:  queue.Queue      = queue.Queue(maxsize=max_pending)
+        self._closed: bool             = False
+        self._thread: threading.Thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+
+    def write(self, data: bytes, offset: int, verify = None, callback = None) -> None:
+        """
+        Queue data to be written, blocking while the queue is full
+
+        Parameters:
+            data (bytes):        Data to write
+            offset (int):        Byte offset within the file
+            verify (function):   Called with (offset, data) before writing, raising to reject the data
+            callback (function): Called with (offset, data) once written
+        """
+
+        self.check()
+        self._queue.put((data, offset, verify, callback))
+
+
+    def close(self) -> None:
+        """
+        Wait for queued data to be written and stop the writer thread
+        """
+
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+
+    def check(self) -> None:
+        """
+        Raise the error encountered by the writer thread, if any
+        """
+
+        if self.error is not None:
+            raise self.error
+
+
+    def _run(self) -> None:
+        """
+        Writer thread, processes queued data until closed
+        """
+
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self.error is not None:
+                continue
+
+            data, offset, verify, callback = item
+            try:
+                if verify:
+                    verify(offset, data)
+                self._write_all(data, offset)
+                if callback:
+                    callback(offset, data)
+            except Exception as e:
+                self.error = e
+
+
+    def _write_all(self, data: bytes, offset: int) -> None:
+        """
+        Write data at offset, retrying short writes
+
+        Parameters:
+            data (bytes): Data to write
+            offset (int): Byte offset within the file
+        """
+
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(self.file_descriptor, view, offset)
+            view = view[written:]
+            offset += written
+
+
+class DownloadScheduler:
+    """
+    Process-wide coordination of downloads
+
+    Limits how many downloads transfer at once, starting queued downloads by priority
+    (then submission order). Bandwidth is shared through token buckets: one applying to
+    every download, and one throttling background downloads while interactive
+    downloads are active. Background downloads never take the last slot, so an
+    interactive download can always start.
+
+    DownloadObject.download() goes through DOWNLOAD_SCHEDULER automatically.
+
+    Usage:
+        >>> DOWNLOAD_SCHEDULER.set_bandwidth_limit(1024 * 1024 * 10)
+        >>> download_obj = DownloadObject(url, path, priority=DownloadPriority.BACKGROUND)
+        >>> download_obj.download()  # Queued until a slot is free
+    """
+
+    def __init__(self, max_concurrent: int = DOWNLOAD_SCHEDULER_CONCURRENCY, bandwidth_limit: int = DOWNLOAD_BANDWIDTH_LIMIT, background_bandwidth_limit: int = DOWNLOAD_BACKGROUND_BANDWIDTH_LIMIT, clock = time.monotonic) -> None:
+        self.max_concurrent: int = max_concurrent
+
+        self.bandwidth:            TokenBucket = TokenBucket(bandwidth_limit, clock=clock)
+        self.background_bandwidth: TokenBucket = TokenBucket(background_bandwidth_limit, clock=clock)
+
+        self.active: list = []  # Downloads currently transferring
+
+        self._queue:     list = []  # Heap of (priority, sequence, download)
+        self._sequence:  itertools.count = itertools.count()
+        self._condition: threading.Condition = threading.Condition()
+
+
+    def set_bandwidth_limit(self, bandwidth_limit: int, background_bandwidth_limit: int = None) -> None:
+        """
+        Change bandwidth limits, applies to active downloads immediately
+
+        Parameters:
+            bandwidth_limit (int):            Bytes per second shared by all downloads, 0 for unlimited
+            background_bandwidth_limit (int): Bytes per second for background downloads while interactive downloads are active
+        """
+
+        self.bandwidth.set_rate(bandwidth_limit)
+        if background_bandwidth_limit is not None:
+            self.background_bandwidth.set_rate(background_bandwidth_limit)
+
+
+    def acquire(self, download_obj) -> bool:
+        """
+        Wait for a download slot
+
+        Parameters:
+            download_obj (DownloadObject): Download requesting a slot
+
+        Returns:
+            bool: True once a slot is granted, False if the download was stopped while queued
+        """
+
+        entry = (download_obj.priority, next(self._sequence), download_obj)
+
+        with self._condition:
+            heapq.heappush(self._queue, entry)
+            if not self._can_start(entry):
+                logging.info(f"Queued download: {download_obj.filename}")
+
+            while not self._can_start(entry):
+                if download_obj.should_stop:
+                    self._queue.remove(entry)
+                    heapq.heapify(self._queue)
+                    self._condition.notify_all()
+                    return False
+                self._condition.wait(0.5)
+
+            heapq.heappop(self._queue)
+            self.active.append(download_obj)
+            self._condition.notify_all()
+
+        return True
+
+
+    def release(self, download_obj) -> None:
+        """
+        Release a download's slot, starting the next queued download
+
+        Parameters:
+            download_obj (DownloadObject): Download holding a slot
+        """
+
+        with self._condition:
+            if download_obj in self.active:
+                self.active.remove(download_obj)
+            self._condition.notify_all()
+
+
+    def throttle(self, download_obj, amount: int) -> float:
+        """
+        Account for transferred data
+
+        Parameters:
+            download_obj (DownloadObject): Download that received data
+            amount (int):                  Number of bytes received
+
+        Returns:
+            float: Seconds the download should wait before receiving more data
+        """
+
+        wait = self.bandwidth.reserve(amount)
+        if download_obj.priority == DownloadPriority.BACKGROUND and self._interactive_active():
+            wait = max(wait, self.background_bandwidth.reserve(amount))
+        return wait
+
+
+    def _interactive_active(self) -> bool:
+        """
+        Determine whether an interactive download is transferring
+        """
+
+        return any(download_obj.priority == DownloadPriority.INTERACTIVE for download_obj in list(self.active))
+
+
+    def _can_start(self, entry: tuple) -> bool:
+        """
+        Determine whether a queued download may start
+
+        Parameters:
+            entry (tuple): Queue entry of the download
+
+        Returns:
+            bool: True if the download is first in the queue and a slot is free
+        """
+
+        if self._queue[0] is not entry:
+            return False
+        if len(self.active) >= self.max_concurrent:
+            return False
+        if entry[0] == DownloadPriority.BACKGROUND:
+            # Keep a slot free for interactive downloads
+            background = sum(1 for download_obj in self.active if download_obj.priority == DownloadPriority.BACKGROUND)
+            if background >= max(self.max_concurrent - 1, 1):
+                return False
+        return True
+
+
+DOWNLOAD_SCHEDULER: DownloadScheduler = DownloadScheduler()
+
+
 class NetworkUtilities:
     """
     Utilities for network related tasks, primarily used for downloading files
@@ -44,20 +505,37 @@ class NetworkUtilities:
         """
         Verifies that the network is available
 
+        Successful checks are reused per host for NETWORK_CHECK_TTL seconds,
+        avoiding a round trip for every download object
+        Failures aren't cached, so reconnecting is noticed straight away
+
         Returns:
             bool: True if network is available, otherwise False
         """
 
+        host = urlparse(self.url).netloc
+        with NETWORK_CHECK_LOCK:
+            if host in NETWORK_CHECK_CACHE and time.time() - NETWORK_CHECK_CACHE[host] < NETWORK_CHECK_TTL:
+                return True
+
         try:
             requests.head(self.url, timeout=5, allow_redirects=True)
-            return True
+            result = True
         except (
             requests.exceptions.Timeout,
             requests.exceptions.TooManyRedirects,
             requests.exceptions.ConnectionError,
             requests.exceptions.HTTPError
         ):
-            return False
+            result = False
+
+        with NETWORK_CHECK_LOCK:
+            if result:
+                NETWORK_CHECK_CACHE[host] = time.time()
+            else:
+                NETWORK_CHECK_CACHE.pop(host, None)
+
+        return result
 
     def validate_link(self) -> bool:
         """
@@ -140,182 +618,1693 @@ class NetworkUtilities:
         return result
 
 
-class DownloadObject:
+class MetadataCache:
     """
-    Object for downloading files from the network
+    On-disk HTTP cache for small, frequently fetched metadata (ie. Software Update catalogs, KDK manifest)
+
+    Responses are stored alongside their ETag and Last-Modified validators. Within the TTL
+    the cached copy is served without touching the network, afterwards the server is asked
+    with a conditional GET and a 304 is served locally. If the server is unreachable,
+    the last cached copy is served regardless of age.
 
     Usage:
-        >>> download_object = DownloadObject(url, path)
-        >>> download_object.download(display_progress=True)
+        >>> content = MetadataCache(url).get()
+        >>> if content is None:
+        >>>     # Neither the server nor the cache could provide the resource
 
-        >>> if download_object.is_active():
-        >>>     print(download_object.get_percent())
+        >>> # Offline first: use the cached copy immediately, refreshing it in the background
+        >>> content = MetadataCache(url).get_cached()
+        >>> MetadataCache(url).refresh_async(callback=lambda content: print("Updated"))
+    """
 
-        >>> if not download_object.download_complete:
-        >>>     print("Download failed")
+    def __init__(self, url: str, ttl: int = METADATA_CACHE_TTL, cache_path: Path = METADATA_CACHE_PATH) -> None:
+        self.url:        str  = url
+        self.ttl:        int  = ttl
+        self.cache_path: Path = Path(cache_path)
 
-        >>> print("Download complete"")
-    """
+        url_hash: str = hashlib.sha256(url.encode()).hexdigest()
+        self.data_filepath:  Path = self.cache_path / Path(f"{url_hash}.data")
+        self.state_filepath: Path = self.cache_path / Path(f"{url_hash}.plist")
 
-    def __init__(self, url: str, path: str) -> None:
-        self.url:       str = url
-        self.status:    str = DownloadStatus.INACTIVE
-        self.error_msg: str = ""
-        self.filename:  str = self._get_filename()
+        self.from_cache:  bool = False  # Last request was served from disk
+        self.revalidated: bool = False  # Last request's content was confirmed by the server (200 or 304), rather than served within the TTL or offline
 
-        self.filepath:  Path = Path(path)
 
-        self.total_file_size:      float = 0.0
-        self.downloaded_file_size: float = 0.0
-        self.start_time:           float = time.time()
+    def get(self, headers: dict = None, timeout: int = 10, revalidate: bool = False) -> bytes:
+        """
+        Fetches the resource, serving from cache when possible
 
-        self.error:             bool = False
-        self.should_stop:       bool = False
-        self.download_complete: bool = False
-        self.has_network:       bool = NetworkUtilities(self.url).verify_network_connection()
+        Parameters:
+            headers (dict):    Additional headers to send with the request
+            timeout (int):     Request timeout in seconds
+            revalidate (bool): Ask the server even within the TTL, a 304 still serves the cached copy
 
-        self.active_thread: threading.Thread = None
+        Returns:
+            bytes: Resource content, None if unavailable from both server and cache
+        """
 
-        self.should_checksum: bool = False
+        self.from_cache = False
+        self.revalidated = False
+        state = self._load_state()
+        content = self._load_content() if state else None
 
-        self.checksum = None
-        self._checksum_storage: hash = None
+        if content is not None and not revalidate and time.time() - state["fetched"] < self.ttl:
+            logging.info(f"Using cached copy of {self.url}")
+            self.from_cache = True
+            return content
 
-        if self.has_network:
-            self._populate_file_size()
+        request_headers = dict(headers or {})
+        if content is not None:
+            if state.get("etag"):
+                request_headers["If-None-Match"] = state["etag"]
+            if state.get("last_modified"):
+                request_headers["If-Modified-Since"] = state["last_modified"]
 
+        try:
+            response = SESSION.get(self.url, headers=request_headers, timeout=timeout)
+        except (
+            requests.exceptions.Timeout,
+            requests.exceptions.TooManyRedirects,
+            requests.exceptions.ConnectionError,
+            requests.exceptions.HTTPError
+        ) as error:
+            logging.warn(f"Error calling requests.get: {error}")
+            return self._fallback(content)
 
-    def __del__(self) -> None:
-        self.stop()
+        if response.status_code == 304 and content is not None:
+            logging.info(f"{self.url} unchanged, using cached copy")
+            state["fetched"] = time.time()
+            self._save_state(state)
+            self.from_cache = True
+            self.revalidated = True
+            return content
 
+        if response.status_code != 200:
+            logging.info(f"Unexpected status code {response.status_code} for {self.url}")
+            return self._fallback(content)
 
-    def download(self, display_progress: bool = False, spawn_thread: bool = True, verify_checksum: bool = False) -> None:
-        """
-        Download the file
+        self._save(response)
+        self.revalidated = True
+        return response.content
 
-        Spawns a thread to download the file, so that the main thread can continue
-        Note sleep is disabled while the download is active
 
-        Parameters:
-            display_progress (bool): Display progress in console
-            spawn_thread (bool): Spawn a thread to download the file, otherwise download in the current thread
-            verify_checksum (bool): Calculate checksum of downloaded file if True
+    def get_cached(self) -> bytes:
         """
-        self.status = DownloadStatus.DOWNLOADING
-        logging.info(f"Starting download: {self.filename}")
-        if spawn_thread:
-            if self.active_thread:
-                logging.error("Download already in progress")
+        Fetches the cached copy regardless of age, without contacting the server
+
+        Returns:
+            bytes: Cached content, None if not cached
+        """
+
+        self.from_cache = False
+        self.revalidated = False
+        state = self._load_state()
+        content = self._load_content() if state else None
+        if content is None:
+            return None
+
+        self.from_cache = True
+        return content
+
+
+    def is_stale(self) -> bool:
+        """
+        Query whether the cached copy is missing or older than the TTL
+
+        Returns:
+            bool: True if get() would contact the server
+        """
+
+        state = self._load_state()
+        if state is None or not self.data_filepath.exists():
+            return True
+        return time.time() - state["fetched"] >= self.ttl
+
+
+    def refresh_async(self, headers: dict = None, timeout: int = 10, callback = None) -> threading.Thread:
+        """
+        Refreshes a stale cached copy on a background thread
+        Failures are ignored, the cached copy is kept until the server can be reached
+
+        Parameters:
+            headers (dict):      Additional headers to send with the request
+            timeout (int):       Request timeout in seconds
+            callback (function): Called with the content if the server provided a newer copy
+
+        Returns:
+            threading.Thread: Refresh thread, None if the cached copy is still fresh
+        """
+
+        if not self.is_stale():
+            return None
+
+        def _refresh() -> None:
+            content = self.get(headers=headers, timeout=timeout)
+            if content is not None and self.from_cache is False and callback:
+                callback(content)
+
+        thread = threading.Thread(target=_refresh, daemon=True)
+        thread.start()
+        return thread
+
+
+    def invalidate(self) -> None:
+        """
+        Removes the cached copy, forcing the next request to fetch from the server
+        """
+
+        for file in [self.data_filepath, self.state_filepath]:
+            if file.exists():
+                file.unlink()
+
+
+    def _fallback(self, content: bytes) -> bytes:
+        """
+        Serves the cached copy when the server cannot be used
+
+        Parameters:
+            content (bytes): Cached content, None if not cached
+
+        Returns:
+            bytes: Cached content, None if not cached
+        """
+
+        if content is None:
+            return None
+
+        logging.info(f"Unable to reach server, using cached copy of {self.url}")
+        self.from_cache = True
+        return content
+
+
+    def _load_state(self) -> dict:
+        """
+        Loads the cache entry's metadata
+
+        Returns:
+            dict: Metadata if valid for this URL, otherwise None
+        """
+
+        if not self.state_filepath.exists():
+            return None
+
+        try:
+            state = plistlib.loads(self.state_filepath.read_bytes())
+        except (plistlib.InvalidFileException, ExpatError, OSError, ValueError):
+            return None
+
+        if not isinstance(state, dict) or state.get("url") != self.url or "fetched" not in state:
+            return None
+
+        return state
+
+
+    def _load_content(self) -> bytes:
+        """
+        Loads the cached content
+
+        Returns:
+            bytes: Cached content, None if missing
+        """
+
+        try:
+            return self.data_filepath.read_bytes()
+        except OSError:
+            return None
+
+
+    def _save(self, response: requests.Response) -> None:
+        """
+        Stores the response and its validators
+
+        Parameters:
+            response (requests.Response): Successful response from the server
+        """
+
+        state = {
+            "url":     self.url,
+            "fetched": time.time(),
+        }
+        if response.headers.get("ETag"):
+            state["etag"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            state["last_modified"] = response.headers["Last-Modified"]
+
+        try:
+            self.cache_path.mkdir(parents=True, exist_ok=True)
+            self._atomic_write(self.data_filepath, response.content)
+            self._save_state(state)
+        except OSError as error:
+            logging.info(f"Unable to cache {self.url}: {error}")
+
+
+    def _save_state(self, state: dict) -> None:
+        """
+        Stores the cache entry's metadata
+
+        Parameters:
+            state (dict): Metadata to store
+        """
+
+        try:
+            self._atomic_write(self.state_filepath, plistlib.dumps(state))
+        except OSError as error:
+            logging.info(f"Unable to cache {self.url}: {error}")
+
+
+    def _atomic_write(self, file: Path, content: bytes) -> None:
+        """
+        Writes to a temporary file before moving it into place,
+        avoiding partially written entries if interrupted
+
+        Parameters:
+            file (Path):     Destination file
+            content (bytes): Content to write
+        """
+
+        temp_file = file.with_suffix(file.suffix + ".tmp")
+        temp_file.write_bytes(content)
+        temp_file.replace(file)
+
+
+class DownloadCache:
+    """
+    Content-addressed cache for large downloads, with a least recently used disk budget
+
+    Entries are keyed by URL and the server's validator (ETag or Last-Modified), and point
+    to objects named by their SHA-256. Objects are verified against their hash whenever
+    they're reused.
+
+    Files are never hardlinked in or out of the cache, as downloads may be patched in place
+    (ie. DownloadObject.repair()), which would corrupt the cached object as well. Instead
+    they're cloned where possible, taking no additional space until either copy is modified.
+    Downloads on another volume are copied on a background thread, so completing a
+    download is never held up by the cache.
+
+    Usage:
+        >>> download_obj = DownloadObject(url, path, cache=DOWNLOAD_CACHE)
+        >>> download_obj.download()  # Served from cache if the URL and validator match a previous download
+                                     # or, without a network connection, if the URL was downloaded before
+    """
+
+    def __init__(self, cache_path: Path = DOWNLOAD_CACHE_PATH, budget: int = DOWNLOAD_CACHE_BUDGET) -> None:
+        self.cache_path: Path = Path(cache_path)
+        self.budget:     int  = budget
+
+        self.objects_path: Path = self.cache_path / Path("Objects")
+        self.index_path:   Path = self.cache_path / Path("Index.plist")
+
+        self._lock:    threading.Lock = threading.Lock()
+        self._pending: dict = {}  # Entry key -> threading.Event, set to cancel a background store
+
+
+    def retrieve(self, url: str, validator: str, size: int, destination: Path, any_validator: bool = False) -> "hashlib._Hash":
+        """
+        Place a cached copy of a download at the destination
+
+        The copy placed at the destination is verified against the object's SHA-256,
+        outside of the cache's lock as hashing large files takes a while
+
+        Parameters:
+            url (str):            URL of the download
+            validator (str):      Server's ETag or Last-Modified for the URL
+            size (int):           Expected size reported by the server
+            destination (Path):   Path to place the file at
+            any_validator (bool): Without a validator, use the most recently used copy of the URL (ie. when offline)
+
+        Returns:
+            hashlib._Hash: SHA-256 hash object of the file if served from cache, otherwise None
+        """
+
+        if not validator and not any_validator:
+            return None
+
+        with self._lock:
+            index = self._load_index()
+            if validator:
+                entry = index.get(self._key(url, validator))
+            else:
+                entry = max((entry for entry in index.values() if entry["URL"] == url), key=lambda entry: entry["LastUsed"], default=None)
+            if entry is None or (size and entry["Size"] != size):
+                return None
+            sha256 = entry["SHA256"]
+
+        object_path = self.objects_path / Path(sha256)
+        temp_path   = destination.with_name(destination.name + ".tmp")
+        try:
+            temp_path.unlink(missing_ok=True)
+            if utilities.clone_file(object_path, temp_path):
+                checksum = self._hash_file(temp_path)
+            else:
+                checksum = self._copy_file(object_path, temp_path)
+        except OSError as error:
+            logging.info(f"Unable to use cached copy of {Path(url).name}: {error}")
+            temp_path.unlink(missing_ok=True)
+            return None
+
+        if checksum is None or checksum.hexdigest() != sha256:
+            logging.info(f"Cached copy of {Path(url).name} is corrupted, removing")
+            temp_path.unlink(missing_ok=True)
+            with self._lock:
+                index = self._load_index()
+                self._remove_object(index, sha256)
+                self._save_index(index)
+            return None
+
+        try:
+            temp_path.replace(destination)
+        except OSError as error:
+            logging.info(f"Unable to use cached copy of {Path(url).name}: {error}")
+            temp_path.unlink(missing_ok=True)
+            return None
+
+        with self._lock:
+            index = self._load_index()
+            for other in index.values():
+                if other["URL"] == url and other["SHA256"] == sha256:
+                    other["LastUsed"] = time.time()
+            self._save_index(index)
+
+        logging.info(f"Using cached copy of {Path(url).name}")
+        return checksum
+
+
+    def store(self, url: str, validator: str, source: Path, sha256: str) -> bool:
+        """
+        Add a completed download to the cache by cloning it, evicting least recently used entries if over budget
+
+        Only clones, never copies, so returns quickly either way
+        Use store_async() for downloads that can't be cloned (ie. on another volume)
+
+        Parameters:
+            url (str):       URL of the download
+            validator (str): Server's ETag or Last-Modified for the URL
+            source (Path):   Path of the downloaded file
+            sha256 (str):    SHA-256 of the file
+
+        Returns:
+            bool: True if stored (or already cached), False if the file must be copied instead
+        """
+
+        size = self._storable_size(validator, source, sha256)
+        if size is None:
+            return False
+
+        try:
+            self.objects_path.mkdir(parents=True, exist_ok=True)
+            if source.stat().st_dev != self.objects_path.stat().st_dev:
+                return False
+        except OSError:
+            return False
+
+        object_path = self.objects_path / Path(sha256)
+        if not object_path.exists():
+            temp_path = object_path.with_name(f"{sha256}.{threading.get_ident()}.tmp")
+            if not utilities.clone_file(source, temp_path):
+                return False
+            # Data is only verified when the object is reused, cloning doesn't read the file
+            temp_path.chmod(0o444)
+            temp_path.replace(object_path)
+
+        self._add_entry(url, validator, sha256, size)
+        return True
+
+
+    def store_async(self, url: str, validator: str, source: Path, sha256: str) -> threading.Thread:
+        """
+        Add a completed download to the cache by copying it on a background thread
+
+        The copy is verified against sha256 as it's made, so a file modified in the
+        meantime (ie. repaired) is never stored. Skipped if copying would leave less
+        free space than the file's size, as it's likely still needed (ie. extracting an installer).
+
+        Parameters:
+            url (str):       URL of the download
+            validator (str): Server's ETag or Last-Modified for the URL
+            source (Path):   Path of the downloaded file
+            sha256 (str):    SHA-256 of the file
+
+        Returns:
+            threading.Thread: Thread copying the file, None if skipped
+        """
+
+        size = self._storable_size(validator, source, sha256)
+        if size is None:
+            return None
+
+        if (self.objects_path / Path(sha256)).exists():
+            self._add_entry(url, validator, sha256, size)
+            return None
+
+        try:
+            self.objects_path.mkdir(parents=True, exist_ok=True)
+            available_space = utilities.get_free_space(self.objects_path)
+        except OSError:
+            return None
+        if available_space < size * 2:
+            logging.info(f"Not caching {Path(url).name}, only {utilities.human_fmt(available_space)} free")
+            return None
+
+        key = self._key(url, validator)
+        cancel_event = threading.Event()
+        with self._lock:
+            if key in self._pending:
+                return None
+            self._pending[key] = cancel_event
+
+        thread = threading.Thread(target=self._store_copy, args=(url, validator, source, sha256, size, cancel_event), daemon=True)
+        thread.start()
+        return thread
+
+
+    def remove(self, url: str, validator: str) -> None:
+        """
+        Remove a download from the cache, ie. if it failed validation after downloading
+        Cancels any background store of the download
+
+        Parameters:
+            url (str):       URL of the download
+            validator (str): Server's ETag or Last-Modified for the URL
+        """
+
+        with self._lock:
+            key = self._key(url, validator)
+            if key in self._pending:
+                self._pending[key].set()
+
+            index = self._load_index()
+            entry = index.pop(key, None)
+            if entry is None:
+                return
+            if not any(other["SHA256"] == entry["SHA256"] for other in index.values()):
+                (self.objects_path / Path(entry["SHA256"])).unlink(missing_ok=True)
+            self._save_index(index)
+
+
+    def _storable_size(self, validator: str, source: Path, sha256: str) -> int:
+        """
+        Determine whether a download can be stored at all
+
+        Parameters:
+            validator (str): Server's ETag or Last-Modified for the URL
+            source (Path):   Path of the downloaded file
+            sha256 (str):    SHA-256 of the file
+
+        Returns:
+            int: Size of the file, None if it can't be stored
+        """
+
+        if not validator or not sha256:
+            return None
+
+        try:
+            size = source.stat().st_size
+        except OSError:
+            return None
+
+        if size > self.budget:
+            return None
+
+        return size
+
+
+    def _store_copy(self, url: str, validator: str, source: Path, sha256: str, size: int, cancel_event: threading.Event) -> None:
+        """
+        Copy a download into the cache, run by store_async()'s thread
+
+        Parameters:
+            url (str):                    URL of the download
+            validator (str):              Server's ETag or Last-Modified for the URL
+            source (Path):                Path of the downloaded file
+            sha256 (str):                 Expected SHA-256 of the file
+            size (int):                   Size of the file
+            cancel_event (threading.Event): Set to abandon the copy
+        """
+
+        object_path = self.objects_path / Path(sha256)
+        temp_path   = object_path.with_name(f"{sha256}.{threading.get_ident()}.tmp")
+        try:
+            checksum = self._copy_file(source, temp_path, cancel_event)
+            if checksum is None or checksum.hexdigest() != sha256:
+                logging.info(f"Not caching {Path(url).name}, file changed while copying")
+                return
+
+            with self._lock:
+                if cancel_event.is_set():
+                    return
+                temp_path.chmod(0o444)
+                temp_path.replace(object_path)
+            self._add_entry(url, validator, sha256, size)
+            logging.info(f"Cached {Path(url).name}")
+        except OSError as error:
+            logging.info(f"Unable to cache {Path(url).name}: {error}")
+        finally:
+            temp_path.unlink(missing_ok=True)
+            with self._lock:
+                self._pending.pop(self._key(url, validator), None)
+
+
+    def _add_entry(self, url: str, validator: str, sha256: str, size: int) -> None:
+        """
+        Point an entry at a stored object, evicting least recently used entries if over budget
+
+        Parameters:
+            url (str):       URL of the download
+            validator (str): Server's ETag or Last-Modified for the URL
+            sha256 (str):    SHA-256 of the object
+            size (int):      Size of the object
+        """
+
+        with self._lock:
+            index = self._load_index()
+            index[self._key(url, validator)] = {
+                "URL":       url,
+                "Validator": validator,
+                "SHA256":    sha256,
+                "Size":      size,
+                "LastUsed":  time.time(),
+            }
+            self._evict(index, keep=sha256)
+            self._save_index(index)
+
+
+    def _evict(self, index: dict, keep: str = None) -> None:
+        """
+        Remove least recently used objects until the cache is within budget
+
+        Parameters:
+            index (dict): Cache index
+            keep (str):   SHA-256 of an object never to evict
+        """
+
+        # Objects may be shared by several entries, use the most recent use of each
+        objects: dict = {}
+        for entry in index.values():
+            size, last_used = objects.get(entry["SHA256"], (entry["Size"], 0))
+            objects[entry["SHA256"]] = (size, max(last_used, entry["LastUsed"]))
+
+        total = sum(size for size, _ in objects.values())
+        for sha256, (size, _) in sorted(objects.items(), key=lambda item: item[1][1]):
+            if total <= self.budget:
+                break
+            if sha256 == keep:
+                continue
+            logging.info(f"Evicting {sha256} from download cache")
+            self._remove_object(index, sha256)
+            total -= size
+
+
+    def _remove_object(self, index: dict, sha256: str) -> None:
+        """
+        Remove an object and every entry pointing to it
+
+        Parameters:
+            index (dict): Cache index
+            sha256 (str): SHA-256 of the object
+        """
+
+        for key in [key for key, entry in index.items() if entry["SHA256"] == sha256]:
+            index.pop(key)
+        (self.objects_path / Path(sha256)).unlink(missing_ok=True)
+
+
+    def _copy_file(self, source: Path, destination: Path, cancel_event: threading.Event = None) -> "hashlib._Hash":
+        """
+        Copy a file, calculating its SHA-256 from the data written
+
+        Parameters:
+            source (Path):                  File to copy
+            destination (Path):             Path of the copy
+            cancel_event (threading.Event): Set to abandon the copy
+
+        Returns:
+            hashlib._Hash: SHA-256 hash object of the copy, None if cancelled
+        """
+
+        checksum = hashlib.sha256()
+        with source.open("rb") as source_file, destination.open("wb") as destination_file:
+            while chunk := source_file.read(1024 * 1024 * 4):
+                if cancel_event is not None and cancel_event.is_set():
+                    return None
+                destination_file.write(chunk)
+                checksum.update(chunk)
+
+        return checksum
+
+
+    def _hash_file(self, path: Path) -> "hashlib._Hash":
+        """
+        Calculate SHA-256 of a file
+
+        Parameters:
+            path (Path): File to hash
+
+        Returns:
+            hashlib._Hash: SHA-256 hash object, None if unreadable
+        """
+
+        try:
+            with path.open("rb") as file:
+                return hashlib.file_digest(file, "sha256")
+        except OSError:
+            return None
+
+
+    def _key(self, url: str, validator: str) -> str:
+        """
+        Index key of a URL and validator
+        """
+
+        return hashlib.sha256(f"{url}\n{validator}".encode()).hexdigest()
+
+
+    def _load_index(self) -> dict:
+        """
+        Load the cache index
+
+        Returns:
+            dict: Entry keys mapped to URL, validator, SHA-256, size and last use
+        """
+
+        if not self.index_path.exists():
+            return {}
+
+        try:
+            index = plistlib.loads(self.index_path.read_bytes())
+        except (plistlib.InvalidFileException, ExpatError, OSError, ValueError):
+            return {}
+
+        if not isinstance(index, dict):
+            return {}
+
+        return index
+
+
+    def _save_index(self, index: dict) -> None:
+        """
+        Save the cache index
+
+        Parameters:
+            index (dict): Cache index
+        """
+
+        temp_path = self.index_path.with_suffix(".tmp")
+        try:
+            self.cache_path.mkdir(parents=True, exist_ok=True)
+            temp_path.write_bytes(plistlib.dumps(index))
+            temp_path.replace(self.index_path)
+        except OSError as error:
+            logging.info(f"Unable to save download cache index: {error}")
+
+
+DOWNLOAD_CACHE: DownloadCache = DownloadCache()
+
+
+class DownloadObject:
+    """
+    Object for downloading files from the network
+
+    Usage:
+        >>> download_object = DownloadObject(url, path)
+        >>> download_object.download(display_progress=True)
+
+        >>> # Split large files into byte ranges fetched over multiple connections
+        >>> download_object = DownloadObject(url, path, connections=SEGMENTED_DOWNLOAD_CONNECTIONS)
+
+        >>> # Calculate checksum while downloading
+        >>> download_object = DownloadObject(url, path, checksum_algorithm="sha256")
+        >>> download_object.download()
+        >>> print(download_object.checksum.hexdigest())
+
+        >>> # Verify against an Apple chunklist while downloading, aborting on the first bad chunk
+        >>> chunk_obj = integrity_verification.ChunklistVerification(path, chunklist_stream)
+        >>> download_object = DownloadObject(url, path, chunklist_verifier=chunk_obj)
+
+        >>> # Unattended downloads yield slots and bandwidth to interactive ones
+        >>> download_object = DownloadObject(url, path, priority=DownloadPriority.BACKGROUND)
+
+        >>> # Reuse identical files downloaded previously
+        >>> download_object = DownloadObject(url, path, cache=DOWNLOAD_CACHE)
+
+        >>> # Keep interrupted downloads somewhere other than PARTIAL_DOWNLOAD_PATH
+        >>> download_object = DownloadObject(url, path, partial_path=Path("/Volumes/Scratch/Partial"))
+
+        >>> # Receive throttled progress events instead of polling
+        >>> download_object.add_progress_callback(lambda progress: print(progress.percent, progress.eta))
+        >>> progress_queue = download_object.progress_queue()
+
+        >>> if download_object.is_active():
+        >>>     print(download_object.get_percent())
+
+        >>> if not download_object.download_complete:
+        >>>     print("Download failed")
+
+        >>> print("Download complete"")
+    """
+
+    def __init__(self, url: str, path: str, connections: int = 1, chunklist_verifier: integrity_verification.ChunklistVerification = None, checksum_algorithm: str = None, priority: DownloadPriority = DownloadPriority.INTERACTIVE, scheduler: DownloadScheduler = None, cache: DownloadCache = None, partial_path: Path = None) -> None:
+        self.url:       str = url
+        self.status:    str = DownloadStatus.INACTIVE
+        self.error_msg: str = ""
+        self.filename:  str = self._get_filename()
+
+        self.filepath:  Path = Path(path)
+
+        # Data is written to '.partial' until complete, with progress tracked in a sidecar plist
+        # Allows resuming after a crash, sleep, stop() or relaunch, so both are kept per URL
+        # in a stable directory, and renamed into place once complete
+        # Renaming requires the same volume, otherwise they're kept next to the destination instead
+        self.partial_path:           Path = self._resolve_partial_path(Path(partial_path) if partial_path else PARTIAL_DOWNLOAD_PATH)
+        self.partial_filepath:       Path = self.partial_path / Path(f"{hashlib.sha256(self.url.encode()).hexdigest()}.partial")
+        self.partial_state_filepath: Path = Path(f"{self.partial_filepath}.plist")
+
+        self.total_file_size:      float = 0.0
+        self.downloaded_file_size: float = 0.0
+        self.start_time:           float = time.time()
+
+        self.connections:     int = connections  # Number of connections to use when the server supports byte ranges
+        self.supports_ranges: bool = False
+
+        self.etag:          str = ""  # Validators of the remote file, used to determine whether a partial download can be resumed
+        self.last_modified: str = ""
+
+        self.completed_ranges: list = []  # Byte ranges ([start, end], inclusive) present in the partial file from a previous session
+
+        self.chunklist_verifier: integrity_verification.ChunklistVerification = chunklist_verifier  # Verifies data as it arrives
+
+        self.priority:  DownloadPriority  = priority
+        self.scheduler: DownloadScheduler = scheduler or DOWNLOAD_SCHEDULER  # Coordinates concurrency and bandwidth with other downloads
+        self.cache:     DownloadCache     = cache  # Consulted before downloading if set
+
+        self._active_ranges:      dict = {}  # Start of each range in progress -> next offset to write
+        self._resumed_file_size: float = 0.0
+        self._last_state_save:   float = 0.0
+
+        self._progress_lock: threading.Lock = threading.Lock()
+
+        self._progress_callbacks:  list                = []  # Called with a DownloadProgress as the download advances
+        self._progress_event_lock: threading.Lock      = threading.Lock()
+        self._last_progress_event: float               = 0.0
+        self._throughput:          ThroughputEstimator = ThroughputEstimator()  # Smoothed rate, updated with each progress event
+
+        self.error:             bool = False
+        self.should_stop:       bool = False
+        self.download_complete: bool = False
+        self.has_network:       bool = False
+
+        self.active_thread: threading.Thread = None
+
+        self.should_checksum:    bool = checksum_algorithm is not None or cache is not None  # Cache is keyed by SHA-256
+        self.checksum_algorithm: str  = checksum_algorithm or "sha256"  # Any algorithm supported by hashlib.new()
+
+        self.checksum = None
+        self._checksum_storage: "hashlib._Hash" = None
+        self._checksum_offset:  int             = 0  # Bytes of the file fed to the checksum so far
+
+        # Only ask for the file size up front when required, otherwise it's taken from the download itself
+        # Segmented downloads need the size and byte range support, resuming and caching need the server's validators
+        if self.connections > 1 or self.partial_state_filepath.exists() or self.cache is not None:
+            self.has_network = self._populate_file_size()
+        else:
+            self.has_network = NetworkUtilities(self.url).verify_network_connection()
+
+
+    def __del__(self) -> None:
+        self.stop()
+
+
+    def download(self, display_progress: bool = False, spawn_thread: bool = True, verify_checksum: bool = False) -> None:
+        """
+        Download the file
+
+        Spawns a thread to download the file, so that the main thread can continue
+        Note sleep is disabled while the download is active
+
+        Parameters:
+            display_progress (bool): Display progress in console
+            spawn_thread (bool): Spawn a thread to download the file, otherwise download in the current thread
+            verify_checksum (bool): Calculate checksum of downloaded file if True
+        """
+        self.status = DownloadStatus.DOWNLOADING
+        logging.info(f"Starting download: {self.filename}")
+        if spawn_thread:
+            if self.active_thread:
+                logging.error("Download already in progress")
                 return
-            self.should_checksum = verify_checksum
-            self.active_thread = threading.Thread(target=self._download, args=(display_progress,))
+            self.should_checksum = self.should_checksum or verify_checksum
+            self.active_thread = threading.Thread(target=self._scheduled_download, args=(display_progress,))
             self.active_thread.start()
             return
 
-        self.should_checksum = verify_checksum
-        self._download(display_progress)
+        self.should_checksum = self.should_checksum or verify_checksum
+        self._scheduled_download(display_progress)
+
+
+    def _scheduled_download(self, display_progress: bool = False) -> None:
+        """
+        Wait for the scheduler to grant a slot, then download the file
+
+        Parameters:
+            display_progress (bool): Display progress in console
+        """
+
+        if self.scheduler.acquire(self) is False:
+            self.error = True
+            self.error_msg = "Download stopped"
+            self.status = DownloadStatus.ERROR
+            logging.info(f"Download stopped while queued: {self.filename}")
+            self._publish_progress(force=True)
+            return
+
+        try:
+            # Transfer speed shouldn't include time spent queued
+            self.start_time = time.time()
+            self._throughput.reset(self._transferred_file_size())
+            self._download(display_progress)
+        finally:
+            self.scheduler.release(self)
+            self._publish_progress(force=True)
+
+
+    def add_progress_callback(self, callback) -> None:
+        """
+        Register a callback for progress events
+
+        Events are published at most every PROGRESS_EVENT_INTERVAL seconds while downloading,
+        plus a final event once the download finishes, fails or is stopped
+        Callbacks are invoked on the download's threads, so must be quick and thread-safe
+
+        Parameters:
+            callback (function): Called with a DownloadProgress
+        """
+
+        with self._progress_event_lock:
+            self._progress_callbacks.append(callback)
+
+
+    def remove_progress_callback(self, callback) -> None:
+        """
+        Unregister a callback added with add_progress_callback()
+
+        Parameters:
+            callback (function): Previously registered callback
+        """
+
+        with self._progress_event_lock:
+            if callback in self._progress_callbacks:
+                self._progress_callbacks.remove(callback)
+
+
+    def progress_queue(self) -> queue.Queue:
+        """
+        Receive progress events through a queue, ie. for consumers on another thread
+
+        Returns:
+            queue.Queue: Receives a DownloadProgress per event
+        """
+
+        progress_queue = queue.Queue()
+        self.add_progress_callback(progress_queue.put_nowait)
+        return progress_queue
+
+
+    def get_progress(self) -> DownloadProgress:
+        """
+        Query the download's progress
+
+        Returns:
+            DownloadProgress: Current progress, with rates as of the last published event
+        """
+
+        eta = -1
+        if self.total_file_size != 0.0 and self._throughput.rate > 0:
+            eta = (self.total_file_size - self.downloaded_file_size) / self._throughput.rate
+
+        return DownloadProgress(
+            downloaded=self.downloaded_file_size,
+            total=self.total_file_size,
+            percent=self.get_percent(),
+            instant_rate=self._throughput.instant_rate,
+            rate=self._throughput.rate,
+            eta=eta,
+            active=self.is_active(),
+            complete=self.download_complete,
+            error=self.error,
+        )
+
+
+    def _publish_progress(self, force: bool = False) -> None:
+        """
+        Send a progress event to registered callbacks, throttled to PROGRESS_EVENT_INTERVAL
+
+        Parameters:
+            force (bool): Publish regardless of the interval, ie. on completion
+        """
+
+        with self._progress_event_lock:
+            now = self._throughput.clock()
+            if not force and now - self._last_progress_event < PROGRESS_EVENT_INTERVAL:
+                return
+            self._last_progress_event = now
+
+            self._throughput.update(self._transferred_file_size())
+            progress = self.get_progress()
+            for callback in self._progress_callbacks:
+                try:
+                    callback(progress)
+                except Exception as e:
+                    logging.error(f"Progress callback for {self.filename} failed: {e}")
+
+
+    def _transferred_file_size(self) -> float:
+        """
+        Bytes received over the network this session, excluding resumed data
+        """
+
+        return self.downloaded_file_size - self._resumed_file_size
+
+
+    def _throttle(self, amount: int) -> None:
+        """
+        Wait as long as the scheduler's bandwidth limits require
+
+        Parameters:
+            amount (int): Number of bytes just received
+        """
+
+        deadline = time.time() + self.scheduler.throttle(self, amount)
+        while not self.should_stop and time.time() < deadline:
+            time.sleep(min(deadline - time.time(), 0.1))
+
+
+    def download_simple(self, verify_checksum: bool = False) -> str or bool:
+        """
+        Alternative to download(), mimics  utilities.py's old download_file() function
+
+        Parameters:
+            verify_checksum (bool): Return checksum of downloaded file if True
+
+        Returns:
+            If verify_checksum is True, returns the checksum of the downloaded file
+            Otherwise, returns True if download was successful, False otherwise
+        """
+
+        self.download(spawn_thread=False, verify_checksum=verify_checksum)
+
+        if not self.download_complete:
+            return False
+
+        return self.checksum.hexdigest() if verify_checksum else True
+
+
+    def _get_filename(self) -> str:
+        """
+        Get the filename from the URL
+
+        Returns:
+            str: Filename
+        """
+
+        return Path(self.url).name
+
+
+    def _populate_file_size(self) -> bool:
+        """
+        Get the file size of the file to be downloaded
+
+        If unable to get file size, set to zero
+
+        Returns:
+            bool: True if the server could be reached, False otherwise
+        """
+
+        try:
+            result = SESSION.head(self.url, allow_redirects=True, timeout=5)
+        except (
+            requests.exceptions.Timeout,
+            requests.exceptions.TooManyRedirects,
+            requests.exceptions.ConnectionError,
+            requests.exceptions.HTTPError
+        ) as e:
+            logging.error(f"Error determining file size {self.url}: {str(e)}")
+            self.total_file_size = 0.0
+            return False
+
+        try:
+            self.supports_ranges = result.headers.get("Accept-Ranges", "").lower() == "bytes"
+            self.etag            = result.headers.get("ETag", "")
+            self.last_modified   = result.headers.get("Last-Modified", "")
+            if 'Content-Length' in result.headers:
+                self.total_file_size = float(result.headers['Content-Length'])
+            else:
+                raise Exception("Content-Length missing from headers")
+        except Exception as e:
+            logging.error(f"Error determining file size {self.url}: {str(e)}")
+            logging.error("Assuming file size is 0")
+            self.total_file_size = 0.0
+
+        return True
+
+
+    def _populate_file_size_from_response(self, response: requests.Response) -> None:
+        """
+        Get the file size and validators from the download's response,
+        used when they weren't requested up front
+
+        Parameters:
+            response (requests.Response): Response of a full (non-range) download request
+        """
+
+        self.supports_ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+        self.etag            = response.headers.get("ETag", "")
+        self.last_modified   = response.headers.get("Last-Modified", "")
+        if 'Content-Length' in response.headers and response.headers.get("Content-Encoding", "identity") == "identity":
+            self.total_file_size = float(response.headers['Content-Length'])
+
+        self._verify_free_space()
+
+
+    def _update_checksum(self, chunk: bytes) -> None:
+        """
+        Update checksum with new chunk
+
+        Parameters:
+            chunk (bytes): Chunk to update checksum with
+        """
+        self._checksum_storage.update(chunk)
+        self._checksum_offset += len(chunk)
+
+
+    def _update_checksum_from_file(self, file_descriptor: int) -> None:
+        """
+        Update checksum with data written since the last update
+        Used when data arrives out of order, only the contiguous start of the file is hashed
+
+        Parameters:
+            file_descriptor (int): Open file descriptor of the partial file
+        """
+
+        if not self.should_checksum:
+            return
+
+        with self._progress_lock:
+            ranges = self._merge_ranges(self.completed_ranges + [[start, offset - 1] for start, offset in self._active_ranges.items() if offset > start])
+
+        if not ranges or ranges[0][0] != 0:
+            return
+
+        while self._checksum_offset <= ranges[0][1]:
+            data = os.pread(file_descriptor, min(1024 * 1024 * 4, ranges[0][1] + 1 - self._checksum_offset), self._checksum_offset)
+            if not data:
+                break
+            self._update_checksum(data)
+
+
+    def _prepare_working_directory(self, path: Path) -> bool:
+        """
+        Validates working enviroment, including free space and removing existing files
+
+        Parameters:
+            path (str): Path to the file
+
+        Returns:
+            bool: True if successful, False if not
+        """
+
+        try:
+            if Path(path).exists():
+                logging.info(f"Deleting existing file: {path}")
+                Path(path).unlink()
+
+            for directory in [Path(path).parent, self.partial_path]:
+                if not directory.exists():
+                    logging.info(f"Creating directory: {directory}")
+                    directory.mkdir(parents=True, exist_ok=True)
+
+            self._remove_abandoned_partials()
+            self._verify_free_space()
+
+        except Exception as e:
+            self.error = True
+            self.error_msg = str(e)
+            self.status = DownloadStatus.ERROR
+            logging.error(f"Error preparing working directory {path}: {self.error_msg}")
+            return False
+
+        logging.info(f"- Directory ready: {path}")
+        return True
+
+
+    def _resolve_partial_path(self, partial_path: Path) -> Path:
+        """
+        Select where partial downloads are kept, so completing a download is a rename rather than a copy
+
+        Parameters:
+            partial_path (Path): Preferred directory for partial downloads
+
+        Returns:
+            Path: partial_path if on the destination's volume, otherwise the destination's directory
+        """
+
+        def _device(path: Path) -> int:
+            # Either directory may not exist yet, use the volume it would be created on
+            path = path.absolute()
+            while not path.exists() and path != path.parent:
+                path = path.parent
+            return path.stat().st_dev
+
+        try:
+            if _device(partial_path) == _device(self.filepath.parent):
+                return partial_path
+        except OSError:
+            pass
+
+        return self.filepath.parent
+
+
+    def _verify_free_space(self) -> None:
+        """
+        Ensure the rest of the file fits in the partial directory
+        It's on the destination's volume, so completing the download needs no further space
+
+        Raises:
+            Exception: If there isn't enough free space
+        """
+
+        if self.total_file_size == 0.0 or not self.partial_path.exists():
+            return
+
+        size = self.total_file_size - self._resumed_file_size
+        available_space = utilities.get_free_space(self.partial_path)
+        if size > available_space:
+            msg = f"Not enough free space to download {self.filename}, need {utilities.human_fmt(size)}, have {utilities.human_fmt(available_space)}"
+            logging.error(msg)
+            raise Exception(msg)
 
 
-    def download_simple(self, verify_checksum: bool = False) -> str or bool:
+    def _remove_abandoned_partials(self) -> None:
         """
-        Alternative to download(), mimics  utilities.py's old download_file() function
+        Remove partial downloads untouched for PARTIAL_DOWNLOAD_MAX_AGE, ie. installers the user never resumed
+        """
+
+        # Only files named by URL hash, the partial directory may be the destination's
+        for file in self.partial_path.glob(f"{'[0-9a-f]' * 64}.partial*"):
+            if file in [self.partial_filepath, self.partial_state_filepath]:
+                continue
+            try:
+                if time.time() - file.stat().st_mtime > PARTIAL_DOWNLOAD_MAX_AGE:
+                    logging.info(f"Removing abandoned partial download: {file.name}")
+                    file.unlink()
+            except OSError:
+                pass
+
+
+    def _restore_partial_state(self) -> None:
+        """
+        Restore progress of a previously interrupted download
+
+        The partial file is only reused if the URL, size and server validators
+        (ETag/Last-Modified) match the sidecar state, otherwise it's discarded
+        """
+
+        self.completed_ranges = []
+
+        if not self.partial_filepath.exists() or not self.partial_state_filepath.exists():
+            self._discard_partial_state()
+            return
+
+        try:
+            state = plistlib.loads(self.partial_state_filepath.read_bytes())
+        except Exception as e:
+            logging.info(f"Unable to read partial download state, discarding: {e}")
+            self._discard_partial_state()
+            return
+
+        if state.get("URL") != self.url or self.total_file_size == 0.0 or state.get("Size") != int(self.total_file_size):
+            logging.info(f"Partial download of {self.filename} doesn't match remote file, discarding")
+            self._discard_partial_state()
+            return
+
+        if not (self.etag or self.last_modified) or state.get("ETag") != self.etag or state.get("Last-Modified") != self.last_modified:
+            logging.info(f"Remote file changed since partial download of {self.filename}, discarding")
+            self._discard_partial_state()
+            return
+
+        self.completed_ranges = self._merge_ranges(state.get("Ranges", []))
+        self._resumed_file_size = float(sum(end - start + 1 for start, end in self.completed_ranges))
+        self.downloaded_file_size = self._resumed_file_size
+
+        logging.info(f"Resuming download of {self.filename} ({utilities.human_fmt(self._resumed_file_size)} already downloaded)")
+
+
+    def _save_partial_state(self, file_descriptor: int = None) -> None:
+        """
+        Persist downloaded byte ranges to the sidecar state file
 
         Parameters:
-            verify_checksum (bool): Return checksum of downloaded file if True
+            file_descriptor (int): If provided, flushed to disk before the state is written
+        """
+
+        if self.total_file_size == 0.0:
+            return
+
+        with self._progress_lock:
+            ranges = self.completed_ranges + [[start, offset - 1] for start, offset in self._active_ranges.items() if offset > start]
+
+        state = {
+            "URL":           self.url,
+            "ETag":          self.etag,
+            "Last-Modified": self.last_modified,
+            "Size":          int(self.total_file_size),
+            "Ranges":        self._merge_ranges(ranges),
+        }
+
+        try:
+            if file_descriptor is not None:
+                os.fsync(file_descriptor)
+            temp_path = Path(f"{self.partial_state_filepath}.tmp")
+            with temp_path.open("wb") as file:
+                plistlib.dump(state, file)
+            temp_path.replace(self.partial_state_filepath)
+        except Exception as e:
+            logging.warning(f"Unable to save partial download state: {e}")
+
+        self._last_state_save = time.time()
+
+
+    def _discard_partial_state(self) -> None:
+        """
+        Remove partial file and its sidecar state
+        """
+
+        for path in [self.partial_filepath, self.partial_state_filepath]:
+            if path.exists():
+                path.unlink()
+
+        self.completed_ranges = []
+        self._resumed_file_size = 0.0
+        self.downloaded_file_size = 0.0
+
+
+    def _merge_ranges(self, ranges: list) -> list:
+        """
+        Merge overlapping and adjacent byte ranges
+
+        Parameters:
+            ranges (list): List of [start, end] byte ranges, end inclusive
 
         Returns:
-            If verify_checksum is True, returns the checksum of the downloaded file
-            Otherwise, returns True if download was successful, False otherwise
+            list: Sorted list of merged [start, end] byte ranges
         """
 
-        if verify_checksum:
-            self.should_checksum = True
-            self.checksum = hashlib.sha256()
+        merged = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+                continue
+            merged.append([start, end])
 
-        self.download(spawn_thread=False)
+        return merged
 
-        if not self.download_complete:
-            return False
 
-        return self.checksum.hexdigest() if self.checksum else True
+    def _missing_ranges(self) -> list:
+        """
+        Determine byte ranges not yet present in the partial file
+
+        Returns:
+            list: List of (start, end) byte ranges, end inclusive
+        """
 
+        missing = []
+        offset = 0
+        for start, end in self.completed_ranges:
+            if start > offset:
+                missing.append((offset, start - 1))
+            offset = max(offset, end + 1)
+        if offset < int(self.total_file_size):
+            missing.append((offset, int(self.total_file_size) - 1))
 
-    def _get_filename(self) -> str:
+        return missing
+
+
+    def _verify_existing_ranges(self, ranges: list) -> bool:
         """
-        Get the filename from the URL
+        Feed data already present in the partial file to the chunklist verifier
+
+        Parameters:
+            ranges (list): List of [start, end] byte ranges, end inclusive, aligned to chunk boundaries
 
         Returns:
-            str: Filename
+            bool: True if all chunks passed verification, False otherwise
         """
 
-        return Path(self.url).name
+        if not ranges:
+            return True
+
+        logging.info(f"Verifying previously downloaded data of {self.filename}")
+        with open(self.partial_filepath, "rb") as file:
+            for start, end in ranges:
+                file.seek(start)
+                offset = start
+                while offset <= end:
+                    data = file.read(min(1024 * 1024 * 4, end + 1 - offset))
+                    if not data or self.chunklist_verifier.stream_update(offset, data) is False:
+                        logging.info(f"Previously downloaded data failed verification, restarting download of {self.filename}")
+                        self.chunklist_verifier.stream_reset()
+                        return False
+                    offset += len(data)
+
+        return True
 
 
-    def _populate_file_size(self) -> None:
+    def _verify_chunk(self, range_start: int, offset: int, data: bytes) -> None:
         """
-        Get the file size of the file to be downloaded
+        Verify received data against the chunklist, if provided
+        On failure, the download is aborted and the failed chunk won't be considered downloaded
 
-        If unable to get file size, set to zero
+        Parameters:
+            range_start (int): Start of the byte range being downloaded
+            offset (int):      Byte offset of data within the file
+            data (bytes):      Data received
+        """
+
+        if self.chunklist_verifier is None:
+            return
+
+        if self.chunklist_verifier.stream_update(offset, data) is True:
+            return
+
+        with self._progress_lock:
+            self._active_ranges[range_start] = max(range_start, self.chunklist_verifier.chunk_floor(offset))
+
+        raise Exception(f"Chunklist verification failed: {self.chunklist_verifier.error_msg}")
+
+
+    def _should_segment(self) -> bool:
+        """
+        Determine whether the file should be split into byte ranges
+
+        Returns:
+            bool: True if segmented download should be used, False for a single stream
+        """
+
+        if self.connections <= 1:
+            return False
+        if self.total_file_size < SEGMENTED_DOWNLOAD_MINIMUM_SIZE:
+            return False
+        if self.supports_ranges is False:
+            logging.info(f"Server doesn't advertise byte ranges for {self.filename}, falling back to single stream")
+            return False
+        return True
+
+
+    def _generate_segments(self) -> list:
+        """
+        Split the missing parts of the file into byte ranges
+        Ranges are capped in size and handed out in order, so the start of the
+        file completes first and can be hashed while the rest downloads
+
+        Returns:
+            list: List of (start, end) tuples, end inclusive
+        """
+
+        missing_ranges = self._missing_ranges()
+        segment_size   = max(min(-(-sum(end - start + 1 for start, end in missing_ranges) // self.connections), SEGMENTED_DOWNLOAD_PIECE_SIZE), 1)
+
+        segments = []
+        for start, end in missing_ranges:
+            while start <= end:
+                stop = start + segment_size
+                if self.chunklist_verifier:
+                    # Each chunk must be hashed in order, so keep chunks within a single segment
+                    stop = self.chunklist_verifier.chunk_ceiling(stop)
+                stop = min(stop, end + 1)
+                segments.append((start, stop - 1))
+                start = stop
+
+        return segments
+
+
+    def _display_progress(self) -> None:
+        """
+        Print download progress to console
+        """
+
+        # Don't use logging here, as we'll be spamming the log file
+        if self.total_file_size == 0.0:
+            print(f"Downloaded {utilities.human_fmt(self.downloaded_file_size)} of {self.filename}")
+        else:
+            print(f"Downloaded {self.get_percent():.2f}% of {self.filename} ({utilities.human_fmt(self._throughput.rate)}/s) ({self.get_time_remaining():.2f} seconds remaining)")
+
+
+    def _download_stream(self, display_progress: bool = False) -> None:
         """
+        Download the file over a single stream
+        Resumes from the end of the partial file if possible
 
+        Parameters:
+            display_progress (bool): Display progress in console
+        """
+
+        offset  = 0
+        headers = {}
+        if self.completed_ranges and self.completed_ranges[0][0] == 0:
+            offset = self.completed_ranges[0][1] + 1
+            if self.chunklist_verifier:
+                offset = self.chunklist_verifier.chunk_floor(offset)
+                if self._verify_existing_ranges([[0, offset - 1]]) is False:
+                    offset = 0
+        if offset:
+            headers = {"Range": f"bytes={offset}-", "If-Range": self.etag or self.last_modified}
+
+        response = NetworkUtilities().get(self.url, headers=headers, stream=True, timeout=10)
+        if response.status_code not in [200, 206]:
+            raise Exception(f"Unexpected response from server (status: {response.status_code})")
+
+        if offset and response.status_code != 206:
+            logging.info(f"Server didn't honour resume request for {self.filename}, restarting download")
+            offset = 0
+            if self.chunklist_verifier:
+                self.chunklist_verifier.stream_reset()
+
+        if self.total_file_size == 0.0 and response.status_code == 200:
+            self._populate_file_size_from_response(response)
+
+        # Only the leading range can be resumed over a single stream
+        self._resumed_file_size = float(offset)
+        self.downloaded_file_size = float(offset)
+        self.completed_ranges = []
+        self._active_ranges = {0: offset}
+
+        file_descriptor = os.open(self.partial_filepath, os.O_RDWR | os.O_CREAT)
         try:
-            result = SESSION.head(self.url, allow_redirects=True, timeout=5)
-            if 'Content-Length' in result.headers:
-                self.total_file_size = float(result.headers['Content-Length'])
-            else:
-                raise Exception("Content-Length missing from headers")
-        except Exception as e:
-            logging.error(f"Error determining file size {self.url}: {str(e)}")
-            logging.error("Assuming file size is 0")
-            self.total_file_size = 0.0
+            os.ftruncate(file_descriptor, offset)
+            if offset and self.should_checksum:
+                while self._checksum_offset < offset:
+                    self._update_checksum(os.pread(file_descriptor, min(1024 * 1024 * 4, offset - self._checksum_offset), self._checksum_offset))
+            self._preallocate(file_descriptor)
+
+            writer = WriteBehindWriter(file_descriptor)
+            try:
+                write_offset = offset
+                for i, chunk in enumerate(response.iter_content(1024 * 1024 * 4)):
+                    if self.should_stop:
+                        raise Exception("Download stopped")
+                    if chunk:
+                        writer.write(chunk, write_offset, verify=self._verify_stream_chunk, callback=self._stream_chunk_written)
+                        write_offset += len(chunk)
+                        if display_progress and i % 100:
+                            self._display_progress()
+                        if time.time() - self._last_state_save > 1:
+                            self._save_partial_state(file_descriptor)
+                        self._throttle(len(chunk))
+                writer.close()
+                writer.check()
+                if self.total_file_size and write_offset != self.total_file_size:
+                    raise Exception(f"Download ended early, received {write_offset} of {int(self.total_file_size)} bytes")
+            finally:
+                writer.close()
+                self._save_partial_state(file_descriptor)
+        finally:
+            os.close(file_descriptor)
+
+
+    def _verify_stream_chunk(self, offset: int, data: bytes) -> None:
+        """
+        Verify data received over a single stream, run by the writer thread before writing
+
+        Parameters:
+            offset (int): Byte offset of data within the file
+            data (bytes): Data received
+        """
 
+        self._verify_chunk(0, offset, data)
 
-    def _update_checksum(self, chunk: bytes) -> None:
+
+    def _stream_chunk_written(self, offset: int, data: bytes) -> None:
         """
-        Update checksum with new chunk
+        Record data received over a single stream as downloaded, run by the writer thread
 
         Parameters:
-            chunk (bytes): Chunk to update checksum with
+            offset (int): Byte offset of data within the file
+            data (bytes): Data written
         """
-        self._checksum_storage.update(chunk)
 
+        with self._progress_lock:
+            self._active_ranges[0] += len(data)
+            self.downloaded_file_size += len(data)
+        if self.should_checksum:
+            self._update_checksum(data)
+        self._publish_progress()
 
-    def _prepare_working_directory(self, path: Path) -> bool:
+
+    def _preallocate(self, file_descriptor: int) -> None:
         """
-        Validates working enviroment, including free space and removing existing files
+        Reserve disk space for the whole file and extend it to its final size
+        Avoids growing the file one write at a time, and fails early if the disk fills up
 
         Parameters:
-            path (str): Path to the file
+            file_descriptor (int): Open file descriptor of the partial file
+        """
 
-        Returns:
-            bool: True if successful, False if not
+        if self.total_file_size == 0.0:
+            return
+
+        size = int(self.total_file_size)
+        remaining = size - os.fstat(file_descriptor).st_size
+        if remaining <= 0:
+            return
+
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(file_descriptor, 0, size)
+            except OSError as e:
+                logging.info(f"Unable to preallocate {self.filename}: {e}")
+        else:
+            # macOS: fstore_t, try a contiguous allocation (F_ALLOCATECONTIG | F_ALLOCATEALL) before any (F_ALLOCATEALL)
+            for flags in [0x2 | 0x4, 0x4]:
+                try:
+                    fcntl.fcntl(file_descriptor, F_PREALLOCATE, struct.pack("Iiqqq", flags, 3, 0, remaining, 0))  # F_PEOFPOSMODE
+                    break
+                except OSError as e:
+                    error = e
+            else:
+                logging.info(f"Unable to preallocate {self.filename}: {error}")
+
+        os.ftruncate(file_descriptor, size)
+
+
+    def _download_segmented(self, display_progress: bool = False) -> None:
+        """
+        Download the file as byte ranges over multiple connections
+        Each range is written in place into a file preallocated to the full size
+
+        Parameters:
+            display_progress (bool): Display progress in console
         """
 
+        if self.chunklist_verifier and self.completed_ranges:
+            # Partially downloaded chunks are fetched again, as they can't be hashed in order otherwise
+            self.completed_ranges = self.chunklist_verifier.aligned_ranges(self.completed_ranges)
+            if self._verify_existing_ranges(self.completed_ranges) is False:
+                self.completed_ranges = []
+            self._resumed_file_size = float(sum(end - start + 1 for start, end in self.completed_ranges))
+            self.downloaded_file_size = self._resumed_file_size
+
+        segments = self._generate_segments()
+        logging.info(f"Downloading {self.filename} in {len(segments)} segments")
+
+        abort_event = threading.Event()
+        file_descriptor = os.open(self.partial_filepath, os.O_RDWR | os.O_CREAT)
+        writer = None
         try:
-            if Path(path).exists():
-                logging.info(f"Deleting existing file: {path}")
-                Path(path).unlink()
-                return True
+            self._preallocate(file_descriptor)
+            writer = WriteBehindWriter(file_descriptor, max_pending=WRITE_BEHIND_MAX_PENDING * self.connections)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=self.connections) as executor:
+                futures = [executor.submit(self._download_segment, writer, start, end, abort_event) for start, end in segments]
+                while True:
+                    done, pending = concurrent.futures.wait(futures, timeout=1, return_when=concurrent.futures.FIRST_EXCEPTION)
+                    if any(future.exception() for future in done):
+                        abort_event.set()
+                        break
+                    if not pending:
+                        break
+                    if display_progress:
+                        self._display_progress()
+                    self._save_partial_state(file_descriptor)
+                    self._update_checksum_from_file(file_descriptor)
+            writer.close()
+            for future in futures:
+                if future.exception():
+                    raise future.exception()
+            writer.check()
+            self._update_checksum_from_file(file_descriptor)
+        finally:
+            if writer:
+                writer.close()
+            self._save_partial_state(file_descriptor)
+            os.close(file_descriptor)
+
+
+    def _download_segment(self, writer: WriteBehindWriter, start: int, end: int, abort_event: threading.Event) -> None:
+        """
+        Download a single byte range and queue it to be written at its offset
 
-            if not Path(path).parent.exists():
-                logging.info(f"Creating directory: {Path(path).parent}")
-                Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Parameters:
+            writer (WriteBehindWriter):    Writer for the target file
+            start (int):                   First byte of the range
+            end (int):                     Last byte of the range (inclusive)
+            abort_event (threading.Event): Set when another segment failed
+        """
 
-            available_space = utilities.get_free_space(Path(path).parent)
-            if self.total_file_size > available_space:
-                msg = f"Not enough free space to download {self.filename}, need {utilities.human_fmt(self.total_file_size)}, have {utilities.human_fmt(available_space)}"
-                logging.error(msg)
-                raise Exception(msg)
+        if abort_event.is_set():
+            return
 
-        except Exception as e:
-            self.error = True
-            self.error_msg = str(e)
-            self.status = DownloadStatus.ERROR
-            logging.error(f"Error preparing working directory {path}: {self.error_msg}")
-            return False
+        with self._progress_lock:
+            self._active_ranges[start] = start
 
-        logging.info(f"- Directory ready: {path}")
-        return True
+        headers = {"Range": f"bytes={start}-{end}"}
+        if self.etag or self.last_modified:
+            headers["If-Range"] = self.etag or self.last_modified
+
+        response = NetworkUtilities().get(self.url, headers=headers, stream=True, timeout=10)
+        if response.status_code != 206:
+            raise Exception(f"Server didn't honour byte range {start}-{end} (status: {response.status_code})")
+
+        offset = start
+        for chunk in response.iter_content(1024 * 1024):
+            if self.should_stop:
+                raise Exception("Download stopped")
+            if abort_event.is_set():
+                return
+            if not chunk:
+                continue
+            writer.write(
+                chunk, offset,
+                verify=lambda offset, data: self._verify_chunk(start, offset, data),
+                callback=lambda offset, data: self._segment_chunk_written(start, offset, data),
+            )
+            offset += len(chunk)
+            self._throttle(len(chunk))
+
+        if offset != end + 1:
+            raise Exception(f"Byte range {start}-{end} ended early, received {offset - start} of {end - start + 1} bytes")
+
+
+    def _segment_chunk_written(self, range_start: int, offset: int, data: bytes) -> None:
+        """
+        Record data of a byte range as downloaded, run by the writer thread
+
+        Parameters:
+            range_start (int): Start of the byte range being downloaded
+            offset (int):      Byte offset of data within the file
+            data (bytes):      Data written
+        """
+
+        with self._progress_lock:
+            self._active_ranges[range_start] = offset + len(data)
+            self.downloaded_file_size += len(data)
+        self._publish_progress()
 
 
     def _download(self, display_progress: bool = False) -> None:
@@ -331,37 +2320,52 @@ class DownloadObject:
         utilities.disable_sleep_while_running()
 
         try:
+            if self._retrieve_from_cache(offline=not self.has_network):
+                self.status = DownloadStatus.COMPLETE
+                utilities.enable_sleep_after_running()
+                return
+
             if not self.has_network:
                 raise Exception("No network connection")
 
+            self._restore_partial_state()
+
+            if self.should_checksum:
+                self.checksum = self._checksum_storage = hashlib.new(self.checksum_algorithm)
+                self._checksum_offset = 0
+
             if self._prepare_working_directory(self.filepath) is False:
                 raise Exception(self.error_msg)
 
-            response = NetworkUtilities().get(self.url, stream=True, timeout=10)
-
-            with open(self.filepath, 'wb') as file:
-                atexit.register(self.stop)
-                for i, chunk in enumerate(response.iter_content(1024 * 1024 * 4)):
-                    if self.should_stop:
-                        raise Exception("Download stopped")
-                    if chunk:
-                        file.write(chunk)
-                        self.downloaded_file_size += len(chunk)
-                        if self.should_checksum:
-                            self._update_checksum(chunk)
-                        if display_progress and i % 100:
-                            # Don't use logging here, as we'll be spamming the log file
-                            if self.total_file_size == 0.0:
-                                print(f"Downloaded {utilities.human_fmt(self.downloaded_file_size)} of {self.filename}")
-                            else:
-                                print(f"Downloaded {self.get_percent():.2f}% of {self.filename} ({utilities.human_fmt(self.get_speed())}/s) ({self.get_time_remaining():.2f} seconds remaining)")
-                self.download_complete = True
-                logging.info(f"Download complete: {self.filename}")
-                logging.info("Stats:")
-                logging.info(f"- Downloaded size: {utilities.human_fmt(self.downloaded_file_size)}")
-                logging.info(f"- Time elapsed: {(time.time() - self.start_time):.2f} seconds")
-                logging.info(f"- Speed: {utilities.human_fmt(self.downloaded_file_size / (time.time() - self.start_time))}/s")
-                logging.info(f"- Location: {self.filepath}")
+            atexit.register(self.stop)
+            if self._should_segment():
+                self._download_segmented(display_progress)
+            else:
+                self._download_stream(display_progress)
+
+            if self.chunklist_verifier:
+                self.chunklist_verifier.stream_finalize()
+                if self.chunklist_verifier.status == integrity_verification.ChunklistStatus.FAILURE:
+                    raise Exception(f"Chunklist verification failed: {self.chunklist_verifier.error_msg}")
+                logging.info(f"Chunklist verification passed: {self.filename}")
+
+            # Clone into the cache before renaming, the cache usually shares the partial directory's volume
+            sha256 = self.checksum.hexdigest() if self.cache and self.checksum and self.checksum.name == "sha256" else None
+            cached = self.cache.store(self.url, self.etag or self.last_modified, self.partial_filepath, sha256) if self.cache else False
+
+            # Partial directory is on the destination's volume, see _resolve_partial_path()
+            os.replace(self.partial_filepath, self.filepath)
+            self.partial_state_filepath.unlink(missing_ok=True)
+
+            self.download_complete = True
+            if self.cache and not cached:
+                self.cache.store_async(self.url, self.etag or self.last_modified, self.filepath, sha256)
+            logging.info(f"Download complete: {self.filename}")
+            logging.info("Stats:")
+            logging.info(f"- Downloaded size: {utilities.human_fmt(self.downloaded_file_size)}")
+            logging.info(f"- Time elapsed: {(time.time() - self.start_time):.2f} seconds")
+            logging.info(f"- Speed: {utilities.human_fmt(self.get_speed())}/s")
+            logging.info(f"- Location: {self.filepath}")
         except Exception as e:
             self.error = True
             self.error_msg = str(e)
@@ -372,6 +2376,129 @@ class DownloadObject:
         utilities.enable_sleep_after_running()
 
 
+    def _retrieve_from_cache(self, offline: bool = False) -> bool:
+        """
+        Place a previously downloaded copy of the file from the cache
+
+        Parameters:
+            offline (bool): The server can't be reached to confirm the copy is current, use the latest one
+
+        Returns:
+            bool: True if served from cache, False if the file must be downloaded
+        """
+
+        if self.cache is None:
+            return False
+
+        checksum = self.cache.retrieve(self.url, self.etag or self.last_modified, int(self.total_file_size), self.filepath, any_validator=offline)
+        if checksum is None:
+            return False
+
+        self._discard_partial_state()
+
+        if self.should_checksum:
+            if self.checksum_algorithm == "sha256":
+                self.checksum = checksum
+            else:
+                with self.filepath.open("rb") as file:
+                    self.checksum = hashlib.file_digest(file, self.checksum_algorithm)
+
+        self.downloaded_file_size = float(self.filepath.stat().st_size)
+        self.download_complete = True
+        logging.info(f"Download complete: {self.filename} (cached)")
+        logging.info(f"- Location: {self.filepath}")
+        return True
+
+
+    def remove_from_cache(self) -> None:
+        """
+        Remove the downloaded file from the cache, used when it fails validation
+        """
+
+        if self.cache is None:
+            return
+
+        self.cache.remove(self.url, self.etag or self.last_modified)
+
+
+    def repair(self, chunk_obj: integrity_verification.ChunklistVerification, retries: int = CHUNKLIST_REPAIR_RETRIES) -> bool:
+        """
+        Repair a downloaded file by re-fetching only the chunks failing chunklist verification
+
+        Failing chunks are fetched with byte range requests, patched in place
+        and re-verified, until the file is clean or the retry budget runs out
+
+        Parameters:
+            chunk_obj (ChunklistVerification): Chunklist of the downloaded file
+            retries (int):                     Number of repair attempts
+
+        Returns:
+            bool: True if the file passes verification, False otherwise
+        """
+
+        if chunk_obj.chunks is None or not self.filepath.exists():
+            return False
+
+        if self.supports_ranges is False:
+            logging.info(f"Server doesn't advertise byte ranges for {self.filename}, unable to repair")
+            return False
+
+        chunk_obj.error_msg = ""
+        failed_chunks = chunk_obj.find_failed_chunks()
+
+        for attempt in range(1, retries + 1):
+            if not failed_chunks:
+                break
+
+            logging.info(f"Repairing {len(failed_chunks)} corrupted chunks of {self.filename} (attempt {attempt} of {retries})")
+
+            file_descriptor = os.open(self.filepath, os.O_WRONLY)
+            try:
+                with concurrent.futures.ThreadPoolExecutor(max_workers=max(self.connections, 1)) as executor:
+                    list(executor.map(lambda index: self._repair_chunk(file_descriptor, chunk_obj, index), failed_chunks))
+            finally:
+                os.close(file_descriptor)
+
+            failed_chunks = chunk_obj.find_failed_chunks(failed_chunks)
+
+        if failed_chunks:
+            chunk_obj.error_msg = f"Unable to repair {len(failed_chunks)} corrupted chunks after {retries} attempts (first: chunk {failed_chunks[0] + 1})"
+            chunk_obj.current_chunk = failed_chunks[0] + 1
+            chunk_obj.status = integrity_verification.ChunklistStatus.FAILURE
+            logging.info(chunk_obj.error_msg)
+            return False
+
+        chunk_obj.current_chunk = chunk_obj.total_chunks
+        chunk_obj.status = integrity_verification.ChunklistStatus.SUCCESS
+        logging.info(f"Successfully repaired {self.filename}")
+        return True
+
+
+    def _repair_chunk(self, file_descriptor: int, chunk_obj: integrity_verification.ChunklistVerification, index: int) -> None:
+        """
+        Re-fetch a single chunk and write it in place
+
+        Parameters:
+            file_descriptor (int):             Open file descriptor of the downloaded file
+            chunk_obj (ChunklistVerification): Chunklist of the downloaded file
+            index (int):                       Index of the chunk to re-fetch
+        """
+
+        start = chunk_obj.chunk_offsets[index]
+        end   = chunk_obj.chunk_offsets[index + 1] - 1
+
+        headers = {"Range": f"bytes={start}-{end}"}
+        if self.etag or self.last_modified:
+            headers["If-Range"] = self.etag or self.last_modified
+
+        response = NetworkUtilities().get(self.url, headers=headers, timeout=10)
+        if response.status_code != 206 or len(response.content) != end - start + 1:
+            logging.info(f"Failed to fetch chunk {index + 1} (status: {response.status_code})")
+            return
+
+        os.pwrite(file_descriptor, response.content, start)
+
+
     def get_percent(self) -> float:
         """
         Query the download percent
@@ -387,18 +2514,19 @@ class DownloadObject:
 
     def get_speed(self) -> float:
         """
-        Query the download speed
+        Query the download speed, averaged over the whole download
 
         Returns:
             float: The download speed in bytes per second
         """
 
-        return self.downloaded_file_size / (time.time() - self.start_time)
+        return (self.downloaded_file_size - self._resumed_file_size) / (time.time() - self.start_time)
 
 
     def get_time_remaining(self) -> float:
         """
         Query the time remaining for the download
+        Based on the smoothed rate, falling back to the average speed before the first sample
 
         Returns:
             float: The time remaining in seconds, or -1 if unknown
@@ -406,7 +2534,7 @@ class DownloadObject:
 
         if self.total_file_size == 0.0:
             return -1
-        speed = self.get_speed()
+        speed = self._throughput.rate or self.get_speed()
         if speed <= 0:
             return -1
         return (self.total_file_size - self.downloaded_file_size) / speed
@@ -3,6 +3,8 @@
 import argparse
 import atexit
 import binascii
+import ctypes
+import fcntl
 import logging
 import math
 import os
@@ -10,6 +12,7 @@ import plistlib
 import re
 import shutil
 import subprocess
+import sys
 from pathlib import Path
 import py_sip_xnu
 
@@ -17,6 +20,9 @@ from data import os_data, sip_data
 from resources import constants, ioreg
 
 
+FICLONE = 0x40049409  # ioctl for cloning a file on Linux filesystems with reflink support
+
+
 def hexswap(input_hex: str):
     hex_pairs = [input_hex[i : i + 2] for i in range(0, len(input_hex), 2)]
     hex_rev = hex_pairs[::-1]
@@ -482,6 +488,38 @@ def get_free_space(disk=None):
     total, used, free = shutil.disk_usage(disk)
     return free
 
+def clone_file(source: Path, destination: Path) -> bool:
+    """
+    Clone a file, sharing data blocks with the source until either is modified
+    Uses clonefile(2) on macOS (APFS), and the FICLONE ioctl elsewhere (ie. Btrfs, XFS)
+
+    Never falls back to copying, so always returns quickly
+
+    Parameters:
+        source (Path):      File to clone
+        destination (Path): Path of the clone, must not exist
+
+    Returns:
+        bool: True if cloned, False if unsupported (ie. different volumes, HFS+)
+    """
+    if sys.platform == "darwin":
+        try:
+            return ctypes.CDLL(None, use_errno=True).clonefile(os.fsencode(source), os.fsencode(destination), 0) == 0
+        except (OSError, AttributeError):
+            return False
+
+    try:
+        with open(source, "rb") as source_file, open(destination, "xb") as destination_file:
+            try:
+                fcntl.ioctl(destination_file.fileno(), FICLONE, source_file.fileno())
+                return True
+            except OSError:
+                pass
+        Path(destination).unlink(missing_ok=True)
+    except OSError:
+        pass
+    return False
+
 def grab_mount_point_from_disk(disk):
     data = plistlib.loads(subprocess.run(["/usr/sbin/diskutil", "info", "-plist", disk], stdout=subprocess.PIPE).stdout.decode().strip().encode())
     return data["MountPoint"]
@@ -574,6 +612,7 @@ def fetch_staged_update(variant: str = "Update") -> (str, str):
 def check_cli_args():
     parser = argparse.ArgumentParser()
     parser.add_argument("--build", help="Build OpenCore", action="store_true", required=False)
+    parser.add_argument("--build_all", help="Build OpenCore for every supported model, in parallel", action="store_true", required=False)
     parser.add_argument("--verbose", help="Enable verbose boot", action="store_true", required=False)
     parser.add_argument("--debug_oc", help="Enable OpenCore DEBUG", action="store_true", required=False)
     parser.add_argument("--debug_kext", help="Enable kext DEBUG", action="store_true", required=False)
@@ -609,6 +648,7 @@ def check_cli_args():
     args = parser.parse_args()
     if not (
         args.build or
+        args.build_all or
         args.patch_sys_vol or
         args.unpatch_sys_vol or
         args.auto_patch or
@@ -11,7 +11,7 @@ import threading
 
 from pathlib import Path
 
-from resources import constants, kdk_handler, utilities
+from resources import constants, kdk_handler, utilities, network_handler
 from resources.wx_gui import gui_support, gui_download
 
 
@@ -54,7 +54,8 @@ class OSUpdateFrame(wx.Frame):
         if self.kdk_obj.success is False:
             self._exit()
 
-        kdk_download_obj = self.kdk_obj.retrieve_download()
+        # Caching ahead of an OS update is unattended, yield to any interactive downloads
+        kdk_download_obj = self.kdk_obj.retrieve_download(priority=network_handler.DownloadPriority.BACKGROUND)
         if not kdk_download_obj:
             # KDK is already downloaded
             # Return false since we didn't display anything
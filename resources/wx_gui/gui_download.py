@@ -1,5 +1,6 @@
 # Generate UI for downloading files
 import wx
+import queue
 import logging
 
 from resources import constants, network_handler, utilities
@@ -61,18 +62,28 @@ class DownloadFrame(wx.Frame):
         frame.SetSize((-1, return_button.GetPosition()[1] + return_button.GetSize()[1] + 40))
         frame.ShowWindowModal()
 
+        progress_queue = self.download_obj.progress_queue()
         self.download_obj.download()
         while self.download_obj.is_active():
+            try:
+                progress: network_handler.DownloadProgress = progress_queue.get(timeout=0.05)
+            except queue.Empty:
+                wx.Yield()
+                continue
 
-            percentage: int = round(self.download_obj.get_percent())
+            # Only the latest event matters if the UI fell behind
+            while not progress_queue.empty():
+                progress = progress_queue.get_nowait()
+
+            percentage: int = round(progress.percent)
             if percentage == 0:
                 percentage = 1
 
             if percentage == -1:
-                amount_str = f"{utilities.human_fmt(self.download_obj.downloaded_file_size)} downloaded ({utilities.human_fmt(self.download_obj.get_speed())}/s)"
+                amount_str = f"{utilities.human_fmt(progress.downloaded)} downloaded ({utilities.human_fmt(progress.rate)}/s)"
                 progress_bar.Pulse()
             else:
-                amount_str = f"{utilities.seconds_to_readable_time(self.download_obj.get_time_remaining())}left - {utilities.human_fmt(self.download_obj.downloaded_file_size)} of {utilities.human_fmt(self.download_obj.total_file_size)} ({utilities.human_fmt(self.download_obj.get_speed())}/s)"
+                amount_str = f"{utilities.seconds_to_readable_time(progress.eta)}left - {utilities.human_fmt(progress.downloaded)} of {utilities.human_fmt(progress.total)} ({utilities.human_fmt(progress.rate)}/s)"
                 progress_bar.SetValue(int(percentage))
 
             label_amount.SetLabel(amount_str)
@@ -290,7 +290,15 @@ class macOSInstallerDownloadFrame(wx.Frame):
 
             self.frame_modal.Close()
 
-            download_obj = network_handler.DownloadObject(list(installers.values())[selected_item]['Link'], self.constants.payload_path / "InstallAssistant.pkg")
+            # Verify the installer against its chunklist while downloading, avoiding a second pass over the file
+            chunk_obj = None
+            chunklist_stream = network_handler.NetworkUtilities().get(list(installers.values())[selected_item]['integrity']).content
+            if chunklist_stream:
+                chunk_obj = integrity_verification.ChunklistVerification(self.constants.payload_path / Path("InstallAssistant.pkg"), chunklist_stream)
+                if not chunk_obj.chunks:
+                    chunk_obj = None
+
+            download_obj = network_handler.DownloadObject(list(installers.values())[selected_item]['Link'], self.constants.payload_path / "InstallAssistant.pkg", connections=network_handler.SEGMENTED_DOWNLOAD_CONNECTIONS, chunklist_verifier=chunk_obj, cache=network_handler.DOWNLOAD_CACHE)
 
             gui_download.DownloadFrame(
                 self,
@@ -305,12 +313,14 @@ class macOSInstallerDownloadFrame(wx.Frame):
                 self.on_return_to_main_menu()
                 return
 
-            self._validate_installer(list(installers.values())[selected_item]['integrity'])
+            self._validate_installer(list(installers.values())[selected_item]['integrity'], chunk_obj, download_obj)
 
 
-    def _validate_installer(self, chunklist_link: str) -> None:
+    def _validate_installer(self, chunklist_link: str, chunk_obj: integrity_verification.ChunklistVerification = None, download_obj: network_handler.DownloadObject = None) -> None:
         """
         Validate macOS installer
+        Skips validation if the installer was already verified while downloading
+        On failure, attempts to repair corrupted chunks before asking the user to redownload
         """
         self.SetSize((300, 200))
         for child in self.GetChildren():
@@ -334,11 +344,15 @@ class macOSInstallerDownloadFrame(wx.Frame):
         self.SetSize((-1, progress_bar.GetPosition()[1] + progress_bar.GetSize()[1] + 40))
         self.Show()
 
-        chunklist_stream = network_handler.NetworkUtilities().get(chunklist_link).content
+        chunklist_stream = None
+        if chunk_obj and chunk_obj.status == integrity_verification.ChunklistStatus.SUCCESS:
+            logging.info("macOS installer already verified during download, skipping validation")
+        else:
+            chunklist_stream = network_handler.NetworkUtilities().get(chunklist_link).content
         if chunklist_stream:
             logging.info("Validating macOS installer")
             utilities.disable_sleep_while_running()
-            chunk_obj = integrity_verification.ChunklistVerification(self.constants.payload_path / Path("InstallAssistant.pkg"), chunklist_stream)
+            chunk_obj = integrity_verification.ChunklistVerification(self.constants.payload_path / Path("InstallAssistant.pkg"), chunklist_stream, threads=integrity_verification.VALIDATION_THREADS)
             if chunk_obj.chunks:
                 progress_bar.SetValue(chunk_obj.current_chunk)
                 progress_bar.SetRange(chunk_obj.total_chunks)
@@ -352,6 +366,21 @@ class macOSInstallerDownloadFrame(wx.Frame):
                     chunk_label.Centre(wx.HORIZONTAL)
                     wx.App.Get().Yield()
 
+                if chunk_obj.status == integrity_verification.ChunklistStatus.FAILURE and download_obj:
+                    logging.info(f"Chunklist validation failed on chunk {chunk_obj.current_chunk}, attempting repair")
+                    download_obj.remove_from_cache()
+                    title_label.SetLabel("Repairing macOS Installer")
+                    title_label.Centre(wx.HORIZONTAL)
+                    chunk_label.SetLabel("Redownloading corrupted chunks…")
+                    chunk_label.Centre(wx.HORIZONTAL)
+
+                    thread = threading.Thread(target=download_obj.repair, args=(chunk_obj,))
+                    thread.start()
+
+                    while thread.is_alive():
+                        progress_bar.SetValue(chunk_obj.current_chunk)
+                        wx.App.Get().Yield()
+
                 if chunk_obj.status == integrity_verification.ChunklistStatus.FAILURE:
                     logging.error(f"Chunklist validation failed: Hash mismatch on {chunk_obj.current_chunk}")
                     wx.MessageBox(f"Chunklist validation failed: Hash mismatch on {chunk_obj.current_chunk}\n\nThis generally happens when downloading on unstable connections such as WiFi or cellular.\n\nPlease try redownloading again on a stable connection (ie. Ethernet)", "Corrupted Installer!", wx.OK | wx.ICON_ERROR)
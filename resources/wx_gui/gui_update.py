@@ -75,7 +75,7 @@ class UpdateFrame(wx.Frame):
         download_obj = None
         def _fetch_update() -> None:
             nonlocal download_obj
-            download_obj = network_handler.DownloadObject(url, self.constants.payload_path / "OpenCore-Legacy-Patcher.app.zip")
+            download_obj = network_handler.DownloadObject(url, self.constants.payload_path / "OpenCore-Legacy-Patcher.app.zip", cache=network_handler.DOWNLOAD_CACHE)
 
         thread = threading.Thread(target=_fetch_update)
         thread.start()
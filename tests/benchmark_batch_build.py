@@ -0,0 +1,87 @@
+# Benchmark of building every supported model one after another, against BatchBuildOpenCore
+#
+# Usage:
+#   python3 -m tests.benchmark_batch_build [workers] [directory]
+#
+# Requires a complete payloads folder (ie. after running Build-App.command once)
+# Serial builds run in-process as a '--build --model' run would, one model at a time
+
+import os
+import sys
+import copy
+import time
+import logging
+import tempfile
+
+from pathlib import Path
+
+from data import model_array
+from resources import constants, defaults, device_probe, utilities
+from resources.build import build, batch
+from tests.test_batch_build import missing_payloads
+
+
+def build_serial(global_constants: constants.Constants, output_path: Path) -> tuple:
+    """
+    Build every supported model in turn, each with fresh Constants
+
+    Returns:
+        tuple: Seconds taken and models that failed to build
+    """
+
+    failed = []
+
+    start_time = time.perf_counter()
+    for index, model in enumerate(model_array.SupportedSMBIOS):
+        model_constants = copy.deepcopy(global_constants)
+        model_constants.current_path = output_path / f"{index:03d}-{model}"
+        model_constants.current_path.mkdir(parents=True)
+        model_constants.custom_model = model
+
+        try:
+            defaults.GenerateDefaults(model, False, model_constants)
+            build.BuildOpenCore(model, model_constants)
+        except Exception:
+            failed.append(model)
+    duration = time.perf_counter() - start_time
+
+    return duration, failed
+
+
+def main() -> None:
+    workers   = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    directory = sys.argv[2] if len(sys.argv) > 2 else None
+
+    missing = missing_payloads()
+    if missing:
+        print(f"Payloads missing: {', '.join(missing)}")
+        sys.exit(1)
+
+    utilities.disable_cls()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # Builds for other models still consult the host, use an empty one for repeatable timings
+    global_constants = constants.Constants()
+    global_constants.computer = device_probe.Computer(real_model="MacBookPro11,1")
+
+    # Builds print their progress, results are reported once both have finished
+    with tempfile.TemporaryDirectory(dir=directory) as temp_dir:
+        serial_duration, serial_failed = build_serial(global_constants, Path(temp_dir) / "Serial")
+
+        batch_obj = batch.BatchBuildOpenCore(global_constants, output_path=Path(temp_dir) / "Batch", max_workers=workers)
+        results = batch_obj.build_all_models()
+        batch_failed = [result.model for result in results if result.error]
+
+    print(f"\nModels: {len(model_array.SupportedSMBIOS)}, {os.cpu_count()} CPUs")
+    for name, duration, failed in [
+        ("Serial", serial_duration, serial_failed),
+        (f"Batch ({min(batch_obj.max_workers, len(results), os.cpu_count() or 1)} workers)", batch_obj.duration, batch_failed),
+    ]:
+        print(f"- {name:<20} {duration:7.2f}s  {duration / len(model_array.SupportedSMBIOS):6.3f}s per model  {len(failed)} failed")
+    print(f"Speedup: {serial_duration / batch_obj.duration:.2f}x")
+
+    assert serial_failed == batch_failed, f"Serial and batch builds disagree: {serial_failed} vs {batch_failed}"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# Benchmark of sequential and parallel chunklist validation
+#
+# Usage:
+#   python3 -m tests.benchmark_integrity_verification [size in GB] [directory]
+#
+# The file is written to the provided directory (default: system temporary directory)
+# Recently written data is likely still in the page cache, so results mostly reflect
+# hashing throughput rather than disk throughput
+
+import os
+import sys
+import time
+import hashlib
+import tempfile
+
+from pathlib import Path
+
+from resources import integrity_verification
+from resources.integrity_verification import ChunklistStatus, ChunklistVerification
+from tests.chunklist import build_chunklist_from_digests
+
+
+CHUNK_SIZE: int = 1024 * 1024 * 10  # Matches chunks used by Apple for InstallAssistant.pkg
+
+
+def main() -> None:
+    size      = int(float(sys.argv[1]) * 1024 * 1024 * 1024) if len(sys.argv) > 1 else 1024 * 1024 * 1024 * 2
+    directory = sys.argv[2] if len(sys.argv) > 2 else None
+
+    with tempfile.TemporaryDirectory(dir=directory) as temp_dir:
+        file_path = Path(temp_dir) / "InstallAssistant.pkg"
+
+        entries = []
+        with file_path.open("wb") as file:
+            while file.tell() < size:
+                chunk = os.urandom(min(CHUNK_SIZE, size - file.tell()))
+                file.write(chunk)
+                entries.append((len(chunk), hashlib.sha256(chunk).digest()))
+        chunklist = build_chunklist_from_digests(entries)
+
+        print(f"File: {size / 1024 / 1024 / 1024:.2f} GB, {CHUNK_SIZE // 1024 // 1024} MB chunks, {os.cpu_count()} CPUs")
+
+        for threads in sorted({1, 2, 4, integrity_verification.VALIDATION_THREADS}):
+            chunk_obj = ChunklistVerification(file_path, chunklist, threads=threads)
+
+            start_time = time.perf_counter()
+            chunk_obj._validate()
+            duration = time.perf_counter() - start_time
+
+            assert chunk_obj.status == ChunklistStatus.SUCCESS, chunk_obj.error_msg
+            print(f"- {'Sequential' if threads == 1 else f'{threads} threads':<12} {duration:6.2f}s  {size / duration / 1024 / 1024:8.1f} MB/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# Benchmark of streaming catalog parsing against loading the whole catalog with plistlib
+#
+# Usage:
+#   python3 -m tests.benchmark_macos_installer_handler [product count]
+
+import sys
+import time
+import plistlib
+import tracemalloc
+
+from resources import macos_installer_handler
+from tests.test_macos_installer_handler import build_catalog, parse_catalog_products_reference
+
+
+def measure(function, content: bytes) -> tuple:
+    """
+    Time a parser, then measure its peak memory in a second run
+
+    Parameters:
+        function:        Parser to measure
+        content (bytes): Catalog
+
+    Returns:
+        tuple: Result, seconds taken and peak bytes allocated
+    """
+
+    start_time = time.perf_counter()
+    result = function(content)
+    duration = time.perf_counter() - start_time
+
+    tracemalloc.start()
+    function(content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return result, duration, peak
+
+
+def main() -> None:
+    product_count = int(sys.argv[1]) if len(sys.argv) > 1 else 6000
+
+    content = plistlib.dumps(build_catalog(product_count=product_count, install_assistant_interval=150))
+    catalog = macos_installer_handler.RemoteInstallerCatalog.__new__(macos_installer_handler.RemoteInstallerCatalog)
+
+    print(f"Catalog: {len(content) / 1024 / 1024:.1f} MB, {product_count} products")
+
+    results = []
+    for name, function in [("plistlib", parse_catalog_products_reference), ("iterparse", catalog._parse_catalog_products)]:
+        result, duration, peak = measure(function, content)
+        results.append(result)
+        print(f"- {name:<10} {duration:6.2f}s  peak {peak / 1024 / 1024:6.1f} MB  {len(result)} InstallAssistant products")
+
+    assert results[0] == results[1], "Parsers disagree"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# Benchmark of write-behind and preallocation against writing on the network thread
+#
+# Usage:
+#   python3 -m tests.benchmark_network_handler [size in MB] [disk MB/s] [network MB/s] [directory]
+#
+# Files are served by the local HTTP server, throttled per connection, and written through a
+# fake disk limited to the provided speed. Write-behind should approach the slower of the two,
+# rather than their combined time
+
+import os
+import sys
+import time
+import socket
+import hashlib
+import tempfile
+import threading
+
+import urllib3
+
+from pathlib import Path
+from unittest import mock
+
+from resources import network_handler
+from tests.http_server import LocalFileHandler, LocalHTTPServer
+
+
+SOCKET_BUFFER_SIZE: int = 1024 * 256  # Loopback buffers are otherwise large enough to hide disk stalls from the server
+
+
+class SmallBufferHandler(LocalFileHandler):
+    """
+    Serves with a small send buffer, so the server stalls once the client stops reading
+    """
+
+    def setup(self) -> None:
+        self.request.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, SOCKET_BUFFER_SIZE)
+        super().setup()
+
+
+class InlineWriter(network_handler.WriteBehindWriter):
+    """
+    Writes on the calling thread, as downloads did before write-behind
+    """
+
+    def __init__(self, file_descriptor: int, max_pending: int = 0) -> None:
+        self.file_descriptor: int = file_descriptor
+        self.error: Exception = None
+
+
+    def write(self, data: bytes, offset: int, verify = None, callback = None) -> None:
+        if verify:
+            verify(offset, data)
+        self._write_all(data, offset)
+        if callback:
+            callback(offset, data)
+
+
+    def close(self) -> None:
+        pass
+
+
+def throttled_write_all(disk_rate: float):
+    """
+    Fake disk, each write takes as long as it would at disk_rate bytes per second
+    Writes are serviced one at a time, regardless of how many threads issue them
+    """
+
+    write_all = network_handler.WriteBehindWriter._write_all
+    disk_lock = threading.Lock()
+
+    def _write_all(writer: network_handler.WriteBehindWriter, data: bytes, offset: int) -> None:
+        with disk_lock:
+            time.sleep(len(data) / disk_rate)
+            write_all(writer, data, offset)
+
+    return _write_all
+
+
+def measure(server: LocalHTTPServer, temp_path: Path, connections: int, write_behind: bool, preallocate: bool) -> tuple:
+    """
+    Download the served file once
+
+    Returns:
+        tuple: Seconds taken and SHA-256 of the downloaded file
+    """
+
+    destination = temp_path / f"InstallAssistant-{connections}-{write_behind}-{preallocate}.pkg"
+
+    patches = []
+    if not write_behind:
+        patches.append(mock.patch.object(network_handler, "WriteBehindWriter", InlineWriter))
+    if not preallocate:
+        patches.append(mock.patch.object(network_handler.DownloadObject, "_preallocate", lambda download_obj, file_descriptor: None))
+
+    for patcher in patches:
+        patcher.start()
+    try:
+        start_time = time.perf_counter()
+        download_obj = network_handler.DownloadObject(server.url("/InstallAssistant.pkg"), destination, connections=connections, scheduler=network_handler.DownloadScheduler(), partial_path=temp_path / "Partial")
+        download_obj.download(spawn_thread=False)
+        duration = time.perf_counter() - start_time
+    finally:
+        for patcher in patches:
+            patcher.stop()
+
+    assert download_obj.download_complete, download_obj.error_msg
+    with destination.open("rb") as file:
+        checksum = hashlib.file_digest(file, "sha256").hexdigest()
+    destination.unlink()
+
+    return duration, checksum
+
+
+def main() -> None:
+    size         = int(float(sys.argv[1]) * 1024 * 1024) if len(sys.argv) > 1 else 1024 * 1024 * 256
+    disk_rate    = float(sys.argv[2]) * 1024 * 1024 if len(sys.argv) > 2 else 1024 * 1024 * 100
+    network_rate = float(sys.argv[3]) * 1024 * 1024 if len(sys.argv) > 3 else 1024 * 1024 * 50
+    directory    = sys.argv[4] if len(sys.argv) > 4 else None
+
+    data = os.urandom(size)
+    expected = hashlib.sha256(data).hexdigest()
+
+    urllib3.connection.HTTPConnection.default_socket_options = [
+        *urllib3.connection.HTTPConnection.default_socket_options,
+        (socket.SOL_SOCKET, socket.SO_RCVBUF, SOCKET_BUFFER_SIZE),
+    ]
+
+    server = LocalHTTPServer()
+    server.RequestHandlerClass = SmallBufferHandler
+    server.files["/InstallAssistant.pkg"] = data
+    server.delay = server.chunk_size / network_rate
+    server.start()
+
+    print(f"File: {size / 1024 / 1024:.0f} MB, disk {disk_rate / 1024 / 1024:.0f} MB/s, network {network_rate / 1024 / 1024:.0f} MB/s per connection")
+
+    try:
+        with tempfile.TemporaryDirectory(dir=directory) as temp_dir, \
+             mock.patch.object(network_handler.WriteBehindWriter, "_write_all", throttled_write_all(disk_rate)), \
+             mock.patch.object(network_handler, "SEGMENTED_DOWNLOAD_MINIMUM_SIZE", min(size, network_handler.SEGMENTED_DOWNLOAD_MINIMUM_SIZE)), \
+             mock.patch.object(network_handler, "SEGMENTED_DOWNLOAD_PIECE_SIZE", max(size // 16, 1024 * 1024)):
+            for connections in [1, network_handler.SEGMENTED_DOWNLOAD_CONNECTIONS]:
+                for write_behind, preallocate in [(False, False), (True, False), (True, True)]:
+                    duration, checksum = measure(server, Path(temp_dir), connections, write_behind, preallocate)
+                    assert checksum == expected, "Downloaded file doesn't match"
+
+                    name = f"{connections} conn, {'write-behind' if write_behind else 'inline'}{', preallocated' if preallocate else ''}"
+                    print(f"- {name:<40} {duration:6.2f}s  {size / duration / 1024 / 1024:8.1f} MB/s")
+    finally:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
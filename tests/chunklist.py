@@ -0,0 +1,40 @@
+# Builds chunklists for synthetic files, matching the format of Apple's .chunklist/.integrityDataV1
+
+import hashlib
+
+from resources import integrity_verification
+
+
+def build_chunklist(data: bytes, chunk_size: int = 1024 * 1024 * 10) -> bytes:
+    """
+    Generate a chunklist covering data
+
+    Parameters:
+        data (bytes):     File contents
+        chunk_size (int): Length of each chunk, the last chunk may be shorter
+
+    Returns:
+        bytes: Chunklist file
+    """
+
+    return build_chunklist_from_digests([(len(chunk), hashlib.sha256(chunk).digest()) for chunk in (data[offset:offset + chunk_size] for offset in range(0, len(data), chunk_size))])
+
+
+def build_chunklist_from_digests(entries: list) -> bytes:
+    """
+    Generate a chunklist from pre-computed chunk digests, avoids holding large files in memory
+
+    Parameters:
+        entries (list): (length, SHA-256 digest) of each chunk, in order
+
+    Returns:
+        bytes: Chunklist file
+    """
+
+    header_length = integrity_verification.CHUNKLIST_HEADER.size
+    table_length  = len(entries) * integrity_verification.CHUNK_LENGTH
+
+    header = integrity_verification.CHUNKLIST_HEADER.pack(b"CNKL", header_length, 1, 1, 0, len(entries), header_length, header_length + table_length)
+    table  = b"".join(length.to_bytes(4, "little") + digest for length, digest in entries)
+
+    return header + table
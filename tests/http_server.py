@@ -0,0 +1,186 @@
+# Local HTTP server for exercising network_handler without reaching Apple's servers
+
+import re
+import time
+import threading
+import collections
+import http.server
+import socketserver
+
+
+class LocalFileHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Serves in-memory files, with optional byte range support, validators and throttling
+
+    Configured through the server it's attached to, see LocalHTTPServer
+    """
+
+    protocol_version = "HTTP/1.1"
+
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+    def do_HEAD(self) -> None:
+        self._respond(head=True)
+
+
+    def do_GET(self) -> None:
+        self._respond(head=False)
+
+
+    def _respond(self, head: bool) -> None:
+        server: LocalHTTPServer = self.server
+
+        with server.lock:
+            server.requests.append((self.command, self.path, dict(self.headers)))
+            server.request_counts[(self.command, self.path)] += 1
+
+        data = server.files.get(self.path)
+        if data is None:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        if server.etag and self.headers.get("If-None-Match") == server.etag:
+            self.send_response(304)
+            self.send_header("ETag", server.etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+
+        start  = 0
+        end    = len(data) - 1
+        status = 200
+
+        range_header = self.headers.get("Range")
+        if_range     = self.headers.get("If-Range")
+        if range_header and server.supports_ranges and (if_range is None or if_range == server.etag):
+            match = re.match(r"bytes=(\d+)-(\d*)", range_header)
+            start = int(match.group(1))
+            end   = min(int(match.group(2)), len(data) - 1) if match.group(2) else len(data) - 1
+            status = 206
+
+        self.send_response(status)
+        if server.supports_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        if server.etag:
+            self.send_header("ETag", server.etag)
+        self.send_header("Last-Modified", "Mon, 01 Jan 2024 00:00:00 GMT")
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+
+        if head:
+            return
+
+        offset = start
+        while offset <= end:
+            if server.abort_after is not None and offset - start >= server.abort_after:
+                # Simulate a dropped connection
+                self.close_connection = True
+                return
+            length = min(server.chunk_size, end + 1 - offset)
+            try:
+                self.wfile.write(data[offset:offset + length])
+            except (BrokenPipeError, ConnectionResetError):
+                return
+            offset += length
+            if server.delay:
+                time.sleep(server.delay)
+
+
+class LocalHTTPServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """
+    Threaded HTTP server bound to a random port on localhost
+
+    Usage:
+        >>> server = LocalHTTPServer()
+        >>> server.files["/InstallAssistant.pkg"] = data
+        >>> server.start()
+        >>> url = server.url("/InstallAssistant.pkg")
+        >>> server.stop()
+    """
+
+    daemon_threads = True
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), LocalFileHandler)
+
+        self.files:           dict  = {}      # Path -> content
+        self.supports_ranges: bool  = True    # Honour Range requests, otherwise always reply with the full file
+        self.etag:            str   = '"v1"'  # Validator sent with every response, None to omit
+        self.delay:           float = 0.0     # Seconds to sleep after each chunk sent, simulates a slow link
+        self.chunk_size:      int   = 1024 * 256
+        self.abort_after:     int   = None    # Bytes after which each response is cut short
+
+        self.requests:       list                = []  # (method, path, headers) of every request received
+        self.request_counts: collections.Counter = collections.Counter()  # (method, path) -> requests received
+        self.lock = threading.Lock()
+
+        self._thread: threading.Thread = None
+
+
+    def handle_error(self, request, client_address) -> None:
+        pass
+
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+    def requests_for(self, method: str, path: str) -> list:
+        """
+        Headers of every request received for a path
+
+        Parameters:
+            method (str): HTTP method, ie. "GET"
+            path (str):   Path requested
+
+        Returns:
+            list: Request headers, in the order received
+        """
+
+        with self.lock:
+            return [headers for request_method, request_path, headers in self.requests if request_method == method and request_path == path]
+
+
+    def request_count(self, method: str, path: str = None) -> int:
+        """
+        Number of requests received with a method
+
+        Parameters:
+            method (str): HTTP method, ie. "HEAD"
+            path (str):   Path requested, None for any path
+
+        Returns:
+            int: Requests received
+        """
+
+        with self.lock:
+            if path is not None:
+                return self.request_counts[(method, path)]
+            return sum(count for (request_method, _), count in self.request_counts.items() if request_method == method)
+
+
+    def reset_requests(self) -> None:
+        """
+        Forget every request received so far
+        """
+
+        with self.lock:
+            self.requests.clear()
+            self.request_counts.clear()
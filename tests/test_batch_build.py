@@ -0,0 +1,117 @@
+# Tests for build/batch.py, comparing batch builds against serial BuildOpenCore runs
+# Requires a complete payloads folder (ie. after running Build-App.command once)
+
+import copy
+import hashlib
+import tempfile
+import unittest
+import concurrent.futures
+
+from pathlib import Path
+from unittest import mock
+
+from resources import constants, defaults, device_probe, utilities
+from resources.build import build, batch
+
+
+MODELS: list = [  # One or two of each family, covering legacy and Metal GPUs
+    "MacBook5,1",
+    "MacBookAir6,2",
+    "MacBookPro8,1",
+    "MacBookPro11,1",
+    "Macmini7,1",
+    "iMac11,3",
+    "iMac18,1",
+    "MacPro3,1",
+    "Xserve3,1",
+]
+
+SETTINGS: list = [
+    {},
+    {"verbose_debug": True, "opencore_debug": True, "serial_settings": "Moderate"},
+]
+
+
+def missing_payloads() -> list:
+    """
+    Build payloads referenced by Constants that aren't present
+    Archives at the top of payloads are only used for root patching and installers
+    """
+
+    global_constants = constants.Constants()
+    missing = []
+    for name, value in vars(constants.Constants).items():
+        if not isinstance(value, property):
+            continue
+        try:
+            path = getattr(global_constants, name)
+        except Exception:
+            continue
+        if not isinstance(path, Path) or path.suffix != ".zip" or not path.is_relative_to(global_constants.payload_path):
+            continue
+        if len(path.relative_to(global_constants.payload_path).parts) > 1 and not path.exists():
+            missing.append(str(path.relative_to(global_constants.payload_path)))
+    return missing
+
+
+def tree_digests(path: Path) -> dict:
+    return {str(file.relative_to(path)): hashlib.sha256(file.read_bytes()).hexdigest() for file in sorted(path.rglob("*")) if file.is_file()}
+
+
+@unittest.skipIf(missing_payloads(), f"Payloads missing: {', '.join(missing_payloads())}")
+class BatchBuildTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        utilities.disable_cls()
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.temp_path = Path(self.temp_dir.name)
+
+        # Builds for other models still consult the host, use an empty one for repeatable output
+        self.constants = constants.Constants()
+        self.constants.computer = device_probe.Computer(real_model="MacBookPro11,1")
+        self.jobs = [batch.BatchBuildJob(model, settings) for settings in SETTINGS for model in MODELS]
+
+
+    def _build_serial(self, job: batch.BatchBuildJob, index: int) -> Path:
+        """
+        Build a job the way a single --build --model run would
+        """
+
+        global_constants = copy.deepcopy(self.constants)
+        global_constants.current_path = self.temp_path / "Serial" / f"{index:03d}-{job.model}"
+        global_constants.current_path.mkdir(parents=True)
+        global_constants.custom_model = job.model
+
+        defaults.GenerateDefaults(job.model, False, global_constants)
+        for key, value in job.settings.items():
+            setattr(global_constants, key, value)
+        build.BuildOpenCore(job.model, global_constants)
+
+        return global_constants.build_path
+
+
+    def _assert_identical(self, results: list) -> None:
+        self.assertEqual([result.model for result in results], [job.model for job in self.jobs])
+
+        for index, (job, result) in enumerate(zip(self.jobs, results)):
+            with self.subTest(model=job.model, settings=job.settings):
+                self.assertIsNone(result.error)
+                self.assertTrue(result.config.exists())
+
+                serial_digests = tree_digests(self._build_serial(job, index))
+                self.assertTrue(serial_digests)
+                self.assertEqual(tree_digests(result.build_path), serial_digests)
+
+
+    def test_process_pool_is_identical_to_serial(self) -> None:
+        with mock.patch.object(batch.os, "cpu_count", return_value=4):
+            batch_obj = batch.BatchBuildOpenCore(self.constants, output_path=self.temp_path / "Batch", max_workers=4)
+            self._assert_identical(batch_obj.build(self.jobs))
+
+
+    def test_single_cpu_builds_in_process(self) -> None:
+        with mock.patch.object(batch.os, "cpu_count", return_value=1), mock.patch.object(concurrent.futures, "ProcessPoolExecutor", side_effect=AssertionError("Process pool used")):
+            batch_obj = batch.BatchBuildOpenCore(self.constants, output_path=self.temp_path / "Batch")
+            self._assert_identical(batch_obj.build(self.jobs))
@@ -0,0 +1,165 @@
+# Tests for disk_handler.py, replaying diskutil plist output for a Mac Pro with several drives attached:
+# - disk0: Internal PCIe SSD (APFS)
+# - disk1: Internal SATA HDD (HFS+)
+# - disk2: Internal SATA SSD (NTFS)
+# - disk4: USB drive holding a macOS installer
+# - disk5: Small FAT32 USB stick (MBR)
+# - disk6: CD, reports no MediaName
+# - disk7: Blank USB drive, no partition map
+
+import plistlib
+import threading
+import unittest
+
+from pathlib import Path
+from unittest import mock
+
+from resources import disk_handler, install, macos_installer_handler
+
+
+FIXTURES_PATH: Path = Path(__file__).parent / Path("fixtures/diskutil")
+
+
+class RecordedDiskutil:
+    """
+    Replays diskutil output from the fixtures, counting each invocation
+    """
+
+    def __init__(self, sierra: bool = False) -> None:
+        self.sierra: bool = sierra  # 'diskutil list -plist physical' unsupported
+        self.calls:  list = []
+        self._lock = threading.Lock()
+
+
+    def __call__(self, arguments: list) -> bytes:
+        with self._lock:
+            self.calls.append(list(arguments))
+
+        if arguments[0] == "list":
+            if arguments[-1] == "physical" and self.sierra:
+                return b"Usage:  diskutil list [-plist] [Filter] [MountPoint|DiskIdentifier|DeviceNode]\n"
+            return (FIXTURES_PATH / "list-physical.plist").read_bytes() + b"\n"
+
+        file = FIXTURES_PATH / f"info-{arguments[-1]}.plist"
+        if not file.exists():
+            return b"Could not find disk: " + arguments[-1].encode() + b"\n"
+        return file.read_bytes() + b"\n"
+
+
+def load_fixture(name: str) -> dict:
+    return plistlib.loads((FIXTURES_PATH / name).read_bytes())
+
+
+class ParseTests(unittest.TestCase):
+
+    def test_parse_whole_disks(self) -> None:
+        disks = disk_handler.parse_whole_disks(load_fixture("list-physical.plist"))
+
+        self.assertEqual([disk["identifier"] for disk in disks], ["disk0", "disk1", "disk2", "disk4", "disk5", "disk6", "disk7"])
+        self.assertEqual(disks[0]["size"], 1000555581440)
+        self.assertEqual(disks[0]["partitions"], [
+            {"identifier": "disk0s1", "content": "EFI",        "name": "EFI", "size": 314572800},
+            {"identifier": "disk0s2", "content": "Apple_APFS", "name": "",    "size": 1000240963584},
+        ])
+        self.assertEqual(disks[5]["partitions"], [])
+        self.assertIsNone(disks[6]["partitions"])
+
+
+    def test_parse_whole_disks_empty(self) -> None:
+        self.assertEqual(disk_handler.parse_whole_disks({}), [])
+
+
+    def test_partition_needs_info(self) -> None:
+        partitions = {partition["identifier"]: partition for disk in disk_handler.parse_whole_disks(load_fixture("list-physical.plist")) for partition in disk["partitions"] or []}
+
+        self.assertEqual(
+            sorted(identifier for identifier, partition in partitions.items() if disk_handler.partition_needs_info(partition)),
+            ["disk0s1", "disk1s1", "disk2s2", "disk4s1", "disk5s1"],
+        )
+
+
+    def test_parse_disk_info(self) -> None:
+        self.assertEqual(disk_handler.parse_disk_info(load_fixture("info-disk4.plist")), {
+            "identifier": "/dev/disk4",
+            "name":       "SanDisk Ultra USB 3.0",
+            "size":       32015679488,
+            "internal":   False,
+        })
+        self.assertTrue(disk_handler.parse_disk_info(load_fixture("info-disk0.plist"))["internal"])
+
+
+    def test_parse_disk_info_cd(self) -> None:
+        self.assertIsNone(disk_handler.parse_disk_info(load_fixture("info-disk6.plist")))
+
+
+    def test_parse_partition_info(self) -> None:
+        disks = disk_handler.parse_whole_disks(load_fixture("list-physical.plist"))
+        efi, apfs = disks[0]["partitions"]
+
+        self.assertEqual(disk_handler.parse_partition_info(efi, load_fixture("info-disk0s1.plist")), {"fs": "msdos", "type": "EFI", "name": "EFI", "size": 314572800})
+        self.assertEqual(disk_handler.parse_partition_info(apfs), {"fs": "Apple_APFS", "type": "Apple_APFS", "name": "", "size": 1000240963584})
+        self.assertEqual(disk_handler.parse_partition_info(disks[2]["partitions"][1], load_fixture("info-disk2s2.plist"))["fs"], "ntfs")
+        self.assertIsNone(disk_handler.parse_partition_info(efi, {}))
+
+
+class DiskutilQueryTests(unittest.TestCase):
+
+    def test_counts_subprocesses(self) -> None:
+        runner = RecordedDiskutil()
+        query  = disk_handler.DiskutilQuery(runner=runner)
+
+        disks = disk_handler.parse_whole_disks(query.list_physical())
+        info  = query.info([disk["identifier"] for disk in disks])
+
+        self.assertEqual(set(info), {"disk0", "disk1", "disk2", "disk4", "disk5", "disk6", "disk7"})
+        self.assertEqual(query.subprocess_count, 8)
+        self.assertEqual(len(runner.calls), 8)
+
+
+    def test_sierra_fallback(self) -> None:
+        runner = RecordedDiskutil(sierra=True)
+        query  = disk_handler.DiskutilQuery(runner=runner)
+
+        self.assertEqual(len(disk_handler.parse_whole_disks(query.list_physical())), 7)
+        self.assertEqual(runner.calls, [["list", "-plist", "physical"], ["list", "-plist"]])
+        self.assertEqual(query.subprocess_count, 2)
+
+
+    def test_unknown_disk(self) -> None:
+        query = disk_handler.DiskutilQuery(runner=RecordedDiskutil())
+
+        self.assertEqual(query.info(["disk9"]), {"disk9": {}})
+        self.assertEqual(query.info([]), {})
+
+
+class DiskEnumerationTests(unittest.TestCase):
+    """
+    Disk pickers, with diskutil replaced by the fixtures
+    """
+
+    def setUp(self) -> None:
+        self.runner = RecordedDiskutil()
+        patcher = mock.patch.object(disk_handler.DiskutilQuery, "_run_diskutil", lambda query, arguments: self.runner(arguments))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+    def test_list_disks(self) -> None:
+        disks = install.tui_disk_installation(None).list_disks()
+
+        self.assertEqual(list(disks), ["disk0", "disk1", "disk4", "disk5"])
+        self.assertEqual(disks["disk5"]["partitions"], {"disk5s1": {"fs": "msdos", "type": "DOS_FAT_32", "name": "STICK", "size": 8003256320}})
+        self.assertEqual(disks["disk0"]["partitions"]["disk0s2"]["fs"], "Apple_APFS")
+
+        # 1 list, 7 whole disks and only the 5 partitions that could be FAT formatted
+        self.assertEqual(len(self.runner.calls), 13)
+
+
+    def test_list_disk_to_format(self) -> None:
+        disks = macos_installer_handler.InstallerCreation().list_disk_to_format()
+
+        self.assertEqual(list(disks), ["disk4", "disk7"])
+        self.assertEqual(disks["disk4"], {"identifier": "/dev/disk4", "name": "SanDisk Ultra USB 3.0", "size": 32015679488})
+
+        # 1 list and only the 5 disks of 14GB or larger
+        self.assertEqual(len(self.runner.calls), 6)
@@ -0,0 +1,194 @@
+# Tests for integrity_verification.py
+
+import os
+import tempfile
+import unittest
+
+from pathlib import Path
+from unittest import mock
+
+from resources import integrity_verification
+from resources.integrity_verification import ChunklistStatus, ChunklistVerification
+from tests.chunklist import build_chunklist
+
+
+CHUNK_SIZE: int = 1024 * 64
+
+
+class ChunklistTestCase(unittest.TestCase):
+    """
+    Writes a synthetic file and its chunklist for each test
+    """
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+        self.data      = os.urandom(CHUNK_SIZE * 100 + 123)
+        self.chunklist = build_chunklist(self.data, CHUNK_SIZE)
+        self.file_path = Path(self.temp_dir.name) / "InstallAssistant.pkg"
+        self.file_path.write_bytes(self.data)
+
+
+    def _corrupt(self, *indices: int) -> None:
+        with self.file_path.open("r+b") as file:
+            for index in indices:
+                file.seek(index * CHUNK_SIZE + 7)
+                file.write(bytes([self.data[index * CHUNK_SIZE + 7] ^ 0xFF]))
+
+
+    def _validate(self, threads: int) -> ChunklistVerification:
+        chunk_obj = ChunklistVerification(self.file_path, self.chunklist, threads=threads)
+        chunk_obj._validate()
+        return chunk_obj
+
+
+class ChunklistValidationTests(ChunklistTestCase):
+
+    def test_parallel_matches_sequential(self) -> None:
+        for threads in [1, 2, integrity_verification.VALIDATION_THREADS, 16]:
+            with self.subTest(threads=threads):
+                chunk_obj = self._validate(threads)
+                self.assertEqual(chunk_obj.status, ChunklistStatus.SUCCESS)
+                self.assertEqual(chunk_obj.current_chunk, chunk_obj.total_chunks)
+                self.assertEqual(chunk_obj.total_chunks, 101)
+
+
+    def test_first_failure_is_reported(self) -> None:
+        self._corrupt(37, 80)
+
+        for threads in [1, 2, 4, 16]:
+            with self.subTest(threads=threads):
+                chunk_obj = self._validate(threads)
+                self.assertEqual(chunk_obj.status, ChunklistStatus.FAILURE)
+                self.assertEqual(chunk_obj.current_chunk, 38)
+                self.assertTrue(chunk_obj.error_msg.startswith("Chunk 38 checksum status FAIL"))
+
+
+    def test_truncated_file_fails(self) -> None:
+        self.file_path.write_bytes(self.data[:-1])
+
+        for threads in [1, 4]:
+            with self.subTest(threads=threads):
+                chunk_obj = self._validate(threads)
+                self.assertEqual(chunk_obj.status, ChunklistStatus.FAILURE)
+                self.assertEqual(chunk_obj.current_chunk, 101)
+
+
+    def test_missing_file_fails(self) -> None:
+        self.file_path.unlink()
+
+        chunk_obj = self._validate(4)
+        self.assertEqual(chunk_obj.status, ChunklistStatus.FAILURE)
+
+
+    def test_hash_chunks_keeps_order(self) -> None:
+        indices = [90, 3, 57, 3, 0, 100]
+
+        chunk_obj = ChunklistVerification(self.file_path, self.chunklist, threads=4)
+        results = list(chunk_obj._hash_chunks(indices))
+
+        self.assertEqual([index for index, _ in results], indices)
+        self.assertTrue(all(digest == chunk_obj.chunks.checksum(index) for index, digest in results))
+
+
+class ChunklistParsingTests(ChunklistTestCase):
+
+    def test_header_is_parsed(self) -> None:
+        chunks = integrity_verification.Chunklist(self.chunklist)
+
+        self.assertEqual(chunks.header["magic"], b"CNKL")
+        self.assertEqual(chunks.header["chunkCount"], 101)
+        self.assertEqual(chunks.header["chunkOffset"], integrity_verification.CHUNKLIST_HEADER.size)
+        self.assertEqual(len(chunks), 101)
+        self.assertEqual(chunks.offset(101), len(self.data))
+        self.assertEqual(chunks.length(100), 123)
+
+
+    def test_invalid_magic_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            integrity_verification.Chunklist(b"XXXX" + self.chunklist[4:])
+
+
+    def test_truncated_header_raises(self) -> None:
+        with self.assertRaises(integrity_verification.struct.error):
+            integrity_verification.Chunklist(self.chunklist[:integrity_verification.CHUNKLIST_HEADER.size - 1])
+
+
+    def test_truncated_table_raises(self) -> None:
+        for length in [integrity_verification.CHUNKLIST_HEADER.size, len(self.chunklist) - integrity_verification.CHUNK_LENGTH, len(self.chunklist) - 1]:
+            with self.subTest(length=length):
+                with self.assertRaises(ValueError):
+                    integrity_verification.Chunklist(self.chunklist[:length])
+
+
+    def test_truncated_table_fails_validation(self) -> None:
+        chunk_obj = ChunklistVerification(self.file_path, self.chunklist[:-1])
+
+        self.assertIsNone(chunk_obj.chunks)
+        chunk_obj._validate()
+        self.assertEqual(chunk_obj.status, ChunklistStatus.FAILURE)
+
+
+class FindFailedChunksTests(ChunklistTestCase):
+
+    def _hashed_indices(self, chunk_obj: ChunklistVerification, indices: list = None) -> tuple:
+        hashed = []
+        hash_chunks = chunk_obj._hash_chunks
+
+        def _record(requested):
+            requested = list(requested)
+            hashed.extend(requested)
+            return hash_chunks(requested)
+
+        with mock.patch.object(chunk_obj, "_hash_chunks", _record):
+            failed = chunk_obj.find_failed_chunks(indices)
+
+        return failed, hashed
+
+
+    def test_scan_starts_at_first_failure(self) -> None:
+        self._corrupt(37, 80)
+
+        chunk_obj = self._validate(1)
+        failed, hashed = self._hashed_indices(chunk_obj)
+
+        self.assertEqual(failed, [37, 80])
+        self.assertEqual(hashed, list(range(37, 101)))
+        self.assertEqual(chunk_obj.current_chunk, chunk_obj.total_chunks)
+
+
+    def test_streamed_chunks_are_skipped(self) -> None:
+        self._corrupt(5)
+
+        chunk_obj = ChunklistVerification(self.file_path, self.chunklist)
+        for index in range(chunk_obj.total_chunks):
+            if index == 5:
+                continue
+            chunk_obj.stream_update(index * CHUNK_SIZE, self.data[index * CHUNK_SIZE:(index + 1) * CHUNK_SIZE])
+
+        failed, hashed = self._hashed_indices(chunk_obj)
+
+        self.assertEqual(failed, [5])
+        self.assertEqual(hashed, [5])
+
+
+    def test_unverified_file_is_fully_scanned(self) -> None:
+        self._corrupt(0, 100)
+
+        chunk_obj = ChunklistVerification(self.file_path, self.chunklist, threads=4)
+        failed, hashed = self._hashed_indices(chunk_obj)
+
+        self.assertEqual(failed, [0, 100])
+        self.assertEqual(hashed, list(range(101)))
+
+
+    def test_repaired_chunks_are_rechecked(self) -> None:
+        self._corrupt(37, 80)
+
+        chunk_obj = self._validate(4)
+        self.assertEqual(chunk_obj.find_failed_chunks(), [37, 80])
+
+        self.file_path.write_bytes(self.data)
+        self.assertEqual(chunk_obj.find_failed_chunks([37, 80]), [])
+        self.assertEqual(chunk_obj.find_failed_chunks(), [])
@@ -0,0 +1,666 @@
+# Tests for kdk_handler.py, using a recorded-style KdkSupportPkg manifest:
+# - macOS 13.0 through 15.3, newest first as listed by the API
+# - Betas sharing a version with the release (ie. 14.0)
+# - Missing minor and patch releases (ie. no 13.6.2, 14.8)
+# - A build listed twice, after Apple re-posted its KDK (22G91)
+
+import os
+import json
+import types
+import random
+import hashlib
+import shutil
+import plistlib
+import tempfile
+import functools
+import unittest
+
+from pathlib import Path
+from unittest import mock
+
+import packaging.version
+
+from resources import kdk_handler, network_handler
+from tests.http_server import LocalHTTPServer
+
+
+FIXTURES_PATH: Path = Path(__file__).parent / Path("fixtures/kdk")
+
+
+def load_manifest() -> list:
+    return json.loads((FIXTURES_PATH / "manifest.json").read_text())
+
+
+def exact_build_reference(kdk_list: list, build: str) -> dict:
+    """
+    Linear scan previously used by KernelDebugKitObject for exact matches
+    """
+
+    for kdk in kdk_list:
+        if kdk["build"] != build:
+            continue
+        return kdk
+    return None
+
+
+def closest_older_reference(kdk_list: list, parsed_version: packaging.version.Version) -> dict:
+    """
+    Linear scan previously used by KernelDebugKitObject for the closest match
+    """
+
+    for kdk in kdk_list:
+        kdk_version = packaging.version.parse(kdk["version"])
+        if kdk_version > parsed_version:
+            continue
+        if kdk_version.major != parsed_version.major:
+            continue
+        if kdk_version.minor not in range(parsed_version.minor - 1, parsed_version.minor + 1):
+            continue
+        return kdk
+    return None
+
+
+def latest_for_major_reference(kdk_list: list, major: int) -> dict:
+    for kdk in kdk_list:
+        if packaging.version.parse(kdk["version"]).major == major:
+            return kdk
+    return None
+
+
+class KernelDebugKitCatalogTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.kdk_list = load_manifest()
+        self.catalog  = kdk_handler.KernelDebugKitCatalog(self.kdk_list)
+
+        # Every listed version, plus unlisted patch, minor and major releases around them
+        versions = {kdk["version"] for kdk in self.kdk_list}
+        for version in list(versions):
+            parsed = packaging.version.parse(version)
+            versions.update({
+                f"{parsed.major}.{parsed.minor}.{parsed.micro + 1}",
+                f"{parsed.major}.{parsed.minor}.9",
+                f"{parsed.major}.{parsed.minor + 1}",
+                f"{parsed.major}.{parsed.minor + 2}",
+            })
+        versions.update({"12.7.6", "16.0", "13.0", "14.0.0"})
+
+        generator = random.Random(21)
+        versions.update(f"{generator.randint(12, 16)}.{generator.randint(0, 9)}.{generator.randint(0, 9)}" for _ in range(500))
+
+        self.versions = sorted(versions, key=packaging.version.parse)
+
+
+    def test_exact_build(self) -> None:
+        builds = [kdk["build"] for kdk in self.kdk_list] + ["22G5048d", "23A5257", "24E248", ""]
+
+        for build in builds:
+            with self.subTest(build=build):
+                self.assertIs(self.catalog.exact_build(build), exact_build_reference(self.kdk_list, build))
+
+        # Duplicated build resolves to the newest upload, listed first
+        self.assertEqual(self.catalog.exact_build("22G91")["date"], "2023-09-12T17:00:00")
+
+
+    def test_closest_older(self) -> None:
+        matched = 0
+        for version in self.versions:
+            parsed_version = packaging.version.parse(version)
+            with self.subTest(version=version):
+                expected = closest_older_reference(self.kdk_list, parsed_version)
+                self.assertIs(self.catalog.closest_older(parsed_version), expected)
+                matched += expected is not None
+
+        # Ensure both outcomes were exercised
+        self.assertGreater(matched, 0)
+        self.assertLess(matched, len(self.versions))
+
+
+    def test_closest_older_prefers_release(self) -> None:
+        # Betas share the release's version, the API lists the release first
+        self.assertEqual(self.catalog.closest_older(packaging.version.parse("14.0.1"))["build"], "23A344")
+        self.assertEqual(self.catalog.closest_older(packaging.version.parse("13.6.2"))["build"], "22G313")
+        self.assertIsNone(self.catalog.closest_older(packaging.version.parse("14.9")))
+
+
+    def test_latest_for_major(self) -> None:
+        for major in range(11, 17):
+            with self.subTest(major=major):
+                self.assertIs(self.catalog.latest_for_major(major), latest_for_major_reference(self.kdk_list, major))
+
+
+    def test_match_remote_kdk(self) -> None:
+        kdk_obj = kdk_handler.KernelDebugKitObject.__new__(kdk_handler.KernelDebugKitObject)
+
+        builds = {kdk["version"]: kdk["build"] for kdk in reversed(self.kdk_list)}
+        for version in self.versions:
+            host_build     = builds.get(version, "99Z999")
+            parsed_version = packaging.version.parse(version)
+            with self.subTest(version=version, build=host_build):
+                expected = exact_build_reference(self.kdk_list, host_build) or closest_older_reference(self.kdk_list, parsed_version)
+
+                matched = kdk_obj._match_remote_kdk(self.catalog, host_build, version, parsed_version)
+
+                self.assertEqual(matched, expected is not None)
+                if expected is None:
+                    continue
+                self.assertEqual(kdk_obj.kdk_url, expected["url"])
+                self.assertEqual(kdk_obj.kdk_url_build, expected["build"])
+                self.assertEqual(kdk_obj.kdk_url_expected_checksum, expected["sha256sum"])
+                self.assertEqual(kdk_obj.kdk_url_is_exactly_match, expected["build"] == host_build)
+
+
+class RemoteKernelDebugKitTests(unittest.TestCase):
+    """
+    KDK resolution against a local copy of the KdkSupportPkg API
+    """
+
+    def setUp(self) -> None:
+        self.kdk_list = load_manifest()
+
+        self.server = LocalHTTPServer()
+        self.server.files["/manifest.json"] = json.dumps(self.kdk_list).encode()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+        for target, name, value in [
+            (kdk_handler,     "KDK_API_LINK",            self.server.url("/manifest.json")),
+            (kdk_handler,     "KDK_ASSET_LIST",          None),
+            (kdk_handler,     "KDK_ASSET_LIST_SNAPSHOT", False),
+            (kdk_handler,     "KDK_ASSET_LIST_REFRESH",  None),
+            (kdk_handler,     "KDK_CATALOG",             None),
+            (network_handler, "MetadataCache",           functools.partial(network_handler.MetadataCache, cache_path=Path(self.temp_dir.name))),
+        ]:
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.installed_checks = []
+        def local_kdk_installed(kdk_obj, match: str = None, check_version: bool = False) -> None:
+            self.installed_checks.append(match)
+            return None
+
+        patcher = mock.patch.object(kdk_handler.KernelDebugKitObject, "_local_kdk_installed", local_kdk_installed)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+    def _resolve(self, host_build: str, host_version: str) -> kdk_handler.KernelDebugKitObject:
+        return kdk_handler.KernelDebugKitObject(None, host_build, host_version, validator=mock.Mock())
+
+
+    def test_outdated_list_is_revalidated(self) -> None:
+        # Saved list is within the cache's TTL, but predates 15.3.1
+        self.assertIsNotNone(network_handler.MetadataCache(kdk_handler.KDK_API_LINK).get())
+
+        new_kdk = dict(self.kdk_list[0], build="24D70", version="15.3.1", url="https://download.developer.apple.com/KDK_15.3.1_24D70.dmg")
+        self.server.files["/manifest.json"] = json.dumps([new_kdk] + self.kdk_list).encode()
+        self.server.etag = '"v2"'
+        self.server.requests.clear()
+
+        kdk_obj = self._resolve("24D70", "15.3.1")
+
+        self.assertTrue(kdk_obj.success)
+        self.assertTrue(kdk_obj.kdk_url_is_exactly_match)
+        self.assertEqual(kdk_obj.kdk_url, new_kdk["url"])
+
+        requests = self.server.requests_for("GET", "/manifest.json")
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(requests[0].get("If-None-Match"), '"v1"')
+
+        # Host build, closest match from the saved list, then the direct match, each checked once
+        self.assertEqual(self.installed_checks, [None, "24D60", "24D70"])
+
+
+    def test_unchanged_list_is_checked_once(self) -> None:
+        self.assertIsNotNone(network_handler.MetadataCache(kdk_handler.KDK_API_LINK).get())
+        self.server.requests.clear()
+
+        kdk_obj = self._resolve("24D70", "15.3.1")
+
+        self.assertTrue(kdk_obj.success)
+        self.assertFalse(kdk_obj.kdk_url_is_exactly_match)
+        self.assertEqual(kdk_obj.kdk_url_build, "24D60")
+        self.assertEqual(self.installed_checks, [None, "24D60"])
+
+        # Conditional GET answered with 304
+        requests = self.server.requests_for("GET", "/manifest.json")
+        self.assertEqual([headers.get("If-None-Match") for headers in requests], ['"v1"'])
+
+
+    def test_exact_match_skips_api(self) -> None:
+        self.assertIsNotNone(network_handler.MetadataCache(kdk_handler.KDK_API_LINK).get())
+        self.server.requests.clear()
+
+        kdk_obj = self._resolve("24D60", "15.3")
+
+        self.assertTrue(kdk_obj.kdk_url_is_exactly_match)
+        self.assertEqual(self.server.requests_for("GET", "/manifest.json"), [])
+        self.assertEqual(self.installed_checks, [None, "24D60"])
+
+
+    def test_offline_list_stays_snapshot(self) -> None:
+        self.assertIsNotNone(network_handler.MetadataCache(kdk_handler.KDK_API_LINK).get())
+
+        # Saved list predates 15.3.1, and the API can't be reached to find out
+        with mock.patch.object(network_handler.SESSION, "get", side_effect=network_handler.requests.exceptions.ConnectionError("Network down")):
+            kdk_obj = self._resolve("24D70", "15.3.1")
+
+        self.assertTrue(kdk_obj.success)
+        self.assertFalse(kdk_obj.kdk_url_is_exactly_match)
+        self.assertEqual(kdk_obj.kdk_url_build, "24D60")
+        self.assertTrue(kdk_handler.KDK_ASSET_LIST_SNAPSHOT)
+
+        # Once back online, the saved list is still checked against the API
+        new_kdk = dict(self.kdk_list[0], build="24D70", version="15.3.1", url="https://download.developer.apple.com/KDK_15.3.1_24D70.dmg")
+        self.server.files["/manifest.json"] = json.dumps([new_kdk] + self.kdk_list).encode()
+        self.server.etag = '"v2"'
+        self.server.requests.clear()
+
+        kdk_obj = self._resolve("24D70", "15.3.1")
+
+        self.assertTrue(kdk_obj.kdk_url_is_exactly_match)
+        self.assertEqual(kdk_obj.kdk_url, new_kdk["url"])
+        self.assertFalse(kdk_handler.KDK_ASSET_LIST_SNAPSHOT)
+        self.assertEqual(len(self.server.requests_for("GET", "/manifest.json")), 1)
+
+
+class KernelDebugKitChecksumTests(unittest.TestCase):
+    """
+    Validating downloaded KDK disk images against the KdkSupportPkg API's checksums
+    """
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+        self.data     = os.urandom(1024 * 256 + 17)
+        self.dmg_path = Path(self.temp_dir.name) / "KDK.dmg"
+        self.dmg_path.write_bytes(self.data)
+
+        self.kdk = {
+            "build":     "24D60",
+            "version":   "15.3",
+            "url":       "https://download.developer.apple.com/KDK_15.3_24D60.dmg",
+            "fileSize":  len(self.data),
+            "sha256sum": hashlib.sha256(self.data).hexdigest(),
+            "sha1sum":   hashlib.sha1(self.data).hexdigest(),
+            "md5sum":    hashlib.md5(self.data).hexdigest(),
+        }
+
+        patcher = mock.patch.object(kdk_handler.KernelDebugKitObject, "_remove_unused_kdks")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+    def _kdk_obj(self, kdk: dict, download_checksum=None, download_path: Path = None) -> kdk_handler.KernelDebugKitObject:
+        kdk_obj = kdk_handler.KernelDebugKitObject.__new__(kdk_handler.KernelDebugKitObject)
+        self.assertTrue(kdk_obj._match_remote_kdk(kdk_handler.KernelDebugKitCatalog([kdk]), kdk["build"], kdk["version"], packaging.version.parse(kdk["version"])))
+
+        kdk_obj.kdk_download_obj = None
+        if download_checksum is not None:
+            kdk_obj.kdk_download_obj = mock.Mock(download_complete=True, checksum=download_checksum, filepath=download_path or self.dmg_path)
+        return kdk_obj
+
+
+    def test_manifest_checksum_preference(self) -> None:
+        kdk_obj = kdk_handler.KernelDebugKitObject.__new__(kdk_handler.KernelDebugKitObject)
+
+        for removed, expected in [
+            ([],                       ("sha256", self.kdk["sha256sum"])),
+            (["sha256sum"],            ("sha1",   self.kdk["sha1sum"])),
+            (["sha256sum", "sha1sum"], ("md5",    self.kdk["md5sum"])),
+            (["sha256sum", "sha1sum", "md5sum"], ("", "")),
+        ]:
+            with self.subTest(removed=removed):
+                kdk = {key: value for key, value in self.kdk.items() if key not in removed}
+                self.assertEqual(kdk_obj._get_manifest_checksum(kdk), expected)
+
+        # Empty fields are skipped, and checksums are compared in lowercase
+        self.assertEqual(kdk_obj._get_manifest_checksum(dict(self.kdk, sha256sum="", sha1sum=self.kdk["sha1sum"].upper())), ("sha1", self.kdk["sha1sum"]))
+
+
+    def test_download_checksum_is_reused(self) -> None:
+        kdk_obj = self._kdk_obj(self.kdk, hashlib.sha256(self.data))
+
+        with mock.patch.object(kdk_obj, "_calculate_checksum", side_effect=AssertionError("Checksum recalculated")):
+            self.assertTrue(kdk_obj.validate_kdk_checksum(str(self.dmg_path)))
+        self.assertTrue(kdk_obj.success)
+
+
+    def test_checksum_recalculated_on_mismatch(self) -> None:
+        other_path = Path(self.temp_dir.name) / "Other.dmg"
+
+        for name, kdk, download_checksum, download_path in [
+            ("algorithm", dict(self.kdk, sha256sum=""), hashlib.sha256(self.data), None),
+            ("path",      self.kdk,                     hashlib.sha256(self.data), other_path),
+        ]:
+            with self.subTest(mismatch=name):
+                kdk_obj = self._kdk_obj(kdk, download_checksum, download_path)
+
+                with mock.patch.object(kdk_obj, "_calculate_checksum", wraps=kdk_obj._calculate_checksum) as calculate_checksum:
+                    self.assertTrue(kdk_obj.validate_kdk_checksum(str(self.dmg_path)))
+                calculate_checksum.assert_called_once_with(self.dmg_path, kdk_obj.kdk_url_checksum_algorithm)
+
+
+    def test_checksum_mismatch_fails(self) -> None:
+        self.dmg_path.write_bytes(bytes([self.data[0] ^ 0xFF]) + self.data[1:])
+
+        for download_checksum in [None, hashlib.sha256(self.dmg_path.read_bytes())]:
+            with self.subTest(reused=download_checksum is not None):
+                kdk_obj = self._kdk_obj(self.kdk, download_checksum)
+
+                self.assertFalse(kdk_obj.validate_kdk_checksum(str(self.dmg_path)))
+                self.assertFalse(kdk_obj.success)
+                self.assertTrue(kdk_obj.error_msg)
+                if kdk_obj.kdk_download_obj:
+                    kdk_obj.kdk_download_obj.remove_from_cache.assert_called_once()
+
+
+    def test_size_mismatch_fails(self) -> None:
+        kdk_obj = self._kdk_obj(dict(self.kdk, fileSize=len(self.data) + 1))
+
+        with mock.patch.object(kdk_obj, "_calculate_checksum", side_effect=AssertionError("Checksum calculated")):
+            self.assertFalse(kdk_obj.validate_kdk_checksum(str(self.dmg_path)))
+
+
+def build_kdk_bundle(path: Path, version: str, build: str) -> None:
+    """
+    Generate a KDK bundle, with most files shared between versions as in real KDKs
+
+    Parameters:
+        path (Path):   Bundle to create (ie. KDK_13.3_22E252.kdk)
+        version (str): macOS version of the KDK
+        build (str):   macOS build of the KDK
+    """
+
+    shared = random.Random(0)
+    unique = random.Random(build)
+
+    (path / "System/Library/CoreServices").mkdir(parents=True)
+    (path / "System/Library/CoreServices/SystemVersion.plist").write_bytes(plistlib.dumps({"ProductVersion": version, "ProductBuildVersion": build}))
+
+    (path / "System/Library/Kernels").mkdir(parents=True)
+    (path / "System/Library/Kernels/kernel").write_bytes(unique.randbytes(1024 * 512))
+
+    for index in range(24):
+        kext = path / f"System/Library/Extensions/Driver{index}.kext/Contents"
+        (kext / "MacOS").mkdir(parents=True)
+        (kext / "Info.plist").write_bytes(plistlib.dumps({"CFBundleIdentifier": f"com.apple.driver.Driver{index}"}))
+        # A few drivers change between versions
+        (kext / f"MacOS/Driver{index}").write_bytes((unique if index % 8 == 0 else shared).randbytes(1024 * 64))
+        (kext / f"MacOS/Driver{index}").chmod(0o755)
+
+    (path / "System/Library/Extensions/Current.kext").symlink_to("Driver0.kext")
+    (path / "System/Library/Kernels/kernel.link").symlink_to("kernel")
+
+
+def tree_contents(path: Path) -> dict:
+    """
+    Describe a directory tree: type, mode and content or target of every item
+    """
+
+    contents = {}
+    for root, directories, files in os.walk(path):
+        for item in directories + files:
+            item_path = Path(root) / item
+            relative_path = str(item_path.relative_to(path))
+            if item_path.is_symlink():
+                contents[relative_path] = ("symlink", os.readlink(item_path))
+            elif item_path.is_dir():
+                contents[relative_path] = ("directory", item_path.stat().st_mode & 0o7777)
+            else:
+                contents[relative_path] = ("file", item_path.stat().st_mode & 0o7777, item_path.read_bytes())
+    return contents
+
+
+def tree_disk_usage(path: Path) -> int:
+    return sum((Path(root) / file).lstat().st_blocks * 512 for root, _, files in os.walk(path) for file in files)
+
+
+class KernelDebugKitBackupStoreTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.temp_path = Path(self.temp_dir.name)
+
+        self.store = kdk_handler.KernelDebugKitBackupStore(self.temp_path / ".Backups")
+
+        self.kdks = {}
+        for version, build in [("13.3", "22E252"), ("13.3.1", "22E261")]:
+            self.kdks[build] = self.temp_path / f"KDK_{version}_{build}.kdk"
+            build_kdk_bundle(self.kdks[build], version, build)
+            self.assertTrue(self.store.backup(self.kdks[build], self.kdks[build].name))
+
+
+    def test_backup_deduplicates(self) -> None:
+        self.assertEqual(self.store.list_backups(), ["KDK_13.3.1_22E261.kdk", "KDK_13.3_22E252.kdk"])
+
+        bundles_usage = sum(tree_disk_usage(path) for path in self.kdks.values())
+        self.assertLess(self.store.disk_usage(), bundles_usage * 0.75)
+
+
+    def test_restore_is_byte_identical(self) -> None:
+        for path in self.kdks.values():
+            destination = self.temp_path / "Restored" / path.name
+            destination.parent.mkdir(exist_ok=True)
+
+            self.assertTrue(self.store.restore(path.name, destination))
+            self.assertEqual(tree_contents(destination), tree_contents(path))
+
+        # Restored files are never the store's objects
+        kernel = destination / "System/Library/Kernels/kernel"
+        object_path = self.store.objects_path / hashlib.sha256(kernel.read_bytes()).hexdigest()
+        self.assertNotEqual(kernel.stat().st_ino, object_path.stat().st_ino)
+
+
+    def test_restore_rejects_corrupted_object(self) -> None:
+        kernel = self.kdks["22E252"] / "System/Library/Kernels/kernel"
+        object_path = self.store.objects_path / hashlib.sha256(kernel.read_bytes()).hexdigest()
+        object_path.chmod(0o644)
+        with object_path.open("r+b") as file:
+            file.seek(1024)
+            file.write(b"\x00" * 16)
+
+        destination = self.temp_path / "Restored.kdk"
+        self.assertFalse(self.store.restore(self.kdks["22E252"].name, destination))
+        self.assertFalse(destination.exists())
+        self.assertEqual(list(self.temp_path.glob(".*.restoring")), [])
+
+
+    def test_restore_rejects_truncated_manifest(self) -> None:
+        manifest_path = self.store.manifest_path(self.kdks["22E252"].name)
+        manifest_path.chmod(0o644)
+        manifest_path.write_bytes(manifest_path.read_bytes()[:200])
+
+        destination = self.temp_path / "Restored.kdk"
+        self.assertFalse(self.store.restore(self.kdks["22E252"].name, destination))
+        self.assertFalse(destination.exists())
+
+
+    def test_remove_keeps_shared_objects(self) -> None:
+        usage = self.store.disk_usage()
+        self.store.remove(self.kdks["22E252"].name)
+
+        self.assertLess(self.store.disk_usage(), usage)
+        self.assertEqual(self.store.list_backups(), [self.kdks["22E261"].name])
+        self.assertTrue(self.store.restore(self.kdks["22E261"].name, self.temp_path / "Restored.kdk"))
+
+
+class KernelDebugKitBackupTests(unittest.TestCase):
+    """
+    Backing up and restoring installed KDKs through KernelDebugKitObject and KernelDebugKitUtilities
+    """
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.install_path = Path(self.temp_dir.name) / "KDKs"
+        self.install_path.mkdir()
+
+        for target, name, value in [
+            (kdk_handler,    "KDK_INSTALL_PATH",      str(self.install_path)),
+            (kdk_handler,    "KDK_BACKUP_STORE_PATH", str(self.install_path / ".Backups")),
+            (kdk_handler.os, "getuid",                lambda: 0),
+        ]:
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.kdk_path = self.install_path / "KDK_13.3.1_22E261.kdk"
+        build_kdk_bundle(self.kdk_path, "13.3.1", "22E261")
+
+        # Package installed from the KDK disk image, only read for its name
+        self.kdk_pkg = Path(self.temp_dir.name) / "KernelDebugKit.pkg"
+        self.kdk_pkg.write_bytes(b"xar!")
+        self.kdk_info_plist = Path(self.temp_dir.name) / kdk_handler.KDK_INFO_PLIST
+        self.kdk_info_plist.write_bytes(plistlib.dumps({"version": "13.3.1", "build": "22E261"}))
+
+
+    def _kdk_obj(self, passive: bool) -> kdk_handler.KernelDebugKitObject:
+        kdk_obj = kdk_handler.KernelDebugKitObject.__new__(kdk_handler.KernelDebugKitObject)
+        kdk_obj.host_build         = "22E261"
+        kdk_obj.host_version       = "13.3.1"
+        kdk_obj.passive            = passive
+        kdk_obj.ignore_installed   = False
+        kdk_obj.check_backups_only = False
+        kdk_obj.validator          = mock.Mock(validate=mock.Mock(return_value=True))
+        return kdk_obj
+
+
+    def test_installed_kdk_is_backed_up(self) -> None:
+        kdk_handler.KernelDebugKitUtilities()._create_backup(self.kdk_pkg, self.kdk_info_plist)
+
+        self.assertEqual(kdk_handler.KernelDebugKitBackupStore().list_backups(), [self.kdk_path.name])
+        self.assertFalse((self.install_path / "KDK_13.3.1_22E261.pkg").exists())
+
+
+    def test_restore_from_store(self) -> None:
+        kdk_handler.KernelDebugKitUtilities()._create_backup(self.kdk_pkg, self.kdk_info_plist)
+        original = tree_contents(self.kdk_path)
+        shutil.rmtree(self.kdk_path)
+
+        # Passive checks can't use stored KDKs without restoring them
+        self.assertIsNone(self._kdk_obj(passive=True)._local_kdk_installed())
+        self.assertFalse(self.kdk_path.exists())
+
+        self.assertEqual(self._kdk_obj(passive=False)._local_kdk_installed(), self.kdk_path)
+        self.assertEqual(tree_contents(self.kdk_path), original)
+
+
+class LocalKernelDebugKitValidatorTests(unittest.TestCase):
+    """
+    Validating installed KDKs against a recorded pkg receipt, with results cached between runs
+    """
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.temp_path = Path(self.temp_dir.name)
+
+        self.kdk_path = self.temp_path / "KDKs/KDK_13.3.1_22E261.kdk"
+        build_kdk_bundle(self.kdk_path, "13.3.1", "22E261")
+
+        self.receipt_files = sorted(str(file.relative_to(self.kdk_path)) for file in self.kdk_path.rglob("*") if file.is_file() and not file.is_symlink())
+        self.receipts_path = self.temp_path / "receipts"
+        self.receipts_path.mkdir()
+        for extension in ["bom", "plist"]:
+            (self.receipts_path / f"com.apple.pkg.KDK.22E261.{extension}").write_bytes(f"receipt {extension}".encode())
+
+        self.cache_path = self.temp_path / "KDKValidation.plist"
+        self.runner = mock.Mock(side_effect=lambda kdk_build: self.receipt_files if kdk_build == "22E261" else None)
+
+
+    def _validate(self) -> bool:
+        # New validator each time, as a relaunch would
+        return kdk_handler.LocalKernelDebugKitValidator(receipt_runner=self.runner, receipts_path=self.receipts_path, cache_path=self.cache_path).validate(self.kdk_path)
+
+
+    def _assert_rechecked(self) -> None:
+        self.runner.reset_mock()
+        self.assertTrue(self._validate())
+        self.runner.assert_called_once_with("22E261")
+
+
+    def test_unchanged_kdk_is_not_rechecked(self) -> None:
+        self.assertTrue(self._validate())
+        self.runner.assert_called_once_with("22E261")
+        self.assertIn(str(self.kdk_path), plistlib.loads(self.cache_path.read_bytes()))
+
+        self.runner.reset_mock()
+        self.assertTrue(self._validate())
+        self.runner.assert_not_called()
+
+
+    def test_modified_kdk_is_rechecked(self) -> None:
+        self.assertTrue(self._validate())
+
+        kdk_stat = self.kdk_path.stat()
+        os.utime(self.kdk_path, ns=(kdk_stat.st_atime_ns, kdk_stat.st_mtime_ns + 1_000_000_000))
+        self._assert_rechecked()
+
+        extensions_path = self.kdk_path / "System/Library/Extensions"
+        extensions_stat = extensions_path.stat()
+        os.utime(extensions_path, ns=(extensions_stat.st_atime_ns, extensions_stat.st_mtime_ns + 1_000_000_000))
+        self._assert_rechecked()
+
+
+    def test_replaced_kdk_is_rechecked(self) -> None:
+        self.assertTrue(self._validate())
+        original_stat = self.kdk_path.stat()
+
+        # Same path and modification times, different inode
+        replacement = self.temp_path / "KDKs/Replacement.kdk"
+        shutil.copytree(self.kdk_path, replacement, symlinks=True)
+        shutil.rmtree(self.kdk_path)
+        replacement.rename(self.kdk_path)
+
+        self.assertNotEqual(self.kdk_path.stat().st_ino, original_stat.st_ino)
+        self.assertEqual(self.kdk_path.stat().st_mtime_ns, original_stat.st_mtime_ns)
+        self._assert_rechecked()
+
+
+    def test_changed_receipt_is_rechecked(self) -> None:
+        self.assertTrue(self._validate())
+
+        (self.receipts_path / "com.apple.pkg.KDK.22E261.bom").write_bytes(b"reinstalled receipt")
+        self._assert_rechecked()
+
+        (self.receipts_path / "com.apple.pkg.KDK.22E261.plist").unlink()
+        self._assert_rechecked()
+
+
+    def test_changed_kernel_is_rechecked(self) -> None:
+        self.assertTrue(self._validate())
+
+        uname = os.uname()
+        with mock.patch.object(kdk_handler.os, "uname", return_value=types.SimpleNamespace(**{field: getattr(uname, field) for field in ["sysname", "nodename", "release", "machine"]}, version="Darwin Kernel Version 23.0.0")):
+            self._assert_rechecked()
+
+
+    def test_missing_file_is_invalid(self) -> None:
+        missing = next(file for file in self.receipt_files if file.startswith("System/Library/Extensions/Driver7.kext"))
+        (self.kdk_path / missing).unlink()
+
+        self.assertFalse(self._validate())
+        self.assertNotIn(str(self.kdk_path), kdk_handler.LocalKernelDebugKitValidator(receipt_runner=self.runner, receipts_path=self.receipts_path, cache_path=self.cache_path)._cache)
+
+
+    def test_invalid_kdk_is_forgotten(self) -> None:
+        self.assertTrue(self._validate())
+
+        (self.kdk_path / "System/Library/CoreServices/SystemVersion.plist").unlink()
+
+        self.assertFalse(self._validate())
+        self.assertNotIn(str(self.kdk_path), plistlib.loads(self.cache_path.read_bytes()))
+
+
+    def test_corrupt_cache_is_ignored(self) -> None:
+        self.cache_path.write_bytes(b"<?xml version=\"1.0\"?><plist><dict><key>")
+
+        self._assert_rechecked()
+        self.assertIn(str(self.kdk_path), plistlib.loads(self.cache_path.read_bytes()))
@@ -0,0 +1,605 @@
+# Tests for macos_installer_handler.py's catalogs, remote ones run against a local HTTP server
+
+import os
+import random
+import functools
+import shutil
+import plistlib
+import tempfile
+import datetime
+import unittest
+
+from pathlib import Path
+from unittest import mock
+from xml.etree import ElementTree
+
+from resources import macos_installer_handler
+from tests.http_server import LocalHTTPServer
+
+
+def build_product(base_url: str, product: str, post_date: datetime.datetime) -> dict:
+    """
+    Generate a catalog entry for an InstallAssistant product
+
+    Parameters:
+        base_url (str):               URL of the local server
+        product (str):                Product ID
+        post_date (datetime.datetime): PostDate of the product
+
+    Returns:
+        dict: Catalog entry
+    """
+
+    return {
+        "PostDate": post_date,
+        "ExtendedMetaInfo": {
+            "InstallAssistantPackageIdentifiers": {
+                "SharedSupport": "com.apple.pkg.InstallAssistant",
+                "BuildManifest": "com.apple.pkg.BuildManifest",
+            },
+        },
+        "Packages": [
+            {"URL": f"{base_url}/{product}/Info.plist", "Size": 0},
+            {"URL": f"{base_url}/{product}/InstallAssistant.pkg", "IntegrityDataURL": f"{base_url}/{product}/InstallAssistant.pkg.integrityDataV1", "Size": 1024},
+        ],
+    }
+
+
+def build_manifest(version: str, build: str) -> bytes:
+    """
+    Generate a BuildManifest (Info.plist) for an Intel installer
+
+    Parameters:
+        version (str): OS version, ie. "13.6.1"
+        build (str):   OS build, ie. "22G313"
+
+    Returns:
+        bytes: BuildManifest
+    """
+
+    return plistlib.dumps({
+        "MobileAssetProperties": {
+            "OSVersion":             version,
+            "Build":                 build,
+            "SupportedDeviceModels": ["VMM-x86_64", "Mac-AA95B1DDAB278B95"],
+        },
+    })
+
+
+class RemoteCatalogTestCase(unittest.TestCase):
+    """
+    Serves BuildManifests from a local HTTP server, with the product store in a scratch directory
+    """
+
+    def setUp(self) -> None:
+        self.server = LocalHTTPServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+        self.store_path = Path(self.temp_dir.name) / "InstallerCatalog.plist"
+        patcher = mock.patch.object(macos_installer_handler, "CATALOG_PRODUCT_STORE_PATH", self.store_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.products: dict = {}
+
+
+    def _add_product(self, product: str, version: str, build: str, manifest: bytes = None) -> None:
+        self.products[product] = build_product(self.server.url(""), product, datetime.datetime(2023, 10, 1))
+        self.server.files[f"/{product}/Info.plist"] = manifest if manifest is not None else build_manifest(version, build)
+
+
+    def _parse_catalog(self, catalog_url: str = "https://swscan.apple.com/content/catalogs/others/index-14-13-12-10.16.merged-1.sucatalog") -> dict:
+        catalog = macos_installer_handler.RemoteInstallerCatalog.__new__(macos_installer_handler.RemoteInstallerCatalog)
+        catalog.catalog_url = catalog_url
+        catalog._fetch_catalog = lambda: {"Products": self.products}
+        return catalog._parse_catalog()
+
+
+    def _stored_products(self) -> set:
+        return set(plistlib.loads(self.store_path.read_bytes())["Products"])
+
+
+class BuildManifestTests(RemoteCatalogTestCase):
+
+    def test_malformed_manifest_skips_product(self) -> None:
+        self._add_product("012-40000", "13.6.1", "22G313")
+        self._add_product("012-40001", "14.1",   "23B74",  manifest=b"<?xml version=\"1.0\"?><plist><dict><key>Mobile")
+        self._add_product("012-40002", "14.1",   "23B75",  manifest=b"\x00\x01 not a plist")
+        self._add_product("012-40003", "12.7.1", "21G920")
+
+        available_apps = self._parse_catalog()
+
+        self.assertEqual(set(available_apps), {"012-40000", "012-40003"})
+        self.assertEqual(available_apps["012-40000"]["Build"], "22G313")
+
+
+    def test_missing_manifest_skips_product(self) -> None:
+        self._add_product("012-40000", "13.6.1", "22G313")
+        self._add_product("012-40001", "14.1",   "23B74")
+        del self.server.files["/012-40001/Info.plist"]
+
+        self.assertEqual(set(self._parse_catalog()), {"012-40000"})
+
+
+class ProductStoreTests(RemoteCatalogTestCase):
+
+    def test_unchanged_products_are_reused(self) -> None:
+        self._add_product("012-40000", "13.6.1", "22G313")
+        self._add_product("012-40001", "14.1",   "23B74")
+
+        first = self._parse_catalog()
+        self.server.requests.clear()
+        second = self._parse_catalog()
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.server.requests, [])
+
+
+    def test_removed_products_are_pruned(self) -> None:
+        self._add_product("012-40000", "13.6.1", "22G313")
+        self._add_product("012-40001", "14.1",   "23B74")
+        self._parse_catalog()
+        self.assertEqual(self._stored_products(), {"012-40000", "012-40001"})
+
+        del self.products["012-40000"]
+        self._parse_catalog()
+        self.assertEqual(self._stored_products(), {"012-40001"})
+
+
+    def test_products_of_other_catalogs_are_kept(self) -> None:
+        self._add_product("012-40000", "13.6.1", "22G313")
+        self._parse_catalog("https://swscan.apple.com/content/catalogs/others/index-14seed-14-13-12-10.16.merged-1.sucatalog")
+
+        del self.products["012-40000"]
+        self._add_product("012-40001", "14.1", "23B74")
+        self._parse_catalog()
+
+        self.assertEqual(self._stored_products(), {"012-40000", "012-40001"})
+
+
+    def test_corrupt_store_is_ignored(self) -> None:
+        self._add_product("012-40000", "13.6.1", "22G313")
+
+        for content in [b"\x00\x01 not a plist", b"<?xml version=\"1.0\"?><plist><dict><key>Products"]:
+            with self.subTest(content=content):
+                self.store_path.write_bytes(content)
+                self.server.requests.clear()
+
+                self.assertEqual(set(self._parse_catalog()), {"012-40000"})
+                self.assertEqual(len(self.server.requests_for("GET", "/012-40000/Info.plist")), 1)
+                self.assertEqual(self._stored_products(), {"012-40000"})
+
+
+class MultiSeedCatalogTests(RemoteCatalogTestCase):
+    """
+    Each seed's catalog is served locally, and fetched through a MetadataCache in the scratch directory
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+
+        for target, name, value in [
+            (macos_installer_handler.network_handler,        "MetadataCache",          functools.partial(macos_installer_handler.network_handler.MetadataCache, cache_path=Path(self.temp_dir.name) / "Cache")),
+            (macos_installer_handler.RemoteInstallerCatalog, "_construct_catalog_url", lambda catalog, seed_type, os_kernel: self.server.url(f"/{seed_type.name}.sucatalog")),
+        ]:
+            patcher = mock.patch.object(target, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.seeds = [macos_installer_handler.SeedType.PublicRelease, macos_installer_handler.SeedType.PublicSeed, macos_installer_handler.SeedType.DeveloperSeed]
+
+        self._add_product("012-40000", "13.6.1", "22G313")
+        self._add_product("012-40001", "14.1",   "23B74")
+        self._add_product("012-40002", "14.2",   "23C5030f")
+        self._add_product("012-40003", "14.2",   "23C5041e")
+
+        self._serve_seed(macos_installer_handler.SeedType.PublicRelease, ["012-40000", "012-40001"])
+        self._serve_seed(macos_installer_handler.SeedType.PublicSeed,    ["012-40001", "012-40002"])
+        self._serve_seed(macos_installer_handler.SeedType.DeveloperSeed, ["012-40001", "012-40002", "012-40003"])
+
+
+    def _serve_seed(self, seed: macos_installer_handler.SeedType, products: list) -> None:
+        self.server.files[f"/{seed.name}.sucatalog"] = plistlib.dumps({"Products": {product: self.products[product] for product in products}})
+
+
+    def test_products_are_merged(self) -> None:
+        catalog = macos_installer_handler.MultiSeedInstallerCatalog(self.seeds)
+
+        self.assertEqual({product: installer["Seeds"] for product, installer in catalog.available_apps.items()}, {
+            "012-40000": ["PublicRelease"],
+            "012-40001": ["PublicRelease", "PublicSeed", "DeveloperSeed"],
+            "012-40002": ["PublicSeed", "DeveloperSeed"],
+            "012-40003": ["DeveloperSeed"],
+        })
+        self.assertEqual(catalog.available_apps["012-40003"]["Build"], "23C5041e")
+        self.assertEqual([installer["Version"] for installer in catalog.available_apps.values()], ["13.6.1", "14.1", "14.2", "14.2"])
+
+        for seed in self.seeds:
+            self.assertEqual(len(self.server.requests_for("GET", f"/{seed.name}.sucatalog")), 1)
+
+
+    def test_unavailable_seed_keeps_others(self) -> None:
+        del self.server.files[f"/{macos_installer_handler.SeedType.PublicSeed.name}.sucatalog"]
+
+        catalog = macos_installer_handler.MultiSeedInstallerCatalog(self.seeds)
+
+        self.assertEqual(len(catalog.available_apps), 4)
+        self.assertEqual(catalog.available_apps["012-40001"]["Seeds"], ["PublicRelease", "DeveloperSeed"])
+        self.assertEqual(catalog.available_apps["012-40002"]["Seeds"], ["DeveloperSeed"])
+
+
+    def test_failing_seed_keeps_others(self) -> None:
+        parse_catalog = macos_installer_handler.RemoteInstallerCatalog._parse_catalog
+
+        def _parse_catalog(catalog) -> dict:
+            if catalog.catalog_url.endswith("/DeveloperSeed.sucatalog"):
+                raise ValueError("Malformed catalog")
+            return parse_catalog(catalog)
+
+        with mock.patch.object(macos_installer_handler.RemoteInstallerCatalog, "_parse_catalog", _parse_catalog):
+            catalog = macos_installer_handler.MultiSeedInstallerCatalog(self.seeds)
+
+        self.assertNotIn(macos_installer_handler.SeedType.DeveloperSeed, catalog.catalogs)
+        self.assertEqual(set(catalog.available_apps), {"012-40000", "012-40001", "012-40002"})
+        self.assertEqual(catalog.available_apps["012-40001"]["Seeds"], ["PublicRelease", "PublicSeed"])
+
+
+def build_catalog(product_count: int = 2000, install_assistant_interval: int = 100, seed: int = 0) -> dict:
+    """
+    Generate a Software Update catalog resembling Apple's, mostly made up of non-installer products
+
+    Parameters:
+        product_count (int):              Number of products in the catalog
+        install_assistant_interval (int): Every nth product is an InstallAssistant product
+        seed (int):                       Seed for the random generator, catalogs are reproducible
+
+    Returns:
+        dict: Catalog, as returned by plistlib
+    """
+
+    generator = random.Random(seed)
+    products = {}
+    for index in range(product_count):
+        product = {
+            "ServerMetadataURL": f"https://swcdn.apple.com/content/downloads/{index}/{index}.smd",
+            "PostDate":          datetime.datetime(2020, 1, 1) + datetime.timedelta(days=index % 1000, seconds=index),
+            "Packages": [
+                {
+                    "URL":         f"https://swcdn.apple.com/content/downloads/{index}/Package{package}.pkg",
+                    "Size":        generator.randint(1, 1024 ** 3),
+                    "Digest":      f"{generator.getrandbits(160):040x}",
+                    "MetadataURL": f"https://swdist.apple.com/content/downloads/{index}/Package{package}.pkm",
+                }
+                for package in range(generator.randint(1, 8))
+            ],
+            "Distributions": {"English": f"https://swdist.apple.com/content/downloads/{index}/{index}.English.dist"},
+            "ExtendedMetaInfo": {"ProductType": "softwareupdate", "AutoUpdate": True, "Signature": b"\x00\x01\x02"},
+        }
+        if index % install_assistant_interval == 0:
+            product["ExtendedMetaInfo"]["InstallAssistantPackageIdentifiers"] = {
+                "SharedSupport": "com.apple.pkg.InstallAssistant.macOSSonoma",
+                "BuildManifest": "com.apple.pkg.BuildManifest.macOSSonoma",
+            }
+            product["Packages"].append({"URL": f"https://swcdn.apple.com/content/downloads/{index}/Info.plist", "Size": 0, "Ratio": 1.5, "Encrypted": False})
+        products[f"{index:03d}-{index * 7:05d}"] = product
+
+    return {
+        "CatalogVersion": 2,
+        "ApplePostURL":   "https://swscan.apple.com/content/catalogs/others/index.sucatalog",
+        "IndexDate":      datetime.datetime(2024, 1, 1),
+        "Products":       products,
+    }
+
+
+def parse_catalog_products_reference(content: bytes) -> dict:
+    """
+    Previous implementation of catalog parsing, the whole catalog loaded with plistlib
+
+    Parameters:
+        content (bytes): Catalog
+
+    Returns:
+        dict: InstallAssistant products, keyed by product ID
+    """
+
+    products = plistlib.loads(content)["Products"]
+    return {product: entry for product, entry in products.items() if "InstallAssistantPackageIdentifiers" in entry.get("ExtendedMetaInfo", {})}
+
+
+class CatalogParsingTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.catalog = macos_installer_handler.RemoteInstallerCatalog.__new__(macos_installer_handler.RemoteInstallerCatalog)
+
+
+    def test_matches_plistlib(self) -> None:
+        content = plistlib.dumps(build_catalog())
+
+        products = self.catalog._parse_catalog_products(content)
+
+        self.assertEqual(products, parse_catalog_products_reference(content))
+        self.assertEqual(list(products), list(parse_catalog_products_reference(content)))
+        self.assertEqual(len(products), 20)
+
+
+    def test_binary_catalog_matches_plistlib(self) -> None:
+        catalog = build_catalog(product_count=300)
+
+        products = self.catalog._parse_catalog_products(plistlib.dumps(catalog, fmt=plistlib.FMT_BINARY))
+
+        self.assertEqual(products, parse_catalog_products_reference(plistlib.dumps(catalog)))
+
+
+    def test_products_key_after_other_keys(self) -> None:
+        catalog = build_catalog(product_count=300)
+        content = plistlib.dumps({"Products": catalog["Products"], "Zzz": {"Products": {"Nested": {}}}}, sort_keys=True)
+
+        self.assertEqual(self.catalog._parse_catalog_products(content), parse_catalog_products_reference(content))
+
+
+    def test_truncated_catalog_raises(self) -> None:
+        content = plistlib.dumps(build_catalog(product_count=300))
+
+        with self.assertRaises(ElementTree.ParseError):
+            self.catalog._parse_catalog_products(content[:-100])
+
+
+def list_newest_installers_reference(available_apps: dict) -> dict:
+    """
+    Previous implementation of RemoteInstallerCatalog._list_newest_installers_only,
+    comparing versions pairwise per supported OS
+
+    Parameters:
+        available_apps (dict): Installers, keyed by product ID
+
+    Returns:
+        dict: Newest installers only
+    """
+
+    newest_apps: dict = available_apps.copy()
+    supported_versions = ["10.13", "10.14", "10.15", "11", "12", "13", "14"]
+
+    for version in supported_versions:
+        remote_version_minor = 0
+        remote_version_security = 0
+        os_builds = []
+
+        for ia in newest_apps:
+            if newest_apps[ia]["Version"].startswith(version):
+                if newest_apps[ia]["Variant"] not in ["CustomerSeed", "DeveloperSeed", "PublicSeed"]:
+                    remote_version = newest_apps[ia]["Version"].split(".")
+                    if remote_version[0] == "10":
+                        remote_version.pop(0)
+                        remote_version.pop(0)
+                    else:
+                        remote_version.pop(0)
+                    if int(remote_version[0]) > remote_version_minor:
+                        remote_version_minor = int(remote_version[0])
+                        remote_version_security = 0
+                    if len(remote_version) > 1:
+                        if int(remote_version[1]) > remote_version_security:
+                            remote_version_security = int(remote_version[1])
+
+        for ia in list(newest_apps):
+            if newest_apps[ia]["Variant"] in ["CustomerSeed", "DeveloperSeed", "PublicSeed"]:
+                continue
+
+            if newest_apps[ia]["Version"].startswith(version):
+                remote_version = newest_apps[ia]["Version"].split(".")
+                if remote_version[0] == "10":
+                    remote_version.pop(0)
+                    remote_version.pop(0)
+                else:
+                    remote_version.pop(0)
+                if int(remote_version[0]) < remote_version_minor:
+                    newest_apps.pop(ia)
+                    continue
+                if int(remote_version[0]) == remote_version_minor:
+                    if len(remote_version) > 1:
+                        if int(remote_version[1]) < remote_version_security:
+                            newest_apps.pop(ia)
+                            continue
+                    else:
+                        if remote_version_security > 0:
+                            newest_apps.pop(ia)
+                            continue
+
+                if newest_apps[ia]["Build"] in os_builds:
+                    newest_apps.pop(ia)
+                    continue
+
+                os_builds.append(newest_apps[ia]["Build"])
+
+    for ia in list(newest_apps):
+        if newest_apps[ia]["Variant"] in ["CustomerSeed", "DeveloperSeed", "PublicSeed"]:
+            for ia2 in newest_apps:
+                if newest_apps[ia2]["Version"].split(".")[0] == newest_apps[ia]["Version"].split(".")[0] and newest_apps[ia2]["Variant"] not in ["CustomerSeed", "DeveloperSeed", "PublicSeed"]:
+                    newest_apps.pop(ia)
+                    break
+
+    return newest_apps
+
+
+class NewestInstallersTests(unittest.TestCase):
+
+    def _random_installers(self, generator: random.Random, count: int) -> dict:
+        installers = {}
+        for index in range(count):
+            major   = generator.choice(["10.12", "10.13", "10.14", "10.15", "11", "12", "13", "14", "15"])
+            version = [major, str(generator.randint(0, 7))]
+            if generator.random() < 0.5:
+                version.append(str(generator.randint(0, 4)))
+
+            installers[f"{generator.randint(0, 10 ** 6):07d}-{index}"] = {
+                "Version": ".".join(version),
+                "Build":   f"2{generator.randint(0, count // 2 + 1)}A",
+                "Variant": generator.choice(["Public", "Public", "Public", "PublicSeed", "DeveloperSeed", "CustomerSeed"]),
+            }
+        return installers
+
+
+    def _list_newest_installers(self, available_apps: dict) -> dict:
+        catalog = macos_installer_handler.RemoteInstallerCatalog.__new__(macos_installer_handler.RemoteInstallerCatalog)
+        catalog.available_apps = available_apps
+        return catalog._list_newest_installers_only()
+
+
+    def test_matches_reference_on_random_catalogs(self) -> None:
+        generator = random.Random(42)
+        for trial in range(5000):
+            installers = self._random_installers(generator, generator.randint(0, 30))
+            with self.subTest(trial=trial):
+                expected = list_newest_installers_reference(installers)
+                result   = self._list_newest_installers(installers)
+                self.assertEqual(result, expected)
+                self.assertEqual(list(result), list(expected))
+
+
+    def test_matches_reference_on_large_catalog(self) -> None:
+        installers = self._random_installers(random.Random(7), 2000)
+
+        self.assertEqual(list(self._list_newest_installers(installers).items()), list(list_newest_installers_reference(installers).items()))
+
+
+    def test_newest_per_major_version(self) -> None:
+        installers = {
+            "001": {"Version": "13.6",   "Build": "22G120",   "Variant": "Public"},
+            "002": {"Version": "13.6.1", "Build": "22G313",   "Variant": "Public"},
+            "003": {"Version": "13.5",   "Build": "22G74",    "Variant": "Public"},
+            "004": {"Version": "12.7.1", "Build": "21G920",   "Variant": "Public"},
+            "005": {"Version": "12.7.1", "Build": "21G920",   "Variant": "Public"},
+            "006": {"Version": "14.2",   "Build": "23C5030f", "Variant": "DeveloperSeed"},
+            "007": {"Version": "14.1.1", "Build": "23B81",    "Variant": "Public"},
+            "008": {"Version": "15.0",   "Build": "24A5264n", "Variant": "DeveloperSeed"},
+        }
+
+        self.assertEqual(list(self._list_newest_installers(installers)), ["002", "004", "007", "008"])
+
+
+    def test_no_catalog(self) -> None:
+        self.assertEqual(self._list_newest_installers(None), {})
+
+
+def build_installer_app(path: Path, name: str, sdk_build: str) -> Path:
+    """
+    Generate the parts of an 'Install macOS' application read by LocalInstallerCatalog
+
+    Parameters:
+        path (Path):     Applications folder
+        name (str):      Display name, ie. "Install macOS Sonoma"
+        sdk_build (str): DTSDKBuild, its first two digits are the kernel version
+
+    Returns:
+        Path: The application's SharedSupport.dmg
+    """
+
+    contents = path / f"{name}.app" / "Contents"
+    (contents / "Resources").mkdir(parents=True)
+    (contents / "Resources/createinstallmedia").write_bytes(b"#!/bin/sh\n")
+    (contents / "Info.plist").write_bytes(plistlib.dumps({
+        "CFBundleDisplayName":    name,
+        "DTPlatformVersion":      "GM",
+        "DTSDKBuild":             sdk_build,
+        "LSMinimumSystemVersion": "10.13",
+    }))
+
+    (contents / "SharedSupport").mkdir()
+    sharedsupport_path = contents / "SharedSupport/SharedSupport.dmg"
+    sharedsupport_path.write_bytes(random.Random(name).randbytes(1024))
+    return sharedsupport_path
+
+
+class LocalInstallerCatalogTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+        self.search_path = Path(self.temp_dir.name) / "Applications"
+        self.cache_path  = Path(self.temp_dir.name) / "SharedSupport.plist"
+
+        self.sharedsupport = {
+            "Install macOS Sonoma":  build_installer_app(self.search_path, "Install macOS Sonoma",  "23A339"),
+            "Install macOS Ventura": build_installer_app(self.search_path, "Install macOS Ventura", "22A380"),
+        }
+        (self.search_path / "Safari.app/Contents").mkdir(parents=True)
+
+        versions = {
+            self.sharedsupport["Install macOS Sonoma"]:  ("23A344", "14.0"),
+            self.sharedsupport["Install macOS Ventura"]: ("22G313", "13.6.1"),
+        }
+        self.runner = mock.Mock(side_effect=lambda sharedsupport_path: versions[sharedsupport_path])
+
+
+    def _catalog(self) -> macos_installer_handler.LocalInstallerCatalog:
+        return macos_installer_handler.LocalInstallerCatalog(search_path=self.search_path, sharedsupport_runner=self.runner, cache_path=self.cache_path)
+
+
+    def _probed(self) -> set:
+        return {call.args[0] for call in self.runner.call_args_list}
+
+
+    def test_versions_read_from_sharedsupport(self) -> None:
+        available_apps = self._catalog().available_apps
+
+        self.assertEqual([(installer["Short Name"], installer["Version"], installer["Build"]) for installer in available_apps.values()], [
+            ("Install macOS Ventura", "13.6.1", "22G313"),
+            ("Install macOS Sonoma",  "14.0",   "23A344"),
+        ])
+        self.assertEqual(self._probed(), set(self.sharedsupport.values()))
+
+
+    def test_unchanged_sharedsupport_is_not_probed(self) -> None:
+        first = self._catalog().available_apps
+        self.runner.reset_mock()
+
+        self.assertEqual(self._catalog().available_apps, first)
+        self.runner.assert_not_called()
+
+
+    def test_changed_sharedsupport_is_probed(self) -> None:
+        self._catalog()
+        sharedsupport_path = self.sharedsupport["Install macOS Sonoma"]
+
+        for name, change in [
+            ("size",  lambda: sharedsupport_path.write_bytes(sharedsupport_path.read_bytes() + b"\0")),
+            ("mtime", lambda: os.utime(sharedsupport_path, ns=(sharedsupport_path.stat().st_atime_ns, sharedsupport_path.stat().st_mtime_ns + 1_000_000_000))),
+        ]:
+            with self.subTest(change=name):
+                self.runner.reset_mock()
+                change()
+
+                self._catalog()
+                self.assertEqual(self._probed(), {sharedsupport_path})
+
+
+    def test_failed_probe_is_retried(self) -> None:
+        self.runner.side_effect = lambda sharedsupport_path: (None, None)
+        self._catalog()
+
+        self.runner.reset_mock()
+        self._catalog()
+        self.assertEqual(self._probed(), set(self.sharedsupport.values()))
+
+
+    def test_corrupt_cache_is_ignored(self) -> None:
+        for content in [b"\x00\x01 not a plist", b"<?xml version=\"1.0\"?><plist><dict><key>", plistlib.dumps(["not", "a", "dict"])]:
+            with self.subTest(content=content):
+                self.cache_path.write_bytes(content)
+                self.runner.reset_mock()
+
+                self.assertEqual(len(self._catalog().available_apps), 2)
+                self.assertEqual(self._probed(), set(self.sharedsupport.values()))
+                self.assertEqual(set(plistlib.loads(self.cache_path.read_bytes())), {str(path) for path in self.sharedsupport.values()})
+
+
+    def test_removed_installers_are_pruned(self) -> None:
+        self._catalog()
+        shutil.rmtree(self.search_path / "Install macOS Ventura.app")
+
+        self.assertEqual([installer["Short Name"] for installer in self._catalog().available_apps.values()], ["Install macOS Sonoma"])
+        self.assertEqual(set(plistlib.loads(self.cache_path.read_bytes())), {str(self.sharedsupport["Install macOS Sonoma"])})
@@ -0,0 +1,1172 @@
+# Tests for network_handler.py, run against a local HTTP server
+
+import os
+import time
+import types
+import hashlib
+import tempfile
+import threading
+import unittest
+
+from pathlib import Path
+from unittest import mock
+
+from resources import network_handler
+from resources.integrity_verification import ChunklistStatus, ChunklistVerification
+from tests.chunklist import build_chunklist
+from tests.http_server import LocalHTTPServer
+
+
+CHUNK_SIZE: int = 1024 * 64
+
+
+class FakeClock:
+    """
+    Manually advanced time source, for TokenBucket, DownloadScheduler and ThroughputEstimator
+    """
+
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now: float = now
+
+
+    def __call__(self) -> float:
+        return self.now
+
+
+    def advance(self, seconds: float) -> None:
+        self.now += seconds
+
+
+class LocalServerTestCase(unittest.TestCase):
+    """
+    Starts a local HTTP server and a scratch directory for each test
+    """
+
+    def setUp(self) -> None:
+        self.server = LocalHTTPServer()
+        self.server.start()
+        self.addCleanup(self.server.stop)
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.temp_path = Path(self.temp_dir.name)
+
+        # Small files are still worth segmenting in tests
+        for name, value in {
+            "SEGMENTED_DOWNLOAD_MINIMUM_SIZE": 1024 * 1024,
+            "SEGMENTED_DOWNLOAD_PIECE_SIZE":   1024 * 1024,
+        }.items():
+            patcher = mock.patch.object(network_handler, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.partial_path = self.temp_path / "Partial"
+
+
+    def _download(self, path: str, name: str, **kwargs) -> network_handler.DownloadObject:
+        kwargs.setdefault("partial_path", self.partial_path)
+        download_obj = network_handler.DownloadObject(self.server.url(path), self.temp_path / name, scheduler=network_handler.DownloadScheduler(), **kwargs)
+        download_obj.download(spawn_thread=False)
+        return download_obj
+
+
+class SegmentedDownloadTests(LocalServerTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.data = os.urandom(1024 * 1024 * 6 + 12345)
+        self.server.files["/InstallAssistant.pkg"] = self.data
+
+
+    def test_segmented_matches_single_stream(self) -> None:
+        single    = self._download("/InstallAssistant.pkg", "single.pkg")
+        segmented = self._download("/InstallAssistant.pkg", "segmented.pkg", connections=4)
+
+        self.assertTrue(single.download_complete)
+        self.assertTrue(segmented.download_complete)
+        self.assertEqual((self.temp_path / "single.pkg").read_bytes(), self.data)
+        self.assertEqual((self.temp_path / "segmented.pkg").read_bytes(), self.data)
+        self.assertEqual(segmented.get_percent(), 100)
+
+        range_requests = [headers for headers in self.server.requests_for("GET", "/InstallAssistant.pkg") if "Range" in headers]
+        self.assertGreater(len(range_requests), 1)
+
+
+    def test_falls_back_to_single_stream_without_ranges(self) -> None:
+        self.server.supports_ranges = False
+
+        download_obj = self._download("/InstallAssistant.pkg", "InstallAssistant.pkg", connections=4)
+
+        self.assertTrue(download_obj.download_complete)
+        self.assertFalse(download_obj.supports_ranges)
+        self.assertEqual((self.temp_path / "InstallAssistant.pkg").read_bytes(), self.data)
+        self.assertEqual(len(self.server.requests_for("GET", "/InstallAssistant.pkg")), 1)
+
+
+    def test_checksum_matches_single_stream(self) -> None:
+        expected = hashlib.sha256(self.data).hexdigest()
+
+        single    = self._download("/InstallAssistant.pkg", "single.pkg", checksum_algorithm="sha256")
+        segmented = self._download("/InstallAssistant.pkg", "segmented.pkg", connections=4, checksum_algorithm="sha256")
+
+        self.assertEqual(single.checksum.hexdigest(), expected)
+        self.assertEqual(segmented.checksum.hexdigest(), expected)
+
+
+    def test_segmented_throughput(self) -> None:
+        # Each connection is throttled, as a distant CDN node would be
+        self.server.delay = 0.02
+
+        start_time = time.perf_counter()
+        self._download("/InstallAssistant.pkg", "single.pkg")
+        single_duration = time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        self._download("/InstallAssistant.pkg", "segmented.pkg", connections=4)
+        segmented_duration = time.perf_counter() - start_time
+
+        self.assertLess(segmented_duration, single_duration * 0.75)
+
+
+class PartialDownloadTests(LocalServerTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.data = os.urandom(1024 * 1024 * 9 + 4321)
+        self.server.files["/InstallAssistant.pkg"] = self.data
+
+
+    def test_partial_survives_new_destination(self) -> None:
+        # Destination is on a freshly mounted payloads.dmg after a relaunch
+        # Streams are written in 4MB chunks, ensure at least one lands
+        self.server.abort_after = 1024 * 1024 * 5
+        interrupted = self._download("/InstallAssistant.pkg", "First/InstallAssistant.pkg")
+
+        self.assertFalse(interrupted.download_complete)
+        self.assertEqual(interrupted.partial_filepath.parent, self.partial_path)
+        self.assertTrue(interrupted.partial_filepath.exists())
+        self.assertTrue(interrupted.partial_state_filepath.exists())
+        self.assertFalse((self.temp_path / "First/InstallAssistant.pkg.partial").exists())
+
+        self.server.abort_after = None
+        self.server.requests.clear()
+        resumed = self._download("/InstallAssistant.pkg", "Second/InstallAssistant.pkg")
+
+        self.assertTrue(resumed.download_complete)
+        self.assertEqual((self.temp_path / "Second/InstallAssistant.pkg").read_bytes(), self.data)
+        self.assertFalse(resumed.partial_filepath.exists())
+        self.assertFalse(resumed.partial_state_filepath.exists())
+
+        resume_request = self.server.requests_for("GET", "/InstallAssistant.pkg")[-1]
+        self.assertRegex(resume_request.get("Range", ""), r"^bytes=[1-9]\d*-$")
+
+
+    def test_partials_are_keyed_by_url(self) -> None:
+        first  = network_handler.DownloadObject(self.server.url("/a/InstallAssistant.pkg"), self.temp_path / "InstallAssistant.pkg", partial_path=self.partial_path)
+        second = network_handler.DownloadObject(self.server.url("/b/InstallAssistant.pkg"), self.temp_path / "InstallAssistant.pkg", partial_path=self.partial_path)
+
+        self.assertNotEqual(first.partial_filepath, second.partial_filepath)
+
+
+    def test_completion_is_rename(self) -> None:
+        # A copy across volumes would rewrite the whole file with no progress shown
+        with mock.patch.object(network_handler.os, "replace", wraps=os.replace) as replace, \
+             mock.patch("shutil.copyfile", side_effect=AssertionError("Partial copied")), \
+             mock.patch("shutil.move", side_effect=AssertionError("Partial moved")):
+            download_obj = self._download("/InstallAssistant.pkg", "InstallAssistant.pkg")
+
+        self.assertTrue(download_obj.download_complete)
+        self.assertEqual(replace.call_args, mock.call(download_obj.partial_filepath, download_obj.filepath))
+        self.assertEqual((self.temp_path / "InstallAssistant.pkg").read_bytes(), self.data)
+
+
+    def test_partial_on_other_volume_uses_destination(self) -> None:
+        self.partial_path.mkdir()
+        (self.temp_path / "Destination").mkdir()
+        partial_device = self.partial_path.stat().st_dev
+        original_stat  = Path.stat
+
+        def _stat(path: Path, *args, **kwargs) -> os.stat_result:
+            result = original_stat(path, *args, **kwargs)
+            if path.absolute() == self.partial_path.absolute():
+                return os.stat_result((*result[:2], partial_device + 1, *result[3:]))
+            return result
+
+        with mock.patch.object(Path, "stat", _stat):
+            download_obj = network_handler.DownloadObject(self.server.url("/InstallAssistant.pkg"), self.temp_path / "Destination/InstallAssistant.pkg", partial_path=self.partial_path)
+
+        self.assertEqual(download_obj.partial_path, self.temp_path / "Destination")
+        self.assertEqual(download_obj.partial_filepath.parent, self.temp_path / "Destination")
+
+
+class ResumeDownloadTests(LocalServerTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.data = os.urandom(1024 * 1024 * 9 + 4321)
+        self.server.files["/InstallAssistant.pkg"] = self.data
+
+        # Streams are written in 4MB chunks, ensure at least one lands
+        self.server.abort_after = 1024 * 1024 * 5
+        interrupted = self._download("/InstallAssistant.pkg", "InstallAssistant.pkg")
+        self.assertFalse(interrupted.download_complete)
+
+        self.server.abort_after = None
+        self.server.requests.clear()
+
+
+    def test_resume_sends_if_range(self) -> None:
+        resumed = self._download("/InstallAssistant.pkg", "InstallAssistant.pkg", checksum_algorithm="sha256")
+
+        self.assertTrue(resumed.download_complete)
+        self.assertEqual((self.temp_path / "InstallAssistant.pkg").read_bytes(), self.data)
+        self.assertEqual(resumed.checksum.hexdigest(), hashlib.sha256(self.data).hexdigest())
+
+        request = self.server.requests_for("GET", "/InstallAssistant.pkg")[-1]
+        self.assertEqual(request.get("If-Range"), self.server.etag)
+        self.assertEqual(request.get("Range"), f"bytes={int(resumed._resumed_file_size)}-")
+        self.assertGreater(resumed._resumed_file_size, 0)
+
+
+    def test_changed_file_restarts(self) -> None:
+        self.data = os.urandom(len(self.data))
+        self.server.files["/InstallAssistant.pkg"] = self.data
+        self.server.etag = '"v2"'
+
+        restarted = self._download("/InstallAssistant.pkg", "InstallAssistant.pkg")
+
+        self.assertTrue(restarted.download_complete)
+        self.assertEqual((self.temp_path / "InstallAssistant.pkg").read_bytes(), self.data)
+        self.assertNotIn("Range", self.server.requests_for("GET", "/InstallAssistant.pkg")[-1])
+
+
+    def test_ignored_range_restarts(self) -> None:
+        # Server replies with the whole file (200) instead of the requested range
+        self.server.supports_ranges = False
+
+        restarted = self._download("/InstallAssistant.pkg", "InstallAssistant.pkg", checksum_algorithm="sha256")
+
+        self.assertTrue(restarted.download_complete)
+        self.assertEqual((self.temp_path / "InstallAssistant.pkg").read_bytes(), self.data)
+        self.assertEqual(restarted.checksum.hexdigest(), hashlib.sha256(self.data).hexdigest())
+        self.assertIn("Range", self.server.requests_for("GET", "/InstallAssistant.pkg")[-1])
+
+
+class RepairDownloadTests(LocalServerTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.data = os.urandom(CHUNK_SIZE * 40 + 99)
+        self.server.files["/InstallAssistant.pkg"] = self.data
+        self.chunklist = build_chunklist(self.data, CHUNK_SIZE)
+
+
+    def test_repair_fetches_only_failed_chunks(self) -> None:
+        download_obj = self._download("/InstallAssistant.pkg", "InstallAssistant.pkg")
+        self.assertTrue(download_obj.download_complete)
+
+        file_path = self.temp_path / "InstallAssistant.pkg"
+        with file_path.open("r+b") as file:
+            for index in [3, 27]:
+                file.seek(index * CHUNK_SIZE + 1)
+                file.write(b"\x00" * 16)
+
+        chunk_obj = ChunklistVerification(file_path, self.chunklist, threads=4)
+        chunk_obj._validate()
+        self.assertEqual(chunk_obj.status, ChunklistStatus.FAILURE)
+
+        self.server.requests.clear()
+        self.assertTrue(download_obj.repair(chunk_obj))
+
+        self.assertEqual(file_path.read_bytes(), self.data)
+        self.assertEqual(chunk_obj.status, ChunklistStatus.SUCCESS)
+        self.assertCountEqual(
+            [headers["Range"] for headers in self.server.requests_for("GET", "/InstallAssistant.pkg")],
+            [f"bytes={index * CHUNK_SIZE}-{(index + 1) * CHUNK_SIZE - 1}" for index in [3, 27]],
+        )
+
+
+class NetworkCheckTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        patcher = mock.patch.object(network_handler, "NETWORK_CHECK_CACHE", {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+    def test_success_is_cached(self) -> None:
+        with mock.patch.object(network_handler.requests, "head") as head:
+            self.assertTrue(network_handler.NetworkUtilities("https://swscan.apple.com/content").verify_network_connection())
+            self.assertTrue(network_handler.NetworkUtilities("https://swscan.apple.com/other").verify_network_connection())
+
+        self.assertEqual(head.call_count, 1)
+
+
+    def test_failure_is_not_cached(self) -> None:
+        with mock.patch.object(network_handler.requests, "head", side_effect=network_handler.requests.exceptions.ConnectionError):
+            self.assertFalse(network_handler.NetworkUtilities("https://swscan.apple.com").verify_network_connection())
+
+        # Network came back
+        with mock.patch.object(network_handler.requests, "head") as head:
+            self.assertTrue(network_handler.NetworkUtilities("https://swscan.apple.com").verify_network_connection())
+
+        self.assertEqual(head.call_count, 1)
+
+
+    def test_failure_clears_cached_success(self) -> None:
+        with mock.patch.object(network_handler.requests, "head"):
+            network_handler.NetworkUtilities("https://swscan.apple.com").verify_network_connection()
+
+        with mock.patch.object(network_handler, "NETWORK_CHECK_TTL", 0), mock.patch.object(network_handler.requests, "head", side_effect=network_handler.requests.exceptions.Timeout):
+            self.assertFalse(network_handler.NetworkUtilities("https://swscan.apple.com").verify_network_connection())
+
+        self.assertNotIn("swscan.apple.com", network_handler.NETWORK_CHECK_CACHE)
+
+
+class HeadRequestTests(LocalServerTestCase):
+    """
+    HEAD requests are only sent when the download can't start without the server's headers
+    """
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.data = os.urandom(1024 * 1024 * 3 + 99)
+        self.server.files["/InstallAssistant.pkg"] = self.data
+
+        # Connectivity already confirmed for this host earlier in the process
+        patcher = mock.patch.object(network_handler, "NETWORK_CHECK_CACHE", {f"127.0.0.1:{self.server.server_address[1]}": time.time()})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+
+    def test_plain_download_sends_no_head(self) -> None:
+        download_obj = self._download("/InstallAssistant.pkg", "InstallAssistant.pkg")
+
+        self.assertTrue(download_obj.download_complete)
+        self.assertEqual(download_obj.total_file_size, len(self.data))
+        self.assertEqual(self.server.request_count("HEAD"), 0)
+        self.assertEqual(self.server.request_count("GET", "/InstallAssistant.pkg"), 1)
+
+
+    def test_connectivity_checked_once(self) -> None:
+        network_handler.NETWORK_CHECK_CACHE.clear()
+
+        for name in ["First.pkg", "Second.pkg", "Third.pkg"]:
+            self.assertTrue(self._download("/InstallAssistant.pkg", name).download_complete)
+
+        self.assertEqual(self.server.request_count("HEAD"), 1)
+
+
+    def test_segmented_download_sends_head(self) -> None:
+        download_obj = self._download("/InstallAssistant.pkg", "InstallAssistant.pkg", connections=4)
+
+        self.assertTrue(download_obj.download_complete)
+        self.assertEqual(self.server.request_count("HEAD", "/InstallAssistant.pkg"), 1)
+
+
+    def test_cached_download_sends_head(self) -> None:
+        cache = network_handler.DownloadCache(self.temp_path / "Cache", budget=1024 * 1024 * 16)
+        download_obj = self._download("/InstallAssistant.pkg", "InstallAssistant.pkg", cache=cache)
+
+        self.assertTrue(download_obj.download_complete)
+        self.assertEqual(self.server.request_count("HEAD", "/InstallAssistant.pkg"), 1)
+
+
+    def test_resumed_download_sends_head(self) -> None:
+        self.server.abort_after = 1024 * 1024 * 2
+        interrupted = self._download("/InstallAssistant.pkg", "InstallAssistant.pkg")
+
+        self.assertFalse(interrupted.download_complete)
+        self.assertTrue(interrupted.partial_state_filepath.exists())
+        self.assertEqual(self.server.request_count("HEAD"), 0)
+
+        self.server.abort_after = None
+        self.server.reset_requests()
+        resumed = self._download("/InstallAssistant.pkg", "InstallAssistant.pkg")
+
+        self.assertTrue(resumed.download_complete)
+        self.assertEqual(self.server.request_count("HEAD", "/InstallAssistant.pkg"), 1)
+        self.assertEqual((self.temp_path / "InstallAssistant.pkg").read_bytes(), self.data)
+
+
+class WriteBehindWriterTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+
+        self.file_path = Path(self.temp_dir.name) / "InstallAssistant.pkg"
+        self.file_descriptor = os.open(self.file_path, os.O_RDWR | os.O_CREAT)
+        self.addCleanup(os.close, self.file_descriptor)
+
+
+    def _writer(self, max_pending: int = network_handler.WRITE_BEHIND_MAX_PENDING) -> network_handler.WriteBehindWriter:
+        writer = network_handler.WriteBehindWriter(self.file_descriptor, max_pending=max_pending)
+        self.addCleanup(writer.close)
+        return writer
+
+
+    def test_writes_at_offsets(self) -> None:
+        writer = self._writer()
+        writer.write(b"world", 6)
+        writer.write(b"hello ", 0)
+        writer.close()
+        writer.check()
+
+        self.assertEqual(self.file_path.read_bytes(), b"hello world")
+
+
+    def test_full_queue_blocks_writer(self) -> None:
+        release = threading.Event()
+        writer = self._writer(max_pending=2)
+
+        # First item is held by the writer thread, the next two fill the queue
+        writer.write(b"a", 0, verify=lambda offset, data: release.wait())
+        writer.write(b"b", 1)
+        writer.write(b"c", 2)
+
+        blocked = threading.Thread(target=writer.write, args=(b"d", 3))
+        blocked.start()
+        blocked.join(0.2)
+        self.assertTrue(blocked.is_alive())
+
+        release.set()
+        blocked.join(5)
+        self.assertFalse(blocked.is_alive())
+
+        writer.close()
+        self.assertEqual(self.file_path.read_bytes(), b"abcd")
+
+
+    def test_error_is_raised_to_caller(self) -> None:
+        written = []
+        writer = self._writer()
+
+        def _reject(offset: int, data: bytes) -> None:
+            raise ValueError("Chunk 2 checksum status FAIL")
+
+        writer.write(b"a", 0, callback=lambda offset, data: written.append(offset))
+        writer.write(b"b", 1, verify=_reject, callback=lambda offset, data: written.append(offset))
+        writer.write(b"c", 2, callback=lambda offset, data: written.append(offset))
+        writer.close()
+
+        # Rejected data and everything queued after it is discarded
+        self.assertEqual(written, [0])
+        self.assertEqual(self.file_path.read_bytes(), b"a")
+        self.assertIsInstance(writer.error, ValueError)
+        with self.assertRaises(ValueError):
+            writer.check()
+
+
+    def test_error_stops_later_writes(self) -> None:
+        writer = self._writer()
+        with mock.patch.object(network_handler.os, "pwrite", side_effect=OSError(28, "No space left on device")):
+            writer.write(b"a", 0)
+            for _ in range(100):
+                if writer.error:
+                    break
+                time.sleep(0.01)
+
+        with self.assertRaises(OSError):
+            writer.write(b"b", 1)
+
+
+    def test_close_waits_for_queued_writes(self) -> None:
+        written = []
+        writer = self._writer()
+
+        def _slow_write(offset: int, data: bytes) -> None:
+            time.sleep(0.01)
+
+        for offset in range(20):
+            writer.write(bytes([offset]), offset, verify=_slow_write, callback=lambda offset, data: written.append(offset))
+        writer.close()
+
+        # Everything written, and called back in the order queued, before close() returns
+        self.assertEqual(written, list(range(20)))
+        self.assertEqual(self.file_path.read_bytes(), bytes(range(20)))
+        self.assertFalse(writer._thread.is_alive())
+
+        # Closing again is harmless
+        writer.close()
+
+
+    def test_short_writes_are_retried(self) -> None:
+        pwrite = os.pwrite
+        writer = self._writer()
+
+        with mock.patch.object(network_handler.os, "pwrite", side_effect=lambda file_descriptor, data, offset: pwrite(file_descriptor, data[:3], offset)):
+            writer.write(b"hello world", 0)
+            writer.close()
+
+        writer.check()
+        self.assertEqual(self.file_path.read_bytes(), b"hello world")
+
+
+class TokenBucketTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+
+
+    def test_unlimited(self) -> None:
+        bucket = network_handler.TokenBucket(0, clock=self.clock)
+
+        self.assertEqual(bucket.reserve(1024 ** 3), 0.0)
+
+
+    def test_burst_within_capacity(self) -> None:
+        bucket = network_handler.TokenBucket(1000, clock=self.clock)
+
+        self.assertEqual(bucket.reserve(600), 0.0)
+        self.assertEqual(bucket.reserve(400), 0.0)
+
+
+    def test_debt_is_paid_off_by_waiting(self) -> None:
+        bucket = network_handler.TokenBucket(1000, clock=self.clock)
+
+        self.assertEqual(bucket.reserve(1000), 0.0)
+        self.assertAlmostEqual(bucket.reserve(500), 0.5)
+        self.assertAlmostEqual(bucket.reserve(500), 1.0)
+
+        self.clock.advance(1.0)
+        self.assertAlmostEqual(bucket.reserve(0), 0.0)
+        self.assertAlmostEqual(bucket.reserve(1), 0.001)
+
+
+    def test_refill_is_capped(self) -> None:
+        bucket = network_handler.TokenBucket(1000, capacity=2000, clock=self.clock)
+        bucket.reserve(2000)
+
+        self.clock.advance(60)
+        self.assertEqual(bucket.reserve(2000), 0.0)
+        self.assertAlmostEqual(bucket.reserve(1000), 1.0)
+
+
+    def test_set_rate(self) -> None:
+        bucket = network_handler.TokenBucket(1000, clock=self.clock)
+        bucket.reserve(1000)
+
+        bucket.set_rate(100)
+        self.assertAlmostEqual(bucket.reserve(50), 0.5)
+
+        bucket.set_rate(0)
+        self.assertEqual(bucket.reserve(1024 ** 3), 0.0)
+
+
+class DownloadSchedulerTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+
+
+    def _download_obj(self, name: str, priority: network_handler.DownloadPriority = network_handler.DownloadPriority.INTERACTIVE) -> types.SimpleNamespace:
+        return types.SimpleNamespace(filename=name, priority=priority, should_stop=False)
+
+
+    def _acquire_async(self, scheduler: network_handler.DownloadScheduler, download_obj: types.SimpleNamespace, started: list) -> threading.Thread:
+        def _acquire() -> None:
+            if scheduler.acquire(download_obj):
+                started.append(download_obj.filename)
+
+        queued = len(scheduler._queue)
+        thread = threading.Thread(target=_acquire)
+        thread.start()
+
+        # Wait for the download to be queued, keeping submission order deterministic
+        while len(scheduler._queue) == queued:
+            time.sleep(0.001)
+
+        return thread
+
+
+    def _wait_for(self, started: list, count: int) -> None:
+        deadline = time.monotonic() + 5
+        while len(started) < count and time.monotonic() < deadline:
+            time.sleep(0.001)
+
+
+    def test_queued_by_priority(self) -> None:
+        scheduler = network_handler.DownloadScheduler(max_concurrent=1, clock=self.clock)
+        first     = self._download_obj("first")
+        started   = []
+
+        self.assertTrue(scheduler.acquire(first))
+
+        threads = [
+            self._acquire_async(scheduler, self._download_obj("background-1", network_handler.DownloadPriority.BACKGROUND), started),
+            self._acquire_async(scheduler, self._download_obj("interactive-1"), started),
+            self._acquire_async(scheduler, self._download_obj("background-2", network_handler.DownloadPriority.BACKGROUND), started),
+            self._acquire_async(scheduler, self._download_obj("interactive-2"), started),
+        ]
+        self.assertEqual(started, [])
+
+        scheduler.release(first)
+        for count in range(1, 5):
+            self._wait_for(started, count)
+            self.assertEqual(len(started), count)
+            self.assertEqual(len(scheduler.active), 1)
+            scheduler.release(scheduler.active[0])
+
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(started, ["interactive-1", "interactive-2", "background-1", "background-2"])
+
+
+    def test_background_leaves_slot_for_interactive(self) -> None:
+        scheduler = network_handler.DownloadScheduler(max_concurrent=2, clock=self.clock)
+        started   = []
+
+        self.assertTrue(scheduler.acquire(self._download_obj("background-1", network_handler.DownloadPriority.BACKGROUND)))
+        thread = self._acquire_async(scheduler, self._download_obj("background-2", network_handler.DownloadPriority.BACKGROUND), started)
+        self.assertEqual(started, [])
+
+        self.assertTrue(scheduler.acquire(self._download_obj("interactive")))
+        self.assertEqual(started, [])
+
+        scheduler.release(scheduler.active[0])
+        thread.join()
+        self.assertEqual(started, ["background-2"])
+
+
+    def test_stopped_while_queued(self) -> None:
+        scheduler = network_handler.DownloadScheduler(max_concurrent=1, clock=self.clock)
+        queued    = self._download_obj("queued")
+        started   = []
+
+        self.assertTrue(scheduler.acquire(self._download_obj("active")))
+        thread = self._acquire_async(scheduler, queued, started)
+
+        queued.should_stop = True
+        thread.join()
+
+        self.assertEqual(started, [])
+        self.assertEqual(scheduler._queue, [])
+
+
+    def test_background_throttled_only_while_interactive_active(self) -> None:
+        scheduler   = network_handler.DownloadScheduler(max_concurrent=3, bandwidth_limit=0, background_bandwidth_limit=1000, clock=self.clock)
+        background  = self._download_obj("background", network_handler.DownloadPriority.BACKGROUND)
+        interactive = self._download_obj("interactive")
+
+        scheduler.acquire(background)
+        self.assertEqual(scheduler.throttle(background, 5000), 0.0)
+
+        scheduler.acquire(interactive)
+        self.assertEqual(scheduler.throttle(interactive, 5000), 0.0)
+        self.assertEqual(scheduler.throttle(background, 1000), 0.0)
+        self.assertAlmostEqual(scheduler.throttle(background, 1000), 1.0)
+
+        self.clock.advance(1.0)
+        self.assertAlmostEqual(scheduler.throttle(background, 1000), 1.0)
+
+        scheduler.release(interactive)
+        self.assertEqual(scheduler.throttle(background, 1000), 0.0)
+
+
+    def test_bandwidth_shared_by_all_downloads(self) -> None:
+        scheduler = network_handler.DownloadScheduler(max_concurrent=3, bandwidth_limit=1000, clock=self.clock)
+        first     = self._download_obj("first")
+        second    = self._download_obj("second", network_handler.DownloadPriority.BACKGROUND)
+
+        self.assertEqual(scheduler.throttle(first, 1000), 0.0)
+        self.assertAlmostEqual(scheduler.throttle(second, 500), 0.5)
+
+        scheduler.set_bandwidth_limit(0)
+        self.assertEqual(scheduler.throttle(first, 1000), 0.0)
+
+
+class ScheduledDownloadTests(LocalServerTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.data = os.urandom(1024 * 1024 * 2)
+        for name in ["first", "second", "third"]:
+            self.server.files[f"/{name}.pkg"] = self.data
+
+        # Slow responses keep downloads active long enough to overlap
+        self.server.delay = 0.01
+
+
+    def test_concurrency_limit(self) -> None:
+        scheduler = network_handler.DownloadScheduler(max_concurrent=1)
+        events    = []
+        acquire   = scheduler.acquire
+        release   = scheduler.release
+
+        def _acquire(download_obj) -> bool:
+            result = acquire(download_obj)
+            events.append(("start", download_obj.filename, len(scheduler.active)))
+            return result
+
+        def _release(download_obj) -> None:
+            events.append(("finish", download_obj.filename, len(scheduler.active)))
+            release(download_obj)
+
+        scheduler.acquire = _acquire
+        scheduler.release = _release
+
+        download_objs = [
+            network_handler.DownloadObject(self.server.url(f"/{name}.pkg"), self.temp_path / f"{name}.pkg", scheduler=scheduler, partial_path=self.partial_path)
+            for name in ["first", "second", "third"]
+        ]
+        for download_obj in download_objs:
+            download_obj.download()
+            while not events and download_obj is download_objs[0]:
+                time.sleep(0.001)
+        for download_obj in download_objs:
+            download_obj.active_thread.join()
+
+        self.assertTrue(all(download_obj.download_complete for download_obj in download_objs))
+        self.assertTrue(all(active == 1 for _, _, active in events))
+        self.assertEqual([event for event, _, _ in events], ["start", "finish"] * 3)
+        self.assertEqual(events[0][1], "first.pkg")
+
+
+    def test_bandwidth_limit(self) -> None:
+        self.server.delay = 0
+        scheduler = network_handler.DownloadScheduler(bandwidth_limit=1024 * 1024 * 2)
+
+        start_time = time.perf_counter()
+        download_objs = [
+            network_handler.DownloadObject(self.server.url(f"/{name}.pkg"), self.temp_path / f"{name}.pkg", scheduler=scheduler, partial_path=self.partial_path)
+            for name in ["first", "second"]
+        ]
+        for download_obj in download_objs:
+            download_obj.download()
+        for download_obj in download_objs:
+            download_obj.active_thread.join()
+        duration = time.perf_counter() - start_time
+
+        # 4MB at 2MB/s, the first second's worth is allowed as a burst
+        self.assertTrue(all(download_obj.download_complete for download_obj in download_objs))
+        self.assertGreaterEqual(duration, 0.9)
+
+
+class ThroughputEstimatorTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.clock     = FakeClock()
+        self.estimator = network_handler.ThroughputEstimator(half_life=3.0, clock=self.clock)
+
+
+    def _transfer(self, rate: float, seconds: float, transferred: float) -> float:
+        self.clock.advance(seconds)
+        transferred += rate * seconds
+        self.estimator.update(transferred)
+        return transferred
+
+
+    def test_first_sample_sets_rate(self) -> None:
+        self._transfer(1000, 2.0, 0)
+
+        self.assertAlmostEqual(self.estimator.instant_rate, 1000)
+        self.assertAlmostEqual(self.estimator.rate, 1000)
+
+
+    def test_steady_rate(self) -> None:
+        transferred = 0
+        for _ in range(20):
+            transferred = self._transfer(1000, 0.25, transferred)
+
+        self.assertAlmostEqual(self.estimator.rate, 1000)
+
+
+    def test_half_life(self) -> None:
+        transferred = self._transfer(1000, 1.0, 0)
+
+        # Link stalls for one half-life
+        self._transfer(0, 3.0, transferred)
+
+        self.assertAlmostEqual(self.estimator.instant_rate, 0)
+        self.assertAlmostEqual(self.estimator.rate, 500)
+
+
+    def test_independent_of_update_frequency(self) -> None:
+        transferred = self._transfer(1000, 1.0, 0)
+        for _ in range(12):
+            transferred = self._transfer(4000, 0.25, transferred)
+        frequent = self.estimator.rate
+
+        self.estimator.reset()
+        transferred = self._transfer(1000, 1.0, 0)
+        self._transfer(4000, 3.0, transferred)
+
+        self.assertAlmostEqual(frequent, self.estimator.rate)
+        self.assertAlmostEqual(frequent, 2500)
+
+
+    def test_zero_elapsed_is_ignored(self) -> None:
+        transferred = self._transfer(1000, 1.0, 0)
+        self.estimator.update(transferred + 10 ** 9)
+
+        self.assertAlmostEqual(self.estimator.rate, 1000)
+
+
+    def test_restart_resets(self) -> None:
+        self._transfer(1000, 1.0, 0)
+
+        self.clock.advance(1.0)
+        self.estimator.update(10)
+        self.assertEqual(self.estimator.rate, 0.0)
+
+        self._transfer(200, 1.0, 10)
+        self.assertAlmostEqual(self.estimator.rate, 200)
+
+
+    def test_reset_baseline(self) -> None:
+        self.estimator.reset(5000)
+        self._transfer(1000, 1.0, 5000)
+
+        self.assertAlmostEqual(self.estimator.rate, 1000)
+
+
+class ProgressEventTests(LocalServerTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.data = os.urandom(1024 * 1024 * 9)
+        self.server.files["/InstallAssistant.pkg"] = self.data
+
+
+    def _download_with_clock(self, clock) -> tuple:
+        download_obj = network_handler.DownloadObject(self.server.url("/InstallAssistant.pkg"), self.temp_path / "InstallAssistant.pkg", scheduler=network_handler.DownloadScheduler(), partial_path=self.partial_path)
+        download_obj._throughput = network_handler.ThroughputEstimator(clock=clock)
+
+        events = []
+        download_obj.add_progress_callback(events.append)
+        progress_queue = download_obj.progress_queue()
+        download_obj.download(spawn_thread=False)
+
+        return download_obj, events, [progress_queue.get_nowait() for _ in range(progress_queue.qsize())]
+
+
+    def test_final_event(self) -> None:
+        download_obj, events, queued = self._download_with_clock(time.monotonic)
+
+        self.assertTrue(download_obj.download_complete)
+        self.assertEqual(events, queued)
+        self.assertTrue(events[-1].complete)
+        self.assertEqual(events[-1].downloaded, len(self.data))
+        self.assertEqual(events[-1].percent, 100)
+
+
+    def test_events_are_throttled(self) -> None:
+        # Clock never advances, so only the first event and the final (forced) event are published
+        download_obj, events, _ = self._download_with_clock(FakeClock())
+
+        self.assertTrue(download_obj.download_complete)
+        self.assertLessEqual(len(events), 2)
+        self.assertTrue(events[-1].complete)
+
+
+class MetadataCacheTests(LocalServerTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.data = b"<plist>catalog</plist>"
+        self.server.files["/catalog.sucatalog"] = self.data
+        self.cache_path = self.temp_path / "Cache"
+
+
+    def _cache(self, ttl: int = 0) -> network_handler.MetadataCache:
+        return network_handler.MetadataCache(self.server.url("/catalog.sucatalog"), ttl=ttl, cache_path=self.cache_path)
+
+
+    def _catalog_requests(self) -> list:
+        return self.server.requests_for("GET", "/catalog.sucatalog")
+
+
+    def test_conditional_request_serves_cached_copy(self) -> None:
+        cache = self._cache()
+        self.assertEqual(cache.get(), self.data)
+        self.assertFalse(cache.from_cache)
+        self.assertTrue(cache.revalidated)
+
+        # Content changed without a new validator, only the cached copy can be returned
+        self.server.files["/catalog.sucatalog"] = b"<plist>changed</plist>"
+        self.server.requests.clear()
+
+        self.assertEqual(cache.get(), self.data)
+        self.assertTrue(cache.from_cache)
+        self.assertTrue(cache.revalidated)
+
+        requests = self._catalog_requests()
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(requests[0].get("If-None-Match"), '"v1"')
+        self.assertEqual(requests[0].get("If-Modified-Since"), "Mon, 01 Jan 2024 00:00:00 GMT")
+
+
+    def test_new_content_replaces_cached_copy(self) -> None:
+        cache = self._cache()
+        cache.get()
+
+        self.server.files["/catalog.sucatalog"] = b"<plist>changed</plist>"
+        self.server.etag = '"v2"'
+
+        self.assertEqual(cache.get(), b"<plist>changed</plist>")
+        self.assertFalse(cache.from_cache)
+        self.assertEqual(self._cache().get_cached(), b"<plist>changed</plist>")
+
+
+    def test_fresh_copy_skips_request(self) -> None:
+        self._cache(ttl=3600).get()
+        self.server.requests.clear()
+
+        cache = self._cache(ttl=3600)
+        self.assertEqual(cache.get(), self.data)
+        self.assertTrue(cache.from_cache)
+        self.assertFalse(cache.revalidated)
+        self.assertFalse(cache.is_stale())
+        self.assertEqual(self._catalog_requests(), [])
+
+        # Revalidating asks the server even within the TTL
+        self.assertEqual(cache.get(revalidate=True), self.data)
+        self.assertTrue(cache.revalidated)
+        self.assertEqual(len(self._catalog_requests()), 1)
+
+
+    def test_offline_serves_cached_copy(self) -> None:
+        self._cache().get()
+
+        cache = self._cache()
+        with mock.patch.object(network_handler.SESSION, "get", side_effect=network_handler.requests.exceptions.ConnectionError("Network down")):
+            self.assertEqual(cache.get(revalidate=True), self.data)
+            self.assertTrue(cache.from_cache)
+            self.assertFalse(cache.revalidated)
+
+            # Nothing cached, nothing to fall back to
+            cache.invalidate()
+            self.assertIsNone(cache.get())
+
+
+    def test_server_error_serves_cached_copy(self) -> None:
+        self._cache().get()
+        del self.server.files["/catalog.sucatalog"]
+
+        cache = self._cache()
+        self.assertEqual(cache.get(), self.data)
+        self.assertTrue(cache.from_cache)
+        self.assertFalse(cache.revalidated)
+
+
+    def test_corrupt_state_is_ignored(self) -> None:
+        cache = self._cache(ttl=3600)
+        cache.get()
+        cache.state_filepath.write_bytes(b"<?xml version=\"1.0\"?><plist><dict><key>etag")
+        self.server.requests.clear()
+
+        self.assertIsNone(cache.get_cached())
+        self.assertEqual(cache.get(), self.data)
+        self.assertFalse(cache.from_cache)
+        self.assertNotIn("If-None-Match", self._catalog_requests()[0])
+
+
+    def test_invalidate(self) -> None:
+        cache = self._cache(ttl=3600)
+        cache.get()
+        cache.invalidate()
+
+        self.assertFalse(cache.data_filepath.exists())
+        self.assertFalse(cache.state_filepath.exists())
+        self.assertTrue(cache.is_stale())
+        self.assertIsNone(cache.get_cached())
+
+        self.server.requests.clear()
+        self.assertEqual(cache.get(), self.data)
+        self.assertFalse(cache.from_cache)
+        self.assertNotIn("If-None-Match", self._catalog_requests()[0])
+
+
+    def test_refresh_async_calls_back_on_new_content(self) -> None:
+        self._cache().get()
+
+        # Fresh copy, nothing to refresh
+        callback = mock.Mock()
+        self.assertIsNone(self._cache(ttl=3600).refresh_async(callback=callback))
+
+        # Unchanged on the server
+        self._cache().refresh_async(callback=callback).join()
+        callback.assert_not_called()
+
+        self.server.files["/catalog.sucatalog"] = b"<plist>changed</plist>"
+        self.server.etag = '"v2"'
+        self._cache().refresh_async(callback=callback).join()
+        callback.assert_called_once_with(b"<plist>changed</plist>")
+
+        # Unreachable server keeps the cached copy quietly
+        callback.reset_mock()
+        with mock.patch.object(network_handler.SESSION, "get", side_effect=network_handler.requests.exceptions.ConnectionError("Network down")):
+            self._cache().refresh_async(callback=callback).join()
+        callback.assert_not_called()
+        self.assertEqual(self._cache().get_cached(), b"<plist>changed</plist>")
+
+
+class DownloadCacheTests(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.temp_path = Path(self.temp_dir.name)
+
+        self.cache  = network_handler.DownloadCache(self.temp_path / "Cache", budget=1024 * 1024 * 16)
+        self.data   = os.urandom(1024 * 1024 + 7)
+        self.sha256 = hashlib.sha256(self.data).hexdigest()
+        self.url    = "http://127.0.0.1/InstallAssistant.pkg"
+
+        self.source = self.temp_path / "InstallAssistant.pkg"
+        self.source.write_bytes(self.data)
+
+
+    def _store(self) -> None:
+        if not self.cache.store(self.url, '"v1"', self.source, self.sha256):
+            self.cache.store_async(self.url, '"v1"', self.source, self.sha256).join()
+
+
+    def test_retrieve_is_separate_file(self) -> None:
+        self._store()
+        object_path = self.cache.objects_path / self.sha256
+        self.assertTrue(object_path.exists())
+
+        destination = self.temp_path / "Retrieved.pkg"
+        checksum = self.cache.retrieve(self.url, '"v1"', len(self.data), destination)
+
+        self.assertEqual(checksum.hexdigest(), self.sha256)
+        self.assertEqual(destination.read_bytes(), self.data)
+        self.assertNotEqual(destination.stat().st_ino, object_path.stat().st_ino)
+
+        # Patching the download in place (ie. repair) leaves the cached object intact
+        with destination.open("r+b") as file:
+            file.write(b"\x00" * 16)
+        self.assertEqual(hashlib.sha256(object_path.read_bytes()).hexdigest(), self.sha256)
+
+
+    def test_retrieve_verifies_outside_lock(self) -> None:
+        self._store()
+
+        copy_file = self.cache._copy_file
+        hash_file = self.cache._hash_file
+        def assert_unlocked(function):
+            def wrapper(*args, **kwargs):
+                self.assertFalse(self.cache._lock.locked())
+                return function(*args, **kwargs)
+            return wrapper
+
+        with mock.patch.object(self.cache, "_copy_file", assert_unlocked(copy_file)), mock.patch.object(self.cache, "_hash_file", assert_unlocked(hash_file)):
+            self.assertIsNotNone(self.cache.retrieve(self.url, '"v1"', len(self.data), self.temp_path / "Retrieved.pkg"))
+
+
+    def test_corrupted_object_is_removed(self) -> None:
+        self._store()
+        object_path = self.cache.objects_path / self.sha256
+        object_path.chmod(0o644)
+        with object_path.open("r+b") as file:
+            file.write(b"\x00" * 16)
+
+        destination = self.temp_path / "Retrieved.pkg"
+        self.assertIsNone(self.cache.retrieve(self.url, '"v1"', len(self.data), destination))
+        self.assertFalse(destination.exists())
+        self.assertFalse(object_path.exists())
+        self.assertEqual(self.cache._load_index(), {})
+
+
+    def test_corrupt_index_is_ignored(self) -> None:
+        self._store()
+        self.cache.index_path.write_bytes(b"<?xml version=\"1.0\"?><plist><dict><key>")
+
+        self.assertEqual(self.cache._load_index(), {})
+        self.assertIsNone(self.cache.retrieve(self.url, '"v1"', len(self.data), self.temp_path / "Retrieved.pkg"))
+
+        self._store()
+        self.assertIsNotNone(self.cache.retrieve(self.url, '"v1"', len(self.data), self.temp_path / "Retrieved.pkg"))
+
+
+    def test_store_only_clones(self) -> None:
+        with mock.patch.object(network_handler.utilities, "clone_file", return_value=False):
+            self.assertFalse(self.cache.store(self.url, '"v1"', self.source, self.sha256))
+        self.assertEqual(list(self.cache.objects_path.iterdir()), [])
+
+        def clone_file(source, destination) -> bool:
+            destination.write_bytes(source.read_bytes())
+            return True
+
+        with mock.patch.object(network_handler.utilities, "clone_file", clone_file):
+            self.assertTrue(self.cache.store(self.url, '"v1"', self.source, self.sha256))
+        self.assertEqual(self.cache._load_index()[self.cache._key(self.url, '"v1"')]["SHA256"], self.sha256)
+
+
+    def test_store_skips_other_volume(self) -> None:
+        source_stat = self.source.stat()
+        other_volume = types.SimpleNamespace(st_dev=source_stat.st_dev + 1, st_size=source_stat.st_size)
+
+        with mock.patch.object(network_handler.utilities, "clone_file") as clone_file:
+            with mock.patch.object(Path, "stat", lambda path, **kwargs: other_volume if path == self.source else os.stat(path)):
+                self.assertFalse(self.cache.store(self.url, '"v1"', self.source, self.sha256))
+        clone_file.assert_not_called()
+
+
+    def test_store_async_skips_without_free_space(self) -> None:
+        with mock.patch.object(network_handler.utilities, "get_free_space", return_value=len(self.data) * 2 - 1):
+            self.assertIsNone(self.cache.store_async(self.url, '"v1"', self.source, self.sha256))
+        self.assertEqual(self.cache._load_index(), {})
+
+
+    def test_store_async_rejects_modified_file(self) -> None:
+        self.cache.store_async(self.url, '"v1"', self.source, hashlib.sha256(b"other").hexdigest()).join()
+
+        self.assertEqual(self.cache._load_index(), {})
+        self.assertEqual(list(self.cache.objects_path.iterdir()), [])
+
+
+    def test_remove_cancels_pending_store(self) -> None:
+        started = threading.Event()
+        release = threading.Event()
+        copy_file = self.cache._copy_file
+        def gated_copy_file(*args, **kwargs):
+            started.set()
+            release.wait(5)
+            return copy_file(*args, **kwargs)
+
+        with mock.patch.object(self.cache, "_copy_file", gated_copy_file):
+            thread = self.cache.store_async(self.url, '"v1"', self.source, self.sha256)
+            self.assertTrue(started.wait(5))
+            self.cache.remove(self.url, '"v1"')
+            release.set()
+            thread.join()
+
+        self.assertEqual(self.cache._load_index(), {})
+        self.assertEqual(list(self.cache.objects_path.iterdir()), [])
+        self.assertEqual(self.cache._pending, {})
+
+
+class CachedDownloadTests(LocalServerTestCase):
+
+    def setUp(self) -> None:
+        super().setUp()
+        self.data = os.urandom(1024 * 1024 * 3 + 5)
+        self.server.files["/InstallAssistant.pkg"] = self.data
+        self.cache = network_handler.DownloadCache(self.temp_path / "Cache")
+
+
+    def test_download_does_not_wait_for_cache(self) -> None:
+        threads = []
+        store_async = self.cache.store_async
+        def record_store_async(*args) -> threading.Thread:
+            self.assertTrue(download_obj.download_complete)
+            threads.append(store_async(*args))
+            return threads[-1]
+
+        with mock.patch.object(network_handler.utilities, "clone_file", return_value=False), mock.patch.object(self.cache, "store_async", record_store_async):
+            download_obj = network_handler.DownloadObject(self.server.url("/InstallAssistant.pkg"), self.temp_path / "InstallAssistant.pkg", scheduler=network_handler.DownloadScheduler(), cache=self.cache, partial_path=self.partial_path)
+            download_obj.download(spawn_thread=False)
+
+        self.assertTrue(download_obj.download_complete)
+        self.assertEqual(len(threads), 1)
+        threads[0].join()
+
+        self.server.requests.clear()
+        download_obj = self._download("/InstallAssistant.pkg", "Cached.pkg", cache=self.cache)
+        self.assertTrue(download_obj.download_complete)
+        self.assertEqual((self.temp_path / "Cached.pkg").read_bytes(), self.data)
+        self.assertEqual(self.server.requests_for("GET", "/InstallAssistant.pkg"), [])